@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'roadside_service.settings')
+# Served by an ASGI server: /events/ can stream (settings.LIVE_EVENTS)
+os.environ.setdefault('LIVE_EVENTS', 'true')
 
 application = get_asgi_application()
@@ -1,6 +1,21 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin
-from .models import Contact, User, Service, Booking, Payment, Staff, Notification
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from .catalog import invalidate_catalog
+from .exports import export_response
+from .forms import BookingAdminForm
+from .pagination import (
+    EstimatedCountPaginator, decode_keyset_cursor, encode_keyset_cursor, keyset_after, reverse_ordering,
+)
+from .search import search
+from .tasks import process_profile_picture
+from .models import Contact, User, Service, Booking, Payment, Staff, Notification, StripeEvent, Job
+from .models import ArchivedBooking, ArchivedNotification, DailyBookingStatus, DailyRevenue, TechnicianUtilization
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
@@ -13,11 +28,152 @@ class CustomUserAdmin(UserAdmin):
         ('Additional Info', {'fields': ('phone_number', 'address')}),
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'profile_picture' in form.changed_data and obj.profile_picture:
+            # Resized by run_workers; the original is shown until then
+            process_profile_picture.delay(user_id=obj.pk)
+
+CURSOR_VAR = 'cursor'
+
+class KeysetChangeList(ChangeList):
+    """
+    A changelist that pages with ?cursor= (the first / last row shown) instead of
+    ?p= offsets: every page is one indexed range read, however deep. Orderings
+    on related or nullable columns fall back to numbered pages.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        super().__init__(request, *args, **kwargs)
+        # Filter, sort and search links start again from the first page
+        self.params.pop(CURSOR_VAR, None)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        return super().get_query_string(new_params, [*(remove or []), CURSOR_VAR])
+
+    def keyset_ordering(self):
+        """The changelist's ordering as model field names, or None if keyset paging can't follow it."""
+        ordering, seen = [], set()
+        for field in self.queryset.query.order_by:
+            if not isinstance(field, str):
+                return None
+            name = field.lstrip('-')
+            name = self.opts.pk.name if name == 'pk' else name
+            if name in seen:
+                continue
+            try:
+                model_field = self.opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            # NULLs never compare less or greater, so rows would go missing
+            if not model_field.concrete or model_field.null:
+                return None
+            seen.add(name)
+            ordering.append(f'-{name}' if field.startswith('-') else name)
+        if len(ordering) > 1 and ordering[-1].lstrip('-') == self.opts.pk.name:
+            # Break ties on the primary key in the same direction as the sort, so an
+            # index on (column, id) serves both; mixed directions force a full sort
+            ordering[-1] = ('-' if ordering[0].startswith('-') else '') + self.opts.pk.name
+        return ordering or None
+
+    def get_results(self, request):
+        ordering = self.keyset_ordering()
+        self.keyset = ordering is not None and not self.list_editable
+        if not self.keyset:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        decoded = decode_keyset_cursor(self.cursor, self.model, ordering) if self.cursor else None
+        direction, values = decoded or ('next', None)
+        if direction == 'next':
+            rows = self.queryset.order_by(*ordering)
+            if values:
+                rows = rows.filter(keyset_after(ordering, values))
+        else:
+            # Walking backwards: read in reverse from the cursor, then flip for display
+            rows = self.queryset.order_by(*reverse_ordering(ordering)).filter(
+                keyset_after(reverse_ordering(ordering), values)
+            )
+        rows = list(rows[:self.list_per_page + 1])
+        has_more = len(rows) > self.list_per_page
+        rows = rows[:self.list_per_page]
+        if direction == 'prev':
+            rows.reverse()
+        has_next = has_more if direction == 'next' else bool(rows)
+        has_prev = bool(values and rows) if direction == 'next' else has_more
+
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = has_next or has_prev
+        self.paginator = paginator
+        self.next_url = self.get_query_string(
+            {CURSOR_VAR: encode_keyset_cursor('next', ordering, rows[-1])}
+        ) if has_next else None
+        self.prev_url = self.get_query_string(
+            {CURSOR_VAR: encode_keyset_cursor('prev', ordering, rows[0])}
+        ) if has_prev else None
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings for tables with millions of rows: keyset pages (keep
+    `ordering` and sortable_by to indexed columns), estimated counts instead of
+    COUNT(*) over the whole table, and no second unfiltered count. Pair it
+    with list_select_related and autocomplete_fields, and leave out
+    date_hierarchy and list_filter on columns without choices (their
+    aggregate / SELECT DISTINCT queries read every row).
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/roadside_service_app/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+class PaymentStatusFilter(admin.SimpleListFilter):
+    """Booking.payment_status from a fixed list; the default filter runs SELECT DISTINCT over every booking."""
+    title = 'payment status'
+    parameter_name = 'payment_status'
+
+    def lookups(self, request, model_admin):
+        return Payment.PAYMENT_STATUS_CHOICES
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(payment_status=self.value())
+        return queryset
+
+class FullTextSearchMixin:
+    """
+    Changelist search through the full-text index (see search.py) for the
+    message-like columns; search_fields keeps only short prefix lookups.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if not search_term.strip():
+            return results, may_have_duplicates
+        # Two primary-key subqueries, so each side can use its own index; ORing the
+        # lookups themselves makes SQLite scan the whole table
+        matches = queryset.filter(
+            Q(pk__in=results.order_by().values('pk')) | Q(pk__in=search(self.model, search_term))
+        )
+        return matches, False
+
 @admin.register(Contact)
-class ContactAdmin(admin.ModelAdmin):
+class ContactAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('name', 'email', 'subject', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('name', 'email', 'subject', 'message')
+    search_fields = ('^email',)  # Name, subject and message through the full-text index
     readonly_fields = ('created_at',)
 
 @admin.register(Service)
@@ -26,19 +182,73 @@ class ServiceAdmin(admin.ModelAdmin):
     list_filter = ('is_active',)
     search_fields = ('name', 'description')
     list_editable = ('price', 'is_active')
+    actions = ['activate_services', 'deactivate_services']
+
+    # Bulk updates bypass post_save, so bump the catalog version ourselves
+    @admin.action(description='Activate selected services')
+    def activate_services(self, request, queryset):
+        queryset.update(is_active=True)
+        transaction.on_commit(invalidate_catalog)
+
+    @admin.action(description='Deactivate selected services')
+    def deactivate_services(self, request, queryset):
+        queryset.update(is_active=False)
+        transaction.on_commit(invalidate_catalog)
+
+class ExportMixin:
+    """CSV / JSONL export of the selected rows, streamed (see exports.py)."""
+    export_name = None
+    actions = ['export_csv', 'export_jsonl']
+
+    @admin.action(description='Export selected rows as CSV')
+    def export_csv(self, request, queryset):
+        return export_response(self.export_name, queryset, 'csv')
+
+    @admin.action(description='Export selected rows as JSON lines')
+    def export_jsonl(self, request, queryset):
+        return export_response(self.export_name, queryset, 'jsonl')
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdminMixin, FullTextSearchMixin, ExportMixin, admin.ModelAdmin):
+    export_name = 'bookings'
+    form = BookingAdminForm  # Refuses to save over a change made since the form was opened
     list_display = ('id', 'user', 'service', 'booking_date', 'status', 'payment_status')
-    list_filter = ('status', 'payment_status', 'booking_date', 'service')
-    search_fields = ('user__username', 'user__email', 'location')
-    readonly_fields = ('id', 'created_at', 'updated_at')
-    date_hierarchy = 'booking_date'
+    list_filter = ('status', PaymentStatusFilter, 'booking_date', 'service')
+    list_select_related = ('user', 'service')
+    ordering = ('-booking_date', '-id')  # booking_date_idx / booking_status_date_idx
+    sortable_by = ('booking_date',)  # Sorting on other columns would read the whole table
+    autocomplete_fields = ('user', 'service', 'assigned_technician')
+    search_fields = ('^user__username', '^user__email')  # Location, vehicle and notes through the full-text index
+    readonly_fields = ('id', 'created_at', 'updated_at', 'version')
+    actions = ExportMixin.actions + ['start_bookings', 'complete_bookings', 'cancel_bookings']
+
+    # Conditional status changes (Booking.transition): rows someone else changed
+    # meanwhile, or that can't make the move, are left as they are
+    def transition(self, request, queryset, to_status):
+        bookings = list(queryset)
+        moved = Booking.objects.transition(bookings, to_status)
+        self.message_user(request, f'{len(moved)} of {len(bookings)} bookings moved to {to_status}.')
+
+    @admin.action(description='Mark selected bookings in progress')
+    def start_bookings(self, request, queryset):
+        self.transition(request, queryset, 'in_progress')
+
+    @admin.action(description='Mark selected bookings completed')
+    def complete_bookings(self, request, queryset):
+        self.transition(request, queryset, 'completed')
+
+    @admin.action(description='Cancel selected bookings')
+    def cancel_bookings(self, request, queryset):
+        self.transition(request, queryset, 'cancelled')
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdminMixin, ExportMixin, admin.ModelAdmin):
+    export_name = 'payments'
     list_display = ('booking', 'amount', 'payment_status', 'created_at')
     list_filter = ('payment_status', 'created_at')
+    list_select_related = ('booking__user', 'booking__service')
+    ordering = ('-id',)
+    autocomplete_fields = ('booking',)
     readonly_fields = ('created_at', 'updated_at')
 
 @admin.register(Staff)
@@ -46,10 +256,107 @@ class StaffAdmin(admin.ModelAdmin):
     list_display = ('user', 'role', 'status', 'hire_date', 'rating')
     list_filter = ('role', 'status', 'hire_date')
     search_fields = ('user__username', 'user__first_name', 'user__last_name')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdminMixin, FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'notification_type', 'title', 'is_read', 'created_at')
     list_filter = ('notification_type', 'is_read', 'created_at')
-    search_fields = ('user__username', 'title', 'message')
+    list_select_related = ('user',)
+    ordering = ('-id',)
+    autocomplete_fields = ('user', 'related_booking')
+    search_fields = ('^user__username',)  # Title and message through the full-text index
     readonly_fields = ('created_at',)
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event_type', 'received_at', 'processed_at', 'attempts')
+    list_filter = ('event_type',)
+    search_fields = ('event_id',)
+    readonly_fields = ('event_id', 'event_type', 'payload', 'received_at', 'processed_at', 'attempts', 'last_error')
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'status', 'priority', 'attempts', 'run_at', 'locked_by', 'finished_at')
+    list_filter = ('status', 'task')
+    readonly_fields = ('created_at', 'finished_at', 'locked_by', 'locked_at', 'last_error')
+    actions = ['retry_jobs']
+
+    @admin.action(description='Run selected jobs again now')
+    def retry_jobs(self, request, queryset):
+        queryset.exclude(status='running').update(status='queued', run_at=timezone.now(), attempts=0, finished_at=None)
+
+class ArchiveAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """Rows moved out by apply_retention (see retention.py): look, don't touch."""
+    list_display = ('id', 'user', 'created_at', 'archived_at')
+    list_select_related = ('user',)
+    ordering = ('-created_at', '-id')
+    sortable_by = ()
+    readonly_fields = ('id', 'user', 'created_at', 'archived_at', 'data')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(ArchiveAdmin):
+    pass
+
+@admin.register(ArchivedNotification)
+class ArchivedNotificationAdmin(ArchiveAdmin):
+    pass
+
+class SummaryAdmin(admin.ModelAdmin):
+    """
+    Read-only report over a summary table (see summaries.py), with totals for
+    the filtered rows. These tables hold a few rows per day, so the reports
+    never touch bookings or payments.
+    """
+    change_list_template = 'admin/roadside_service_app/summary_change_list.html'
+    date_hierarchy = 'day'
+    totals = ()
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None:
+            response.context_data['summary_totals'] = changelist.queryset.aggregate(
+                **{field: Sum(field) for field in self.totals}
+            )
+        return response
+
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(SummaryAdmin):
+    list_display = ('day', 'service', 'payments', 'revenue')
+    list_filter = ('service',)
+    list_select_related = ('service',)
+    totals = ('payments', 'revenue')
+
+@admin.register(DailyBookingStatus)
+class DailyBookingStatusAdmin(SummaryAdmin):
+    list_display = ('day', 'status', 'bookings')
+    list_filter = ('status',)
+    totals = ('bookings',)
+
+@admin.register(TechnicianUtilization)
+class TechnicianUtilizationAdmin(SummaryAdmin):
+    list_display = ('day', 'technician', 'jobs', 'booked_minutes', 'utilization')
+    list_select_related = ('technician__user',)
+    totals = ('jobs', 'booked_minutes')
+
+    @admin.display(description='Utilization')
+    def utilization(self, obj):
+        # Booked time as a share of one shift
+        return f'{obj.booked_minutes / settings.TECHNICIAN_SHIFT_MINUTES:.0%}'
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class RoadsideServiceAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'roadside_service_app'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals, tasks  # noqa: F401
+        from .metrics import install_query_recorder
+
+        connection_created.connect(install_query_recorder, dispatch_uid='roadside_query_recorder')
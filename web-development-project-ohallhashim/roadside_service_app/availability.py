@@ -0,0 +1,105 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .dispatch import AVAILABLE_STAFF_STATUSES, BUSY_STATUSES
+from .models import Booking, Service, Staff
+
+
+class IntervalSet:
+    """
+    Half-open [start, end) intervals kept as two sorted arrays. The number of
+    intervals overlapping a range is
+        #(starts < end) - #(ends <= start)
+    because every interval ending at or before `start` also starts before `end`.
+    Building the set sorts once (O(n log n)); each query is then two binary
+    searches, O(log n).
+    """
+
+    def __init__(self, intervals=()):
+        self.starts = sorted(start for start, _ in intervals)
+        self.ends = sorted(end for _, end in intervals)
+
+    def overlapping(self, start, end):
+        return bisect_left(self.starts, end) - bisect_right(self.ends, start)
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class AvailabilityEngine:
+    """
+    Booked time for the technician roster over a window. Every booking counts
+    against the shared pool, whose capacity is the roster size. Pool checks
+    count bookings overlapping the requested interval, which is conservative
+    when several short bookings fall inside one longer slot.
+
+    An engine is built per request from the bookings that can overlap its window
+    (one indexed range read, then a sort of those rows), so nothing goes stale
+    when bookings change. The build pays off when many intervals are checked
+    against it, as free_slots does; a single check costs about the same as the
+    read it is built from.
+    """
+
+    def __init__(self, technician_count, bookings):
+        self.capacity = technician_count
+        self.pool = IntervalSet(bookings)
+
+    def conflicts(self, start, end):
+        # No roster configured (e.g. a fresh install): bookings are not capacity-checked
+        if not self.capacity:
+            return False
+        return self.pool.overlapping(start, end) >= self.capacity
+
+    def free_slots(self, duration, window_start, window_end, step=None):
+        """Start times in [window_start, window_end - duration] where a booking still fits."""
+        step = step or timedelta(minutes=settings.AVAILABILITY_SLOT_MINUTES)
+        slots = []
+        start = window_start
+        while start + duration <= window_end:
+            if not self.conflicts(start, start + duration):
+                slots.append(start)
+            start += step
+        return slots
+
+    @classmethod
+    def for_window(cls, window_start, window_end):
+        """Count the roster and load every booking that can overlap the window (one query each)."""
+        longest = Service.objects.aggregate(longest=Max('duration'))['longest'] or 0
+        technicians = Staff.objects.filter(role='mechanic', status__in=AVAILABLE_STAFF_STATUSES).count()
+        rows = Booking.objects.filter(
+            status__in=BUSY_STATUSES,
+            booking_date__lt=window_end,
+            booking_date__gt=window_start - timedelta(minutes=longest),
+        ).values_list('booking_date', 'service__duration')
+        return cls(technicians, [(start, start + timedelta(minutes=minutes)) for start, minutes in rows])
+
+
+def booking_interval(service, start):
+    return start, start + timedelta(minutes=service.duration)
+
+
+def is_available(service, start):
+    start, end = booking_interval(service, start)
+    return not AvailabilityEngine.for_window(start, end).conflicts(start, end)
+
+
+def day_window(day):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    return start, start + timedelta(days=1)
+
+
+def free_slots_for_day(service, day):
+    window_start, window_end = day_window(day)
+    # Never offer slots that have already started
+    now = timezone.now()
+    if window_start < now:
+        step = settings.AVAILABILITY_SLOT_MINUTES * 60
+        elapsed = (now - window_start).total_seconds()
+        window_start += timedelta(seconds=-(-elapsed // step) * step)
+    engine = AvailabilityEngine.for_window(window_start, window_end)
+    return engine.free_slots(timedelta(minutes=service.duration), window_start, window_end)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .user_cache import cache_is_shared, user_cache_version
+
+USER_KEY = 'user:{user_id}:{version}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that loads the logged-in user from the cache instead of the database."""
+
+    def get_user(self, user_id):
+        if not cache_is_shared():
+            # A password change in another process would go unnoticed
+            return super().get_user(user_id)
+        key = USER_KEY.format(user_id=user_id, version=user_cache_version(user_id))
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,57 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Service
+
+# The active service catalog changes only when staff edit it, but every public
+# page and the booking form read it. We keep one copy per process plus one in
+# the shared cache, both keyed by a version number that any edit bumps.
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_SERVICES_KEY = 'catalog:services:{version}'
+
+_local = threading.local()
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Start from a timestamp so an evicted counter never reuses an old version
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def active_services():
+    """Return the active services as a tuple, ordered by id."""
+    version = catalog_version()
+    if getattr(_local, 'version', None) == version:
+        return _local.services
+
+    key = CATALOG_SERVICES_KEY.format(version=version)
+    services = cache.get(key)
+    if services is None:
+        # Read from the primary: a lagging replica must not be cached under the new version
+        services = tuple(Service.objects.using('default').filter(is_active=True).order_by('pk'))
+        cache.set(key, services, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60 * 24))
+
+    _local.version = version
+    _local.services = services
+    return services
+
+
+def get_active_service(pk):
+    for service in active_services():
+        if str(service.pk) == str(pk):
+            return service
+    return None
+
+
+def invalidate_catalog():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Key was never set or has been evicted
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
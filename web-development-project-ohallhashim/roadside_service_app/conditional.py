@@ -0,0 +1,73 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .catalog import catalog_version
+from .models import Booking
+from .user_cache import user_cache_version
+
+# ETags are built from version numbers the app already maintains, so checking
+# one costs cache lookups (or one indexed query) instead of a full render.
+# DEPLOY_VERSION is part of every tag so new templates are served after a deploy.
+
+
+def page_etag(request, *args, **kwargs):
+    # home / services / about: the catalog plus the logged-in/out navbar
+    state = 'auth' if request.user.is_authenticated else 'anon'
+    return f'{settings.DEPLOY_VERSION}-{catalog_version()}-{state}'
+
+
+def user_rows_etag(request, *args, **kwargs):
+    # JSON lists of the user's own bookings / notifications; any change to them
+    # bumps the per-user cache version. Views using it must read the primary
+    # (no @replica_reads): a lagging replica's body would go out under the new tag
+    # and 304s would keep it on the client.
+    if not request.user.is_authenticated:
+        return None
+    key = f'{settings.DEPLOY_VERSION}|{user_cache_version(request.user.pk)}|{request.get_full_path()}'
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def _booking_updated_at(request, booking_id):
+    # condition() asks for the ETag and Last-Modified separately; look the row up once
+    if not hasattr(request, '_booking_updated_at'):
+        request._booking_updated_at = (
+            Booking.objects.filter(pk=booking_id, user=request.user).values_list('updated_at', flat=True).first()
+        )
+    return request._booking_updated_at
+
+
+def booking_etag(request, booking_id):
+    updated_at = _booking_updated_at(request, booking_id)
+    if updated_at is None:
+        return None
+    return f'{settings.DEPLOY_VERSION}-{updated_at.timestamp():.6f}-{catalog_version()}'
+
+
+def booking_last_modified(request, booking_id):
+    return _booking_updated_at(request, booking_id)
+
+
+def conditional_page(etag_func=None, last_modified_func=None):
+    """
+    condition() plus caching headers: shared caches may keep anonymous pages
+    (per Cookie), authenticated pages are private. Either way clients revalidate
+    every time, which is where the 304s come from.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_vary_headers(response, ['Cookie'])
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+            return response
+        return wrapper
+    return decorator
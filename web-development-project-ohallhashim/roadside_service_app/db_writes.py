@@ -0,0 +1,75 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def retry_on_locked(func, retries=None, base_delay=0.05, max_delay=2.0):
+    """
+    Run func() in its own transaction, retrying SQLite lock errors with
+    exponential backoff and jitter. Inside an outer transaction the lock can't
+    be released by retrying, so the error is raised straight away.
+    """
+    retries = settings.SQLITE_WRITE_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            with transaction.atomic():
+                return func()
+        except OperationalError as exc:
+            if attempt == retries or connection.in_atomic_block or not is_lock_error(exc):
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+            logger.info('Database locked; retrying in %.0f ms (attempt %d)', delay * 1000, attempt + 1)
+            time.sleep(delay)
+
+
+def _run_on_writer(func):
+    # Persistent connections on the writer thread can go stale between jobs
+    close_old_connections()
+    try:
+        return retry_on_locked(func)
+    finally:
+        close_old_connections()
+
+
+def writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite-writer')
+    return _writer
+
+
+def serialized_write(func):
+    """
+    Decorator for a self-contained write transaction. The call is retried on
+    lock errors; with SQLITE_WRITE_QUEUE on it also runs on a single writer
+    thread, so writes from this process never contend with each other. Queued
+    calls use the writer's own connection and can't see uncommitted rows of an
+    enclosing transaction, so inside one they run inline instead.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        call = lambda: func(*args, **kwargs)  # noqa: E731
+        if settings.SQLITE_WRITE_QUEUE and not connection.in_atomic_block:
+            # Carry the request's context (e.g. metrics) over to the writer thread
+            return writer().submit(contextvars.copy_context().run, _run_on_writer, call).result()
+        return retry_on_locked(call)
+    return wrapper
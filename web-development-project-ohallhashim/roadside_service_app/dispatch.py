@@ -0,0 +1,278 @@
+import math
+import re
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Booking, Notification, Service, Staff
+from .notifications import notify_many
+from .summaries import bookings_changed
+from .user_cache import invalidate_user_cache
+
+# Bookings still waiting for a technician, and the statuses that keep a technician busy
+OPEN_STATUSES = ('pending', 'confirmed')
+BUSY_STATUSES = ('pending', 'confirmed', 'in_progress')
+AVAILABLE_STAFF_STATUSES = ('active', 'on_call')
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Lightweight rows the matcher works on, so it can run on plain data in benchmarks
+Technician = namedtuple('Technician', 'pk latitude longitude skills')
+Job = namedtuple('Job', 'pk latitude longitude service start end', defaults=(None, None))
+
+_COORDINATES = re.compile(r'(-?\d{1,2}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)')
+
+
+def parse_coordinates(location):
+    """Default geocoder: the mobile app sends GPS fixes as "lat, lon" in the location text."""
+    match = _COORDINATES.search(location or '')
+    if not match:
+        return None
+    latitude, longitude = float(match.group(1)), float(match.group(2))
+    if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+        return latitude, longitude
+    return None
+
+
+def geocode(location):
+    """Return (latitude, longitude) or None using the DISPATCH_GEOCODER callable."""
+    geocoder = getattr(settings, 'DISPATCH_GEOCODER', 'roadside_service_app.dispatch.parse_coordinates')
+    return import_string(geocoder)(location)
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def skills_for(specializations):
+    return frozenset(s.strip().lower() for s in (specializations or '').split(',') if s.strip())
+
+
+def is_qualified(technician, service):
+    # No listed specializations means a generalist who takes any job
+    if not technician.skills:
+        return True
+    service = service.lower()
+    return any(skill in service for skill in technician.skills)
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid (geohash-style buckets) over technicians. A nearest
+    lookup searches rings of cells outwards from the job and stops as soon as
+    no unvisited ring can hold anything closer than the best match so far.
+    """
+
+    def __init__(self, cell_degrees=0.05):
+        self.cell_degrees = cell_degrees
+        self.cells = defaultdict(dict)
+        self.bounds = None
+
+    def cell_of(self, latitude, longitude):
+        return int(math.floor(latitude / self.cell_degrees)), int(math.floor(longitude / self.cell_degrees))
+
+    def insert(self, item):
+        row, col = self.cell_of(item.latitude, item.longitude)
+        self.cells[(row, col)][item.pk] = item
+        if self.bounds is None:
+            self.bounds = [row, row, col, col]
+        else:
+            self.bounds = [min(self.bounds[0], row), max(self.bounds[1], row),
+                           min(self.bounds[2], col), max(self.bounds[3], col)]
+
+    def remove(self, item):
+        cell = self.cell_of(item.latitude, item.longitude)
+        self.cells[cell].pop(item.pk, None)
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def __len__(self):
+        return sum(len(items) for items in self.cells.values())
+
+    def _ring(self, row, col, radius):
+        if radius == 0:
+            yield row, col
+            return
+        for c in range(col - radius, col + radius + 1):
+            yield row - radius, c
+            yield row + radius, c
+        for r in range(row - radius + 1, row + radius):
+            yield r, col - radius
+            yield r, col + radius
+
+    def nearest(self, latitude, longitude, accept=None, max_km=None):
+        """Return (item, km) for the closest item passing `accept`, or (None, None)."""
+        if not self.cells:
+            return None, None
+        row, col = self.cell_of(latitude, longitude)
+        # Smallest width of one cell in km at this latitude (longitude cells shrink towards the poles)
+        cell_km = self.cell_degrees * KM_PER_DEGREE * max(math.cos(math.radians(min(abs(latitude) + 1, 89))), 0.01)
+        max_radius = max(
+            abs(row - self.bounds[0]), abs(row - self.bounds[1]),
+            abs(col - self.bounds[2]), abs(col - self.bounds[3]),
+        )
+        best, best_km = None, None
+        for radius in range(max_radius + 1):
+            # Anything in this ring or beyond is at least (radius - 1) cells away
+            floor_km = max(radius - 1, 0) * cell_km
+            if best is not None and floor_km > best_km:
+                break
+            if max_km is not None and floor_km > max_km:
+                break
+            for cell in self._ring(row, col, radius):
+                for item in self.cells.get(cell, {}).values():
+                    if accept is not None and not accept(item):
+                        continue
+                    km = distance_km(latitude, longitude, item.latitude, item.longitude)
+                    if (best_km is None or km < best_km) and (max_km is None or km <= max_km):
+                        best, best_km = item, km
+        return best, best_km
+
+
+def match(jobs, technicians, max_km=None, cell_degrees=0.05, is_free=None):
+    """
+    Greedy batch assignment: jobs in the given order (earliest first) each take
+    the nearest qualified technician still free - not yet matched in this batch
+    and, if given, passing is_free(technician, job). Returns [(job, technician, km)].
+    """
+    index = GridIndex(cell_degrees)
+    for technician in technicians:
+        index.insert(technician)
+
+    assignments = []
+    for job in jobs:
+        if not index.cells:
+            break
+        technician, km = index.nearest(
+            job.latitude, job.longitude, max_km=max_km,
+            accept=lambda t: is_qualified(t, job.service) and (is_free is None or is_free(t, job)),
+        )
+        if technician is not None:
+            index.remove(technician)
+            assignments.append((job, technician, km))
+    return assignments
+
+
+def available_technicians():
+    rows = (
+        Staff.objects.filter(role='mechanic', status__in=AVAILABLE_STAFF_STATUSES,
+                             latitude__isnull=False, longitude__isnull=False)
+        .values_list('pk', 'latitude', 'longitude', 'specializations')
+    )
+    return [Technician(pk, lat, lon, skills_for(specs)) for pk, lat, lon, specs in rows]
+
+
+def technician_schedules(start, end, technician_id=None):
+    """{technician pk: [(start, end)]} of the busy assigned bookings that can overlap [start, end)."""
+    longest = Service.objects.aggregate(longest=Max('duration'))['longest'] or 0
+    bookings = Booking.objects.filter(
+        assigned_technician__isnull=False,
+        status__in=BUSY_STATUSES,
+        booking_date__lt=end,
+        booking_date__gt=start - timedelta(minutes=longest),
+    )
+    if technician_id is not None:
+        bookings = bookings.filter(assigned_technician=technician_id)
+    schedules = defaultdict(list)
+    for technician, booked, minutes in bookings.values_list('assigned_technician_id', 'booking_date', 'service__duration'):
+        schedules[technician].append((booked, booked + timedelta(minutes=minutes)))
+    return schedules
+
+
+def overlaps(intervals, start, end):
+    return any(busy_start < end and start < busy_end for busy_start, busy_end in intervals)
+
+
+def open_bookings(limit=None):
+    bookings = (
+        Booking.objects.filter(status__in=OPEN_STATUSES, assigned_technician__isnull=True,
+                               latitude__isnull=False, longitude__isnull=False)
+        .select_related('service')
+        .order_by('booking_date', 'pk')
+    )
+    if connection.features.has_select_for_update_skip_locked:
+        # A second dispatcher running at the same time skips the rows this one holds
+        bookings = bookings.select_for_update(skip_locked=True, of=('self',))
+    return bookings[:limit] if limit else bookings
+
+
+def claim(booking, technician_pk, start, end, now):
+    """
+    Assign `booking` to the technician if both are still free, as one conditional
+    UPDATE. The technician's row is written first: on PostgreSQL its row lock makes
+    a concurrent dispatcher wait for this transaction, on SQLite the write takes the
+    database lock, so the free check that follows sees every committed assignment.
+    """
+    if not Staff.objects.filter(pk=technician_pk, status__in=AVAILABLE_STAFF_STATUSES).update(status=F('status')):
+        return False
+    if overlaps(technician_schedules(start, end, technician_pk)[technician_pk], start, end):
+        return False
+    return Booking.objects.filter(
+        pk=booking.pk, assigned_technician__isnull=True, status__in=OPEN_STATUSES,
+    ).update(
+        assigned_technician=technician_pk, assigned_at=now, updated_at=now, version=F('version') + 1,
+    ) == 1
+
+
+def assign_pending_bookings(limit=None, max_km=None, dry_run=False):
+    """
+    Match open, unassigned bookings to the nearest available qualified mechanic
+    with nothing else booked over the same time. A mechanic takes at most one
+    booking per run. Returns [(booking, technician pk, km)].
+    """
+    max_km = max_km if max_km is not None else getattr(settings, 'DISPATCH_MAX_KM', None)
+    with transaction.atomic():
+        bookings = {booking.pk: booking for booking in open_bookings(limit)}
+        jobs = [
+            Job(b.pk, b.latitude, b.longitude, b.service.name,
+                b.booking_date, b.booking_date + timedelta(minutes=b.service.duration))
+            for b in bookings.values()
+        ]
+        if not jobs:
+            return []
+        schedules = technician_schedules(min(job.start for job in jobs), max(job.end for job in jobs))
+        assignments = match(
+            jobs, available_technicians(), max_km=max_km,
+            is_free=lambda technician, job: not overlaps(schedules[technician.pk], job.start, job.end),
+        )
+        if dry_run:
+            return [(bookings[job.pk], technician.pk, km) for job, technician, km in assignments]
+
+        # SQLite has no row locks and a technician's time is never locked, so another
+        # dispatcher may have taken the booking or the technician since the match
+        now = timezone.now()
+        results, loaded = [], []
+        for job, technician, km in assignments:
+            booking = bookings[job.pk]
+            if not claim(booking, technician.pk, job.start, job.end, now):
+                continue
+            loaded.append(booking.tracked_values())
+            booking.assigned_technician_id = technician.pk
+            booking.assigned_at = now
+            booking.updated_at = now
+            booking.version += 1
+            results.append((booking, technician.pk, km))
+        if not results:
+            return results
+        invalidate_user_cache([booking.user_id for booking, _, _ in results])
+        bookings_changed([(old, booking.tracked_values()) for old, (booking, _, _) in zip(loaded, results)])
+        notify_many([
+            Notification(
+                user_id=booking.user_id,
+                notification_type='technician_assigned',
+                title='Technician Assigned',
+                message=f'A technician {km:.1f} km away has been assigned to your {booking.service.name} booking.',
+                related_booking=booking,
+            )
+            for booking, _, km in results
+        ])
+    return results
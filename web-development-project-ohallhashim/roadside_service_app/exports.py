@@ -0,0 +1,106 @@
+import csv
+import json
+import random
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Booking, Payment
+from .routers import replicas
+
+# (column header, values_list lookup) per export. Rows come straight from
+# values_list(), so no model instances are built, and iterator() streams them in
+# chunks (a server-side cursor on PostgreSQL): memory stays flat however many rows.
+EXPORTS = {
+    'bookings': (Booking, [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('booking_date', 'booking_date'),
+        ('status', 'status'),
+        ('payment_status', 'payment_status'),
+        ('username', 'user__username'),
+        ('email', 'user__email'),
+        ('service', 'service__name'),
+        ('price', 'service__price'),
+        ('location', 'location'),
+        ('technician_id', 'assigned_technician_id'),
+        ('stripe_payment_intent_id', 'stripe_payment_intent_id'),
+    ]),
+    'payments': (Payment, [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('booking_id', 'booking_id'),
+        ('booking_date', 'booking__booking_date'),
+        ('username', 'booking__user__username'),
+        ('email', 'booking__user__email'),
+        ('service', 'booking__service__name'),
+        ('amount', 'amount'),
+        ('payment_status', 'payment_status'),
+        ('stripe_payment_intent_id', 'stripe_payment_intent_id'),
+    ]),
+}
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+# Rows per database round trip, and rows per chunk written to the client
+CHUNK_SIZE = 2000
+
+
+class Echo:
+    """A file-like object for csv.writer that hands each line back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def export_queryset(name, queryset=None):
+    """
+    The export's rows (all of them, or those of `queryset`), read from a replica
+    if there is one. They come in table order: sorting would make the database
+    read every row before sending the first.
+    """
+    model, columns = EXPORTS[name]
+    queryset = model.objects.all() if queryset is None else queryset
+    if replicas():
+        queryset = queryset.using(random.choice(replicas()))
+    return queryset.order_by().values_list(*[lookup for _, lookup in columns])
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def export_lines(name, queryset=None, fmt='csv', chunk_size=CHUNK_SIZE):
+    """Yield the export as text, a chunk of lines at a time."""
+    headers = [header for header, _ in EXPORTS[name][1]]
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(headers)
+
+        def encode(row):
+            return writer.writerow([_value(value) for value in row])
+    else:
+        def encode(row):
+            return json.dumps(dict(zip(headers, map(_value, row))), default=str) + '\n'
+
+    lines = []
+    for row in export_queryset(name, queryset).iterator(chunk_size=chunk_size):
+        lines.append(encode(row))
+        if len(lines) == chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def export_response(name, queryset=None, fmt='csv'):
+    content_type, extension = FORMATS[fmt]
+    filename = f'{name}-{timezone.now():%Y%m%d-%H%M%S}.{extension}'
+    return StreamingHttpResponse(
+        export_lines(name, queryset, fmt),
+        content_type=content_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
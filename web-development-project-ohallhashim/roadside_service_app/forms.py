@@ -2,6 +2,9 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth import get_user_model
+from django.forms.models import ModelChoiceIterator
+from .availability import is_available
+from .catalog import active_services, get_active_service
 from .models import Contact, Booking, Service, User
 
 User = get_user_model()
@@ -60,9 +63,39 @@ class UserLoginForm(AuthenticationForm):
     username = forms.CharField(widget=forms.TextInput(attrs={'class': 'input', 'placeholder': 'Username'}))
     password = forms.CharField(widget=forms.PasswordInput(attrs={'class': 'input', 'placeholder': 'Password'}))
 
+class CatalogChoiceIterator(ModelChoiceIterator):
+    # Iterates the cached catalog instead of running the field's queryset
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for service in active_services():
+            yield self.choice(service)
+
+    def __len__(self):
+        return len(active_services()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(active_services())
+
+class ServiceChoiceField(forms.ModelChoiceField):
+    """Active-service picker that renders and validates against the cached catalog."""
+    iterator = CatalogChoiceIterator
+
+    def __init__(self, **kwargs):
+        super().__init__(queryset=Service.objects.filter(is_active=True), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        service = get_active_service(value)
+        if service is None:
+            raise forms.ValidationError(
+                self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value}
+            )
+        return service
+
 class BookingForm(forms.ModelForm):
-    service = forms.ModelChoiceField(
-        queryset=Service.objects.filter(is_active=True),
+    service = ServiceChoiceField(
         widget=forms.Select(attrs={'class': 'select'})
     )
     booking_date = forms.DateTimeField(
@@ -84,6 +117,36 @@ class BookingForm(forms.ModelForm):
         model = Booking
         fields = ['service', 'booking_date', 'location', 'vehicle_info', 'notes']
 
+    def clean(self):
+        cleaned_data = super().clean()
+        service = cleaned_data.get('service')
+        booking_date = cleaned_data.get('booking_date')
+        if service and booking_date and not is_available(service, booking_date):
+            self.add_error('booking_date', 'All technicians are booked at that time. Please pick another slot.')
+        return cleaned_data
+
+class BookingAdminForm(forms.ModelForm):
+    # The version the editor opened; saving over a newer one would undo that change
+    loaded_version = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
+    class Meta:
+        model = Booking
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['loaded_version'].initial = self.instance.version
+
+    def clean(self):
+        cleaned_data = super().clean()
+        loaded = cleaned_data.get('loaded_version')
+        if self.instance.pk and loaded is not None and loaded != self.instance.version:
+            raise forms.ValidationError(
+                'This booking was changed by someone else after you opened it. Reload the page and make your change again.'
+            )
+        return cleaned_data
+
 class UserProfileForm(forms.ModelForm):
     class Meta:
         model = User
@@ -0,0 +1,54 @@
+import os
+import threading
+import time
+import uuid
+
+# UUID version 7 (RFC 9562): a 48-bit Unix timestamp in milliseconds, then
+# random bits. Ids made later sort after earlier ones, so new rows land at the
+# right-hand edge of the primary key and foreign key B-trees instead of at a
+# random page, while staying unguessable and a drop-in uuid for <uuid:...> URLs.
+# Within one millisecond the 12 bits after the version count up, so ids from
+# one process stay in order.
+
+_lock = threading.Lock()
+_last = (0, 0)  # (milliseconds, counter) of the last id made here
+
+
+def _build(milliseconds, counter, random_bits):
+    value = (milliseconds & (1 << 48) - 1) << 80
+    value |= 0x7 << 76  # version
+    value |= (counter & 0xFFF) << 64
+    value |= 0b10 << 62  # RFC 9562 variant
+    value |= random_bits & (1 << 62) - 1
+    return uuid.UUID(int=value)
+
+
+def uuid7(when=None):
+    """
+    A new version 7 UUID for now, or for `when` (an aware datetime) when
+    back-filling ids for existing rows.
+    """
+    random_bits = int.from_bytes(os.urandom(8))
+    if when is not None:
+        milliseconds = int(when.timestamp() * 1000)
+        return _build(milliseconds, random_bits >> 52, random_bits)
+
+    global _last
+    milliseconds = time.time_ns() // 1_000_000
+    with _lock:
+        last_ms, last_counter = _last
+        if milliseconds <= last_ms:
+            # Same millisecond (or the clock stepped back): keep counting from the last id
+            milliseconds, counter = last_ms, last_counter + 1
+            if counter > 0xFFF:
+                milliseconds, counter = last_ms + 1, 0
+        else:
+            # A random start leaves room to count and keeps ids hard to guess
+            counter = (random_bits >> 52) & 0x3FF
+        _last = (milliseconds, counter)
+    return _build(milliseconds, counter, random_bits)
+
+
+def uuid7_time(value):
+    """Milliseconds since the epoch encoded in a version 7 UUID, or None for other versions."""
+    return value.int >> 80 if value.version == 7 else None
@@ -0,0 +1,186 @@
+"""
+Database-backed background jobs.
+
+A view calls `some_task.delay(**kwargs)`, which inserts a Job row in the
+view's own transaction (a rolled-back request leaves no job behind) and returns
+at once; `manage.py run_workers` claims and runs the rows. Delivery is
+at-least-once: a job whose worker died is run again after JOB_LOCK_TIMEOUT, so
+tasks must be safe to repeat.
+"""
+import logging
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .db_writes import retry_on_locked
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+# Due jobs a SQLite worker tries to claim per poll before giving up to the others
+CLAIM_CANDIDATES = 10
+# Longest a worker waits after an error of its own (not a job's) before trying again
+WORKER_MAX_BACKOFF_SECONDS = 30
+
+
+class Task:
+    def __init__(self, func, name, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def delay(self, **kwargs):
+        """Queue a run with JSON-serializable kwargs."""
+        return enqueue(self.name, kwargs, priority=self.priority, max_attempts=self.max_attempts)
+
+
+def task(name=None, priority=0, max_attempts=None):
+    """Register a function as a background task, runnable by name from a Job row."""
+    def decorator(func):
+        registered = Task(
+            func,
+            name or func.__name__,
+            priority,
+            max_attempts or settings.JOB_MAX_ATTEMPTS,
+        )
+        TASKS[registered.name] = registered
+        return registered
+    return decorator
+
+
+def enqueue(task_name, kwargs=None, priority=0, run_at=None, max_attempts=None):
+    return Job.objects.create(
+        task=task_name,
+        kwargs=kwargs or {},
+        priority=priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def ready_jobs():
+    return Job.objects.filter(status='queued', run_at__lte=timezone.now()).order_by('-priority', 'run_at', 'pk')
+
+
+def _take(queryset, worker_name):
+    return queryset.update(
+        status='running', locked_by=worker_name, locked_at=timezone.now(), attempts=F('attempts') + 1
+    )
+
+
+def claim_job(worker_name):
+    """Mark the next due job as running for worker_name and return it (None if idle)."""
+    if connection.features.has_select_for_update_skip_locked:
+        # Workers skip the rows other workers hold instead of queueing behind them
+        with transaction.atomic():
+            job = ready_jobs().select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            _take(Job.objects.filter(pk=job.pk), worker_name)
+        job.refresh_from_db()
+        return job
+
+    # SQLite has no row locks: a conditional UPDATE decides which worker gets a
+    # job, and the losers try the next candidate
+    for pk in ready_jobs().values_list('pk', flat=True)[:CLAIM_CANDIDATES]:
+        if retry_on_locked(lambda: _take(Job.objects.filter(pk=pk, status='queued'), worker_name)):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def retry_delay(attempt):
+    # Exponential backoff with jitter, so a failing dependency isn't hit in lockstep
+    delay = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+    return timedelta(seconds=delay * random.uniform(0.5, 1.5))
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome. Returns True if it succeeded."""
+    try:
+        registered = TASKS.get(job.task)
+        if registered is None:
+            raise LookupError(f'Unknown task {job.task!r}')
+        registered.func(**job.kwargs)
+    except Exception as exc:
+        final = job.attempts >= job.max_attempts
+        logger.exception('Job %s (%s) failed on attempt %d%s', job.pk, job.task, job.attempts, '; giving up' if final else '')
+        now = timezone.now()
+        changes = {'status': 'failed', 'finished_at': now} if final else {'status': 'queued', 'run_at': now + retry_delay(job.attempts)}
+        retry_on_locked(lambda: Job.objects.filter(pk=job.pk).update(
+            locked_by='', locked_at=None, last_error=repr(exc), **changes
+        ))
+        return False
+    retry_on_locked(lambda: Job.objects.filter(pk=job.pk).update(
+        status='done', finished_at=timezone.now(), locked_at=None, last_error=None
+    ))
+    return True
+
+
+def requeue_stale():
+    """Give jobs whose worker stopped responding (JOB_LOCK_TIMEOUT) back to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    stale = Job.objects.filter(status='running', locked_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=timezone.now(), last_error='worker lost'
+    )
+    requeued = stale.update(status='queued', locked_by='', locked_at=None, run_at=timezone.now())
+    return requeued + failed
+
+
+def run_pending(worker_name='inline', limit=None):
+    """Run due jobs in this thread until none are left (or `limit` have run)."""
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim_job(worker_name)
+        if job is None:
+            break
+        run_job(job)
+        ran += 1
+    return ran
+
+
+def work(worker_name, stop, poll_seconds=None):
+    """Worker thread loop: claim and run jobs until `stop` (a threading.Event) is set."""
+    poll_seconds = settings.JOB_POLL_SECONDS if poll_seconds is None else poll_seconds
+    errors = 0
+    try:
+        while not stop.is_set():
+            try:
+                close_old_connections()
+                job = claim_job(worker_name)
+                if job is not None:
+                    run_job(job)
+                errors = 0
+            except Exception:
+                # e.g. "database is locked" or a dropped connection: keep the thread,
+                # back off and try again on a fresh connection
+                errors += 1
+                logger.exception('Worker %s failed to claim or record a job', worker_name)
+                connection.close()
+                stop.wait(min(WORKER_MAX_BACKOFF_SECONDS, poll_seconds * 2 ** errors))
+                continue
+            if job is None:
+                stop.wait(poll_seconds)
+    finally:
+        connection.close()
+
+
+def start_workers(count, prefix, stop):
+    threads = [
+        threading.Thread(target=work, args=(f'{prefix}-{i}', stop), name=f'{prefix}-{i}')
+        for i in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    return threads
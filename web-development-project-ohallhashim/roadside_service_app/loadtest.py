@@ -0,0 +1,174 @@
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from importlib import import_module
+
+import requests
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .catalog import active_services
+from .models import Booking, User
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+# GET pages and APIs from urls.py. POST-only views (payment, webhook, mark read)
+# have their own benchmarks (bench_stripe, fake_stripe_events).
+def endpoints():
+    service = active_services()[0] if active_services() else None
+    tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+    paths = {
+        'home': lambda user: reverse('home'),
+        'services': lambda user: reverse('services'),
+        'about': lambda user: reverse('about'),
+        'dashboard': lambda user: reverse('dashboard'),
+        'booking_history': lambda user: reverse('booking_history'),
+        'booking_detail': lambda user: reverse('booking_detail', args=[user['booking_id']]),
+        'notifications': lambda user: reverse('notifications'),
+        'booking_history_api': lambda user: reverse('booking_history_api'),
+        'notifications_api': lambda user: reverse('notifications_api'),
+    }
+    if service is not None:
+        paths['availability_api'] = lambda user: f"{reverse('availability_api')}?service={service.pk}&date={tomorrow}"
+    return paths
+
+
+def login_sessions(count):
+    """
+    Sessions for up to `count` recently active customers, created directly in the
+    session store so no password is needed. Returns [{'user_id', 'booking_id', 'session_key'}].
+    """
+    store_class = import_module(settings.SESSION_ENGINE).SessionStore
+    seen = {}
+    for user_id, booking_id in Booking.objects.order_by('-created_at').values_list('user_id', 'id')[:count * 20]:
+        seen.setdefault(user_id, booking_id)
+        if len(seen) >= count:
+            break
+    users = User.objects.in_bulk(list(seen))
+    sessions = []
+    for user_id, booking_id in seen.items():
+        store = store_class()
+        store[SESSION_KEY] = str(user_id)
+        store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        store[HASH_SESSION_KEY] = users[user_id].get_session_auth_hash()
+        store.create()
+        sessions.append({'user_id': user_id, 'booking_id': booking_id, 'session_key': store.session_key})
+    return sessions
+
+
+def end_sessions(sessions):
+    store_class = import_module(settings.SESSION_ENGINE).SessionStore
+    for session in sessions:
+        store_class(session['session_key']).delete()
+
+
+class LoadTest:
+    """
+    Drive the GET endpoints with `concurrency` threads for `duration` seconds,
+    each request as a random logged-in customer. Without a base_url requests go
+    through Django's test Client in this process; with one they go over HTTP
+    (keep-alive session per thread) to a running server.
+    """
+
+    def __init__(self, sessions, paths, concurrency=8, duration=30, warmup=2, base_url=None, host='localhost',
+                 seed=None):
+        self.sessions = sessions
+        self.paths = paths
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.host = host
+        self.seed = seed
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def run(self):
+        started = time.perf_counter()
+        self.measure_from = started + self.warmup
+        self.deadline = self.measure_from + self.duration
+        threads = [threading.Thread(target=self.worker, args=(i,)) for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.results()
+
+    def worker(self, number):
+        rng = random.Random(None if self.seed is None else self.seed + number)
+        names = list(self.paths)
+        fetch = self.http_fetcher() if self.base_url else self.client_fetcher()
+        samples, errors = defaultdict(list), defaultdict(int)
+        try:
+            while True:
+                sent = time.perf_counter()
+                if sent >= self.deadline:
+                    break
+                name = rng.choice(names)
+                session = rng.choice(self.sessions)
+                try:
+                    ok = fetch(self.paths[name](session), session['session_key'])
+                except requests.RequestException:
+                    ok = False
+                elapsed = time.perf_counter() - sent
+                if sent >= self.measure_from:
+                    samples[name].append(elapsed)
+                    if not ok:
+                        errors[name] += 1
+        finally:
+            connections.close_all()
+        with self._lock:
+            for name, values in samples.items():
+                self.samples[name].extend(values)
+            for name, count in errors.items():
+                self.errors[name] += count
+
+    def client_fetcher(self):
+        client = Client(raise_request_exception=False, HTTP_HOST=self.host)
+
+        def fetch(path, session_key):
+            client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+            return client.get(path).status_code < 400
+        return fetch
+
+    def http_fetcher(self):
+        http = requests.Session()
+
+        def fetch(path, session_key):
+            http.cookies.set(settings.SESSION_COOKIE_NAME, session_key)
+            response = http.get(self.base_url + path, allow_redirects=False, timeout=30)
+            return response.status_code < 400
+        return fetch
+
+    def results(self):
+        def summary(samples, errors):
+            return {
+                'requests': len(samples),
+                'errors': errors,
+                'throughput_rps': round(len(samples) / self.duration, 2),
+                'mean_ms': round(statistics.mean(samples) * 1000, 2),
+                'p50_ms': round(percentile(samples, 50) * 1000, 2),
+                'p95_ms': round(percentile(samples, 95) * 1000, 2),
+                'p99_ms': round(percentile(samples, 99) * 1000, 2),
+                'max_ms': round(max(samples) * 1000, 2),
+            }
+
+        every = [sample for samples in self.samples.values() for sample in samples]
+        return {
+            'endpoints': {
+                name: summary(samples, self.errors[name]) for name, samples in sorted(self.samples.items())
+            },
+            'total': summary(every, sum(self.errors.values())) if every else None,
+        }
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from roadside_service_app.retention import apply_policy
+
+
+class Command(BaseCommand):
+    help = (
+        'Archive and delete notifications and finished bookings older than RETENTION_POLICIES allow, '
+        'in small throttled chunks. Run it nightly from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('policies', nargs='*', help='Policies to apply (default: all)')
+        parser.add_argument('--chunk-size', type=int, default=settings.RETENTION_CHUNK_SIZE)
+        parser.add_argument('--pause', type=float, default=settings.RETENTION_CHUNK_PAUSE, help='Seconds between chunks')
+        parser.add_argument('--time-budget', type=float, help='Stop each policy after this many seconds; the next run resumes')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would go')
+
+    def handle(self, *args, **options):
+        for name in options['policies'] or settings.RETENTION_POLICIES:
+            stats = apply_policy(
+                name,
+                chunk_size=options['chunk_size'],
+                pause=options['pause'],
+                time_budget=options['time_budget'],
+                dry_run=options['dry_run'],
+            )
+            if options['dry_run']:
+                self.stdout.write(f"{name}: {stats['rows']} rows past retention")
+                continue
+            message = f"{name}: archived {stats['rows']} rows in {stats['chunks']} chunks, {stats['elapsed']:.2f}s"
+            if stats['complete']:
+                self.stdout.write(self.style.SUCCESS(message))
+            else:
+                self.stdout.write(self.style.WARNING(f'{message}; time budget spent, more remain'))
@@ -0,0 +1,65 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from roadside_service_app.dispatch import Job, Technician, distance_km, is_qualified, match
+
+SERVICES = ['Flat Tire Repair', 'Battery Jump-start', 'Fuel Delivery', 'Towing Service',
+            'Lockout Assistance', 'Emergency Repairs']
+SKILLS = ['tire', 'battery', 'fuel', 'towing', 'lockout', 'repair']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark batch dispatch on synthetic bookings and technicians (in memory, no database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=10_000)
+        parser.add_argument('--technicians', type=int, default=2_000)
+        parser.add_argument('--radius-km', type=float, default=60.0, help='Spread of points around Provo, UT')
+        parser.add_argument('--cell-degrees', type=float, default=0.05)
+        parser.add_argument('--max-km', type=float, default=100.0)
+        parser.add_argument('--brute-force', action='store_true', help='Also time the O(bookings x technicians) scan')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        spread = options['radius_km'] / 111.32
+
+        def point():
+            return 40.2338 + rng.uniform(-spread, spread), -111.6585 + rng.uniform(-spread, spread)
+
+        technicians = []
+        for pk in range(options['technicians']):
+            skills = frozenset(rng.sample(SKILLS, rng.randint(0, 3)))
+            technicians.append(Technician(pk, *point(), skills))
+        jobs = [Job(pk, *point(), rng.choice(SERVICES)) for pk in range(options['bookings'])]
+
+        started = time.perf_counter()
+        assignments = match(jobs, technicians, max_km=options['max_km'], cell_degrees=options['cell_degrees'])
+        elapsed = time.perf_counter() - started
+        mean_km = sum(km for _, _, km in assignments) / len(assignments) if assignments else 0
+
+        self.stdout.write(f"{options['bookings']} open bookings x {options['technicians']} technicians")
+        self.stdout.write(self.style.SUCCESS(
+            f'grid index: {len(assignments)} assigned in {elapsed * 1000:.0f} ms '
+            f'({elapsed / max(len(assignments), 1) * 1e6:.0f} us per assignment, mean {mean_km:.1f} km)'
+        ))
+
+        if options['brute_force']:
+            started = time.perf_counter()
+            free = dict((t.pk, t) for t in technicians)
+            assigned = 0
+            for job in jobs:
+                if not free:
+                    break
+                best = min(
+                    (t for t in free.values() if is_qualified(t, job.service)),
+                    key=lambda t: distance_km(job.latitude, job.longitude, t.latitude, t.longitude),
+                    default=None,
+                )
+                if best is not None:
+                    del free[best.pk]
+                    assigned += 1
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'brute force: {assigned} assigned in {elapsed * 1000:.0f} ms')
@@ -0,0 +1,121 @@
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from roadside_service_app.db_writes import serialized_write
+from roadside_service_app.loadtest import percentile
+from roadside_service_app.models import Booking, Service, StripeEvent, User
+from roadside_service_app.notifications import notify
+from roadside_service_app.seeding import seed_users
+
+TUNED_OPTIONS = {
+    'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': 20,
+}
+
+# (connection OPTIONS, lock retries, single writer thread)
+MODES = {
+    'stock': ({'init_command': 'PRAGMA journal_mode=DELETE; PRAGMA synchronous=FULL', 'timeout': 5}, 0, False),
+    'tuned': (TUNED_OPTIONS, 5, False),
+    'queue': (TUNED_OPTIONS, 5, True),
+}
+
+BENCH_LOCATION = 'bench_sqlite_writes'
+
+
+def book(user_id, service):
+    # Shaped like book_service: an availability read, then the booking and its notification
+    start = timezone.now() + timedelta(days=1)
+    Booking.objects.filter(booking_date__range=(start, start + timedelta(minutes=service.duration))).count()
+    booking = Booking.objects.create(user_id=user_id, service=service, booking_date=start, location=BENCH_LOCATION)
+    notify(booking.user, 'booking_confirmed', 'Booking Confirmed', 'Benchmark booking.', related_booking=booking)
+
+
+def receive_webhook():
+    StripeEvent.objects.create(event_id=f'evt_bench_{uuid.uuid4().hex}', event_type='bench', payload={})
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent write throughput on SQLite with the stock settings, the tuned '
+        'settings (WAL, BEGIN IMMEDIATE, retries) and the single-writer queue. Run it against '
+        'a copy of the database; it removes its own rows afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--writes', type=int, default=100, help='Writes per thread')
+        parser.add_argument('--modes', default='stock,tuned,queue')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark is for the SQLite backend.')
+        modes = options['modes'].split(',')
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+        service = Service.objects.first()
+        if service is None:
+            raise CommandError('Seed the service catalog first (manage.py setup_services).')
+
+        user_ids = seed_users(options['threads'], prefix='sqlitebench')
+        saved_options = connections.settings['default'].get('OPTIONS', {})
+        try:
+            for mode in modes:
+                self.report(mode, self.run(mode, user_ids, service, options['threads'], options['writes']))
+        finally:
+            connections.close_all()
+            connections.settings['default']['OPTIONS'] = saved_options
+            StripeEvent.objects.filter(event_id__startswith='evt_bench_').delete()
+            User.objects.filter(pk__in=user_ids).delete()
+
+    def run(self, mode, user_ids, service, threads, writes):
+        db_options, retries, queue = MODES[mode]
+        # Every thread opens a fresh connection with this mode's options
+        connections.close_all()
+        connections.settings['default']['OPTIONS'] = dict(db_options)
+        latencies, failures = [], []
+        lock = threading.Lock()
+
+        def worker(user_id):
+            mine, failed = [], 0
+            write_booking = serialized_write(lambda: book(user_id, service))
+            write_event = serialized_write(receive_webhook)
+            try:
+                for i in range(writes):
+                    started = time.perf_counter()
+                    try:
+                        (write_event if i % 4 == 3 else write_booking)()
+                        mine.append(time.perf_counter() - started)
+                    except OperationalError:
+                        failed += 1
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(mine)
+                failures.append(failed)
+
+        with override_settings(SQLITE_WRITE_RETRIES=retries, SQLITE_WRITE_QUEUE=queue):
+            started = time.perf_counter()
+            pool = [threading.Thread(target=worker, args=(user_id,)) for user_id in user_ids[:threads]]
+            for thread in pool:
+                thread.start()
+            for thread in pool:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        return {'elapsed': elapsed, 'latencies': latencies, 'failed': sum(failures)}
+
+    def report(self, mode, result):
+        done = len(result['latencies'])
+        line = f"{mode:<6} {done / result['elapsed']:8.0f} writes/s  {result['failed']:5d} failed (database is locked)"
+        if done:
+            line += (f"  p50 {percentile(result['latencies'], 50) * 1000:6.1f} ms"
+                     f"  p99 {percentile(result['latencies'], 99) * 1000:7.1f} ms")
+        self.stdout.write(line)
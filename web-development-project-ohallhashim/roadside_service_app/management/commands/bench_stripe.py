@@ -0,0 +1,73 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from roadside_service_app.loadtest import percentile
+from roadside_service_app.models import Booking
+from roadside_service_app.stripe_client import aensure_payment_intent, ensure_payment_intent
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure payment-intent latency under concurrency against the configured Stripe API '
+        '(normally manage.py stripe_stub via STRIPE_API_BASE)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--mode', choices=['threads', 'async'], default='async')
+        parser.add_argument('--reuse', action='store_true', help='Bookings already have an intent (retrieve path)')
+
+    def handle(self, *args, **options):
+        if not settings.STRIPE_API_BASE:
+            raise CommandError('Set STRIPE_API_BASE to a stub server; this benchmark must not hit api.stripe.com.')
+        bookings = list(Booking.objects.with_related()[:options['requests']])
+        if not bookings:
+            raise CommandError('No bookings to create intents for.')
+        if not options['reuse']:
+            for booking in bookings:
+                booking.stripe_payment_intent_id = None
+        jobs = [bookings[i % len(bookings)] for i in range(options['requests'])]
+
+        started = time.perf_counter()
+        if options['mode'] == 'threads':
+            latencies = self.run_threads(jobs, options['concurrency'])
+        else:
+            latencies = asyncio.run(self.run_async(jobs, options['concurrency']))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"{options['mode']}: {len(latencies)} calls, concurrency {options['concurrency']}, "
+                          f"{len(latencies) / elapsed:.0f} calls/s")
+        for pct in (50, 95, 99):
+            self.stdout.write(f'  p{pct}: {percentile(latencies, pct) * 1000:.1f} ms')
+        self.stdout.write(f'  mean: {statistics.mean(latencies) * 1000:.1f} ms')
+
+    @staticmethod
+    def timed_call(booking):
+        started = time.perf_counter()
+        ensure_payment_intent(booking)
+        return time.perf_counter() - started
+
+    @staticmethod
+    async def atimed_call(booking):
+        started = time.perf_counter()
+        await aensure_payment_intent(booking)
+        return time.perf_counter() - started
+
+    def run_threads(self, jobs, concurrency):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(self.timed_call, jobs))
+
+    async def run_async(self, jobs, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(booking):
+            async with semaphore:
+                return await self.atimed_call(booking)
+
+        return await asyncio.gather(*(one(booking) for booking in jobs))
@@ -0,0 +1,90 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, models, transaction
+
+from roadside_service_app.ids import uuid7
+
+KEYS = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+PAYLOAD = 'x' * 200  # About the width of a booking row
+
+
+def index_size(table):
+    """Bytes used by the table's indexes, or None if the database can't tell."""
+    with connection.cursor() as cursor:
+        try:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_indexes_size(%s)', [table])
+            elif connection.vendor == 'sqlite':
+                # Needs SQLite built with SQLITE_ENABLE_DBSTAT_VTAB
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name IN "
+                    "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)", [table]
+                )
+            else:
+                return None
+        except DatabaseError:
+            return None
+        return cursor.fetchone()[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare random (v4) and time-ordered (v7) UUID primary keys: insert rate, '
+        'lookup time and index size, in scratch tables that are dropped afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--lookups', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        field = models.UUIDField()
+        column = connection.data_types['UUIDField']
+        qn = connection.ops.quote_name
+        for name, make_key in KEYS.items():
+            table = f'bench_uuid_keys_{name}'
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS {qn(table)}')
+                cursor.execute(f'CREATE TABLE {qn(table)} (id {column} PRIMARY KEY, payload text NOT NULL)')
+            try:
+                self.run(name, table, make_key, field, options)
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {qn(table)}')
+
+    def run(self, name, table, make_key, field, options):
+        qn = connection.ops.quote_name
+        insert = f'INSERT INTO {qn(table)} (id, payload) VALUES (%s, %s)'
+        keys = []
+        started = time.perf_counter()
+        for start in range(0, options['rows'], options['batch_size']):
+            batch = [make_key() for _ in range(min(options['batch_size'], options['rows'] - start))]
+            keys.extend(batch)
+            # One transaction per batch, like bookings arriving over time
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(insert, [
+                    (field.get_db_prep_value(key, connection), PAYLOAD) for key in batch
+                ])
+        insert_seconds = time.perf_counter() - started
+
+        sample = random.sample(keys, min(options['lookups'], len(keys)))
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            for key in sample:
+                cursor.execute(f'SELECT payload FROM {qn(table)} WHERE id = %s', [field.get_db_prep_value(key, connection)])
+                cursor.fetchone()
+        lookup_seconds = time.perf_counter() - started
+
+        size = index_size(table)
+        size = f'{size / 1024 / 1024:.1f} MB' if size is not None else 'n/a'
+        self.stdout.write(
+            f'{name}: {len(keys) / insert_seconds:,.0f} inserts/s, '
+            f'{lookup_seconds / len(sample) * 1e6:.1f} us/lookup, index {size}'
+        )
@@ -0,0 +1,113 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from roadside_service_app.models import Booking, Notification
+from roadside_service_app.seeding import seed_bookings, seed_notifications, seed_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a benchmark database and report EXPLAIN plans and timings for the per-user hot '
+        'queries with and without the composite indexes. Do not run against production: '
+        'the indexes are dropped temporarily to measure the "before" case.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Bookings and notifications to seed (each)')
+        parser.add_argument('--users', type=int, default=10_000, help='Customers to spread the rows across')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query (median is reported)')
+        parser.add_argument('--skip-seed', action='store_true', help='Reuse rows from a previous run')
+        parser.add_argument('--no-drop', action='store_true', help='Only measure the current (indexed) schema')
+
+    def handle(self, *args, **options):
+        if options['skip_seed']:
+            top = Booking.objects.values('user').annotate(n=Count('pk')).order_by('-n').first()
+            if top is None:
+                raise CommandError('No bookings found; run without --skip-seed first.')
+            user_id = top['user']
+        else:
+            user_id = self.seed(options)
+
+        queries = self.hot_queries(user_id)
+        self.analyze()
+        after = self.measure(queries, options['repeat'])
+
+        before = None
+        if not options['no_drop']:
+            indexes = [(Booking, index) for index in Booking._meta.indexes]
+            indexes += [(Notification, index) for index in Notification._meta.indexes]
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.remove_index(model, index)
+            try:
+                self.analyze()
+                before = self.measure(queries, options['repeat'])
+            finally:
+                with connection.schema_editor() as editor:
+                    for model, index in indexes:
+                        editor.add_index(model, index)
+                self.analyze()
+
+        self.report(queries, before, after)
+
+    def seed(self, options):
+        self.stdout.write(f"Seeding {options['users']} users, {options['rows']} bookings and notifications...")
+        user_ids = seed_users(options['users'], batch_size=options['batch_size'], prefix='idxbench')
+
+        def progress(label):
+            def report(done):
+                if done % (options['batch_size'] * 20) == 0 or done == options['rows']:
+                    self.stdout.write(f'  {label}: {done}')
+            return report
+
+        seed_bookings(options['rows'], user_ids, batch_size=options['batch_size'], progress=progress('bookings'))
+        seed_notifications(options['rows'], user_ids, batch_size=options['batch_size'], progress=progress('notifications'))
+        # skewed_index() gives the first account the largest share, i.e. the worst case
+        return user_ids[0]
+
+    def hot_queries(self, user_id):
+        now = timezone.now()
+        return [
+            ('booking history page', Booking.objects.filter(user_id=user_id).order_by('-created_at', '-pk')[:20]),
+            ('dashboard unread notifications',
+             Notification.objects.filter(user_id=user_id, is_read=False).order_by('-created_at')[:5]),
+            ('notification list page', Notification.objects.filter(user_id=user_id).order_by('-created_at', '-pk')[:20]),
+            ('pending bookings next 24h',
+             Booking.objects.filter(status='pending', booking_date__range=(now, now + timedelta(days=1)))
+             .order_by('booking_date')[:500]),
+        ]
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def measure(self, queries, repeat):
+        results = []
+        for _, queryset in queries:
+            plan = queryset.explain()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results.append({'plan': plan, 'median_ms': statistics.median(timings)})
+        return results
+
+    def report(self, queries, before, after):
+        for position, (label, _) in enumerate(queries):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label}'))
+            if before:
+                self.stdout.write(f"  before: {before[position]['median_ms']:.2f} ms")
+                self.stdout.write('    ' + before[position]['plan'].replace('\n', '\n    '))
+            self.stdout.write(f"  after:  {after[position]['median_ms']:.2f} ms")
+            self.stdout.write('    ' + after[position]['plan'].replace('\n', '\n    '))
+            if before and after[position]['median_ms']:
+                speedup = before[position]['median_ms'] / after[position]['median_ms']
+                self.stdout.write(self.style.SUCCESS(f'  speedup: {speedup:.1f}x'))
@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from roadside_service_app.ids import uuid7
+from roadside_service_app.models import Booking, BookingIdAlias, Notification, Payment, SearchEntry
+from roadside_service_app.user_cache import invalidate_user_cache
+
+# Only finished bookings are converted: Stripe keeps the booking id in each
+# payment intent's metadata, and a webhook for a booking still awaiting payment
+# has to find it under that id.
+FINISHED = ('completed', 'cancelled')
+
+
+def _remap(model, column, pairs, where=''):
+    """UPDATE ... SET column = new WHERE column = old: an indexed lookup per pair, in one round trip."""
+    table, column = connection.ops.quote_name(model._meta.db_table), connection.ops.quote_name(column)
+    with connection.cursor() as cursor:
+        cursor.executemany(f'UPDATE {table} SET {column} = %s WHERE {column} = %s{where}', pairs)
+
+
+def convert_chunk(bookings):
+    """Give `bookings` [(id, user_id, created_at)] time-ordered ids; the old ones stay as aliases."""
+    mapping = {pk: uuid7(created_at) for pk, _, created_at in bookings}
+    prep = Booking._meta.pk.get_db_prep_value
+    pairs = [(prep(new, connection), prep(old, connection)) for old, new in mapping.items()]
+    # The foreign keys are checked at commit (deferred on SQLite and PostgreSQL),
+    # so the booking and the rows pointing at it can change in either order
+    with transaction.atomic():
+        _remap(Booking, 'id', pairs)
+        _remap(Payment, 'booking_id', pairs)
+        _remap(Notification, 'related_booking_id', pairs)
+        _remap(SearchEntry, 'object_id', [(new.hex, old.hex) for old, new in mapping.items()], " AND kind = 'booking'")
+        BookingIdAlias.objects.bulk_create([
+            BookingIdAlias(old_id=old, booking_id=new) for old, new in mapping.items()
+        ])
+        # Cached pages link to the old ids
+        invalidate_user_cache([user_id for _, user_id, _ in bookings])
+    return len(mapping)
+
+
+class Command(BaseCommand):
+    help = (
+        'Give finished bookings made before time-ordered ids a UUIDv7 id from their created_at. '
+        'Old links keep working through BookingIdAlias. Safe to stop and re-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds between chunks')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the bookings to convert')
+
+    def handle(self, *args, **options):
+        queryset = Booking.objects.filter(status__in=FINISHED).order_by('pk')
+        converted = scanned = 0
+        started = time.monotonic()
+        last = None
+        while True:
+            chunk = queryset if last is None else queryset.filter(pk__gt=last)
+            rows = list(chunk.values_list('pk', 'user_id', 'created_at')[:options['chunk_size']])
+            if not rows:
+                break
+            last = rows[-1][0]
+            scanned += len(rows)
+            # Converted ids sort before the random ones and are passed over
+            rows = [row for row in rows if row[0].version != 7]
+            if rows and not options['dry_run']:
+                converted += convert_chunk(rows)
+                time.sleep(options['pause'])
+            elif rows:
+                converted += len(rows)
+        verb = 'would convert' if options['dry_run'] else 'converted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {converted} of {scanned} finished bookings in {time.monotonic() - started:.2f}s'
+        ))
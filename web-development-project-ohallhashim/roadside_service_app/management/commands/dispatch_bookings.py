@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from roadside_service_app.dispatch import assign_pending_bookings
+
+
+class Command(BaseCommand):
+    help = 'Assign open bookings to the nearest available, qualified mechanic'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Only consider the N earliest open bookings')
+        parser.add_argument('--max-km', type=float, help='Override DISPATCH_MAX_KM')
+        parser.add_argument('--dry-run', action='store_true', help='Show the matches without saving them')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        results = assign_pending_bookings(limit=options['limit'], max_km=options['max_km'], dry_run=options['dry_run'])
+        elapsed = time.perf_counter() - started
+
+        if options['verbosity'] > 1:
+            for booking, technician_pk, km in results:
+                self.stdout.write(f'  booking {booking.pk} -> staff {technician_pk} ({km:.1f} km)')
+        verb = 'Would assign' if options['dry_run'] else 'Assigned'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(results)} bookings in {elapsed * 1000:.0f} ms'))
@@ -0,0 +1,56 @@
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from roadside_service_app.exports import CHUNK_SIZE, EXPORTS, FORMATS, export_lines
+
+
+def aware_datetime(value):
+    """An ISO date or datetime; one without an offset is in the current time zone."""
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None and (day := parse_date(value)) is not None:
+            parsed = datetime.combine(day, datetime.min.time())
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise argparse.ArgumentTypeError(f'{value!r} is not an ISO date or datetime')
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+class Command(BaseCommand):
+    help = 'Stream bookings or payments, with their service and customer fields, as CSV or JSON lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+        parser.add_argument('--since', type=aware_datetime, help='Only rows created at or after this ISO date or datetime')
+        parser.add_argument('--until', type=aware_datetime, help='Only rows created before this ISO date or datetime')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        model, _ = EXPORTS[options['export']]
+        queryset = model.objects.all()
+        if options['since']:
+            queryset = queryset.filter(created_at__gte=options['since'])
+        if options['until']:
+            queryset = queryset.filter(created_at__lt=options['until'])
+
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        started = time.perf_counter()
+        size = 0
+        try:
+            for chunk in export_lines(options['export'], queryset, options['format'], options['chunk_size']):
+                output.write(chunk)
+                size += len(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        # Progress goes to stderr so stdout stays a clean export
+        self.stderr.write(f'Exported {size / 1e6:.1f} MB in {time.perf_counter() - started:.2f}s')
@@ -0,0 +1,88 @@
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from roadside_service_app.models import Booking
+from roadside_service_app.webhooks import sign_payload
+
+
+class Command(BaseCommand):
+    help = (
+        'Post signed fake payment_intent.succeeded events at a running server to load-test '
+        'the Stripe webhook. Uses STRIPE_WEBHOOK_SECRET, so the server must share it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/webhook/stripe/')
+        parser.add_argument('--count', type=int, default=10_000, help='Events to send')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duplicates', type=float, default=0.1,
+                            help='Fraction of events re-sent with the same id, like Stripe retries')
+
+    def handle(self, *args, **options):
+        booking_ids = list(
+            Booking.objects.filter(payment_status='pending').values_list('pk', flat=True)[:options['count']]
+        )
+        if not booking_ids:
+            raise CommandError('No unpaid bookings to generate events for (seed some bookings first).')
+
+        events = [self.build_event(booking_ids[i % len(booking_ids)]) for i in range(options['count'])]
+        duplicates = int(len(events) * options['duplicates'])
+        events += random.sample(events, min(duplicates, len(events)))
+        random.shuffle(events)
+
+        target = urlsplit(options['url'])
+        local = threading.local()
+        statuses = Counter()
+
+        def send(body):
+            if not hasattr(local, 'conn'):
+                # One keep-alive connection per worker thread
+                local.conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+            headers = {
+                'Content-Type': 'application/json',
+                'Stripe-Signature': sign_payload(body, settings.STRIPE_WEBHOOK_SECRET),
+            }
+            try:
+                local.conn.request('POST', target.path, body=body, headers=headers)
+                response = local.conn.getresponse()
+                response.read()
+                return response.status
+            except (OSError, http.client.HTTPException):
+                local.conn.close()
+                del local.conn
+                return 'error'
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for status in pool.map(send, events):
+                statuses[status] += 1
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f'Sent {len(events)} events ({duplicates} duplicates) in {elapsed:.2f}s')
+        self.stdout.write(self.style.SUCCESS(f'{len(events) / elapsed:.0f} events/s'))
+        for status, count in sorted(statuses.items(), key=str):
+            self.stdout.write(f'  HTTP {status}: {count}')
+
+    def build_event(self, booking_id):
+        intent_id = f'pi_fake_{uuid.uuid4().hex[:24]}'
+        return json.dumps({
+            'id': f'evt_fake_{uuid.uuid4().hex[:24]}',
+            'object': 'event',
+            'type': 'payment_intent.succeeded',
+            'data': {'object': {
+                'id': intent_id,
+                'object': 'payment_intent',
+                'status': 'succeeded',
+                'metadata': {'booking_id': str(booking_id)},
+            }},
+        })
@@ -0,0 +1,114 @@
+import json
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from roadside_service_app.loadtest import LoadTest, end_sessions, endpoints, login_sessions
+from roadside_service_app.models import Booking, Notification, User
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=settings.BASE_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the GET pages and APIs at a fixed concurrency and report throughput and '
+        'p50/p95/p99 per endpoint. Seed data first with manage.py seed_load_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=30, help='Measured seconds')
+        parser.add_argument('--warmup', type=float, default=2, help='Seconds of unrecorded requests first')
+        parser.add_argument('--users', type=int, default=50, help='Distinct logged-in customers to spread load over')
+        parser.add_argument('--endpoints', help='Comma-separated subset of endpoint names')
+        parser.add_argument('--base-url', help='Send real HTTP to a running server instead of the in-process client')
+        parser.add_argument('--host', default='localhost', help='Host header for the in-process client')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--compare', help='Earlier results JSON to compare against')
+
+    def handle(self, *args, **options):
+        paths = endpoints()
+        if options['endpoints']:
+            wanted = options['endpoints'].split(',')
+            unknown = set(wanted) - set(paths)
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}. Choose from {', '.join(paths)}.")
+            paths = {name: paths[name] for name in wanted}
+
+        sessions = login_sessions(options['users'])
+        if not sessions:
+            raise CommandError('No bookings found; run manage.py seed_load_data first.')
+        try:
+            test = LoadTest(
+                sessions, paths, concurrency=options['concurrency'], duration=options['duration'],
+                warmup=options['warmup'], base_url=options['base_url'], host=options['host'], seed=options['seed'],
+            )
+            results = test.run()
+        finally:
+            end_sessions(sessions)
+
+        commit, dirty = git_revision()
+        report = {
+            'commit': commit,
+            'dirty': dirty,
+            'started_at': timezone.now().isoformat(),
+            'mode': 'http' if options['base_url'] else 'in-process',
+            'base_url': options['base_url'],
+            'concurrency': options['concurrency'],
+            'duration_s': options['duration'],
+            'database': connection.vendor,
+            'rows': {
+                'users': User.objects.count(),
+                'bookings': Booking.objects.count(),
+                'notifications': Notification.objects.count(),
+            },
+            **results,
+        }
+        self.print_report(report)
+        if options['compare']:
+            self.print_comparison(json.loads(Path(options['compare']).read_text()), report)
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{report['mode']} @ {(report['commit'] or 'unknown')[:10]}{' (dirty)' if report['dirty'] else ''}, "
+            f"concurrency {report['concurrency']}, {report['duration_s']:g}s"
+        )
+        header = f"{'endpoint':<22}{'reqs':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        self.stdout.write(header)
+        rows = list(report['endpoints'].items())
+        if report['total']:
+            rows.append(('TOTAL', report['total']))
+        for name, stats in rows:
+            self.stdout.write(
+                f"{name:<22}{stats['requests']:>8}{stats['errors']:>8}{stats['throughput_rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+            )
+
+    def print_comparison(self, before, after):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nvs {(before.get('commit') or 'unknown')[:10]}"))
+        for name, stats in after['endpoints'].items():
+            old = before['endpoints'].get(name)
+            if not old or not old['throughput_rps']:
+                continue
+            rps_change = (stats['throughput_rps'] / old['throughput_rps'] - 1) * 100
+            self.stdout.write(
+                f"{name:<22} req/s {old['throughput_rps']:.1f} -> {stats['throughput_rps']:.1f} ({rps_change:+.0f}%), "
+                f"p95 {old['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms"
+            )
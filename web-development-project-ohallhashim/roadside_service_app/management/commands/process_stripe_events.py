@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from roadside_service_app.webhooks import process_pending_events
+
+
+class Command(BaseCommand):
+    help = 'Apply queued Stripe webhook events from the inbox in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true', help='Keep polling instead of exiting when the inbox is empty')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait between polls of an empty inbox')
+
+    def handle(self, *args, **options):
+        total = 0
+        started = time.perf_counter()
+        while True:
+            taken = process_pending_events(batch_size=options['batch_size'])
+            total += taken
+            if taken:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['sleep'])
+
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} events in {elapsed:.2f}s ({rate:.0f} events/s)'))
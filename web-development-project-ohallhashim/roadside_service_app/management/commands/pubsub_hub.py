@@ -0,0 +1,24 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from roadside_service_app.pubsub import parse_address, serve_hub
+
+
+class Command(BaseCommand):
+    help = (
+        'Relay live-update events between processes. Every web worker and background '
+        'command connects here when PUBSUB_BROKER is roadside_service_app.pubsub.HubBroker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', default=settings.PUBSUB_HUB_ADDRESS, help='host:port to listen on')
+
+    def handle(self, *args, **options):
+        host, port = parse_address(options['address'])
+        self.stdout.write(f'pubsub hub listening on {host}:{port}')
+        try:
+            asyncio.run(serve_hub(host, port))
+        except KeyboardInterrupt:
+            pass
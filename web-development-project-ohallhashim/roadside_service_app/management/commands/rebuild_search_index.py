@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from roadside_service_app.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-create the full-text search rows of contact messages, bookings and notifications '
+        '(after a bulk import, or if the index has drifted)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = rebuild_index(chunk_size=options['chunk_size'])
+        indexed = ', '.join(f'{count} {kind} rows' for kind, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} in {time.perf_counter() - started:.2f}s'))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from roadside_service_app.summaries import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the revenue, booking status and technician utilization summary tables '
+        'from bookings and payments (after a backfill or bulk import)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=parse_date, help='Only rebuild days from this date (YYYY-MM-DD) on')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rebuild(since=options['since'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt summaries in {time.perf_counter() - started:.2f}s'))
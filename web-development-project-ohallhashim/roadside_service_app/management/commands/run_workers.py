@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from roadside_service_app.jobs import requeue_stale, run_pending, start_workers
+
+
+def serve(threads, prefix):
+    # One process: `threads` workers plus the stale-job sweep, until SIGTERM/SIGINT
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+    workers = start_workers(threads, prefix, stop)
+    while not stop.wait(settings.JOB_LOCK_TIMEOUT / 4):
+        requeue_stale()
+    # Workers finish the job they are on before exiting
+    for worker in workers:
+        worker.join()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Run background jobs: --threads worker threads in each of --processes processes. '
+        'Stop with SIGTERM or Ctrl-C; running jobs are finished first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Worker threads per process')
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--burst', action='store_true', help='Run the jobs that are due now, then exit')
+
+    def handle(self, *args, **options):
+        if options['burst']:
+            started = time.perf_counter()
+            ran = run_pending(worker_name=f'burst-{os.getpid()}')
+            self.stdout.write(self.style.SUCCESS(f'Ran {ran} jobs in {time.perf_counter() - started:.2f}s'))
+            return
+
+        threads, processes = options['threads'], options['processes']
+        self.stdout.write(f'Starting {processes} x {threads} workers')
+        if processes == 1:
+            serve(threads, f'worker-{os.getpid()}')
+            return
+
+        # Children must not inherit the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [
+            context.Process(target=serve, args=(threads, f'worker-{os.getpid()}-{i}'), name=f'worker-{i}')
+            for i in range(processes)
+        ]
+        for child in children:
+            child.start()
+        # Pass a SIGTERM on; each child stops its workers gracefully
+        signal.signal(signal.SIGTERM, lambda *args: [child.terminate() for child in children])
+        try:
+            for child in children:
+                child.join()
+        except KeyboardInterrupt:
+            # Ctrl-C reaches the whole process group; wait for the children to drain
+            for child in children:
+                child.join()
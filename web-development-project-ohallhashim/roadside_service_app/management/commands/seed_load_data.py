@@ -0,0 +1,67 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from roadside_service_app.models import Service
+from roadside_service_app.notifications import recount_unread
+from roadside_service_app.search import rebuild_index
+from roadside_service_app.summaries import rebuild
+from roadside_service_app.seeding import chunked, seed_bookings, seed_notifications, seed_staff, seed_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with production-scale synthetic data (customers, staff, bookings, '
+        'payments and notifications) using batched bulk inserts. Adds to existing rows.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--staff', type=int, default=500)
+        parser.add_argument('--bookings', type=int, default=1_000_000)
+        parser.add_argument('--notifications', type=int, default=2_000_000)
+        parser.add_argument('--days', type=int, default=365, help='Spread rows over this many past days')
+        parser.add_argument('--unread-ratio', type=float, default=0.1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for a reproducible data set')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if not Service.objects.exists():
+            call_command('setup_services', stdout=self.stdout)
+
+        started = time.perf_counter()
+        user_ids = self.step('customers', lambda: seed_users(options['users'], batch_size=batch_size))
+        technician_ids = self.step(
+            'staff', lambda: seed_staff(options['staff'], batch_size=batch_size, seed=options['seed'])
+        )
+        self.step('bookings + payments', lambda: seed_bookings(
+            options['bookings'], user_ids, days=options['days'], batch_size=batch_size, seed=options['seed'],
+            progress=self.progress('bookings', options['bookings'], batch_size),
+            technician_ids=technician_ids, with_payments=True,
+        ))
+        self.step('notifications', lambda: seed_notifications(
+            options['notifications'], user_ids, days=options['days'], unread_ratio=options['unread_ratio'],
+            batch_size=batch_size, seed=options['seed'],
+            progress=self.progress('notifications', options['notifications'], batch_size),
+        ))
+        # bulk_create skips the signals that keep the unread badge counter in step
+        self.step('unread counters', lambda: [recount_unread(ids) for ids in chunked(user_ids, batch_size)])
+        # ...and the ones that maintain the summary tables
+        self.step('summary tables', rebuild)
+        # ...and the search index
+        self.step('search index', rebuild_index)
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s'))
+
+    def step(self, label, func):
+        started = time.perf_counter()
+        result = func()
+        self.stdout.write(f'{label}: {time.perf_counter() - started:.1f}s')
+        return result
+
+    def progress(self, label, total, batch_size):
+        def report(done):
+            if done % (batch_size * 20) == 0 or done == total:
+                self.stdout.write(f'  {label}: {done}/{total}')
+        return report
@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from roadside_service_app.reminders import send_booking_reminders
+
+
+class Command(BaseCommand):
+    help = (
+        'Create booking_reminder notifications for bookings starting within the lead time. '
+        'Run it from cron every few minutes, or keep it running with --loop.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lead-minutes', type=int, default=settings.BOOKING_REMINDER_LEAD_MINUTES)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--time-budget', type=float, help='Stop after this many seconds; the next run resumes')
+        parser.add_argument('--loop', action='store_true', help='Keep running instead of exiting')
+        parser.add_argument('--sleep', type=float, default=60.0, help='Seconds between passes with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            stats = send_booking_reminders(
+                lead=timedelta(minutes=options['lead_minutes']),
+                chunk_size=options['chunk_size'],
+                time_budget=options['time_budget'],
+            )
+            rate = stats['reminders'] / stats['elapsed'] if stats['elapsed'] else 0
+            message = (f"Sent {stats['reminders']} reminders in {stats['chunks']} chunks, "
+                       f"{stats['elapsed']:.2f}s ({rate:.0f} reminders/s)")
+            if stats['complete']:
+                self.stdout.write(self.style.SUCCESS(message))
+            else:
+                self.stdout.write(self.style.WARNING(f'{message}; time budget spent, more are due'))
+            if not options['loop']:
+                break
+            if stats['complete']:
+                time.sleep(options['sleep'])
@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from django.core.management.base import BaseCommand
+
+
+class StubStripeHandler(BaseHTTPRequestHandler):
+    """Just enough of /v1/payment_intents for the payment views and benchmarks."""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, like api.stripe.com
+    intents = {}
+    lock = threading.Lock()
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Request-Id', f'req_stub_{uuid.uuid4().hex[:14]}')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        params = dict(parse_qsl(self.rfile.read(length).decode()))
+        time.sleep(self.latency)
+        if self.path.rstrip('/') != '/v1/payment_intents':
+            return self.send_json(404, {'error': {'type': 'invalid_request_error', 'message': 'Unknown path'}})
+
+        intent_id = f'pi_stub_{uuid.uuid4().hex[:24]}'
+        intent = {
+            'id': intent_id,
+            'object': 'payment_intent',
+            'amount': int(params.get('amount', 0)),
+            'currency': params.get('currency', 'usd'),
+            'status': 'requires_payment_method',
+            'client_secret': f'{intent_id}_secret_{uuid.uuid4().hex[:16]}',
+            'metadata': {key[9:-1]: value for key, value in params.items() if key.startswith('metadata[')},
+        }
+        with self.lock:
+            self.intents[intent_id] = intent
+        self.send_json(200, intent)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        prefix = '/v1/payment_intents/'
+        with self.lock:
+            intent = self.intents.get(self.path[len(prefix):]) if self.path.startswith(prefix) else None
+        if intent is None:
+            return self.send_json(404, {'error': {'type': 'invalid_request_error', 'message': 'No such payment_intent'}})
+        self.send_json(200, intent)
+
+
+class Command(BaseCommand):
+    help = 'Run a local fake Stripe API for load tests (set STRIPE_API_BASE=http://127.0.0.1:<port>)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument('--latency-ms', type=float, default=150.0, help='Simulated Stripe response time')
+
+    def handle(self, *args, **options):
+        StubStripeHandler.latency = options['latency_ms'] / 1000
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), StubStripeHandler)
+        server.daemon_threads = True
+        self.stdout.write(self.style.SUCCESS(
+            f"Stripe stub listening on http://127.0.0.1:{options['port']} ({options['latency_ms']:.0f} ms latency)"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,203 @@
+"""
+In-process request metrics rendered in the Prometheus text format.
+
+Every worker process keeps its own registry, so scrape each worker (or run a
+single process per container) to get complete numbers.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from django.template.backends.django import DjangoTemplates, Template
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._sample_lines(key, value))
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._series.get(self._key(labels), 0)
+
+    def _sample_lines(self, key, value):
+        return [f'{self.name}_total{self._labels(key)} {value}']
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (non-cumulative), then sum and count
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels):
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def _sample_lines(self, key, series):
+        lines = []
+        cumulative = 0
+        for bound, hits in zip(self.buckets, series):
+            cumulative += hits
+            lines.append(f'{self.name}_bucket{self._labels(key, [("le", repr(float(bound)))])} {cumulative}')
+        lines.append(f'{self.name}_bucket{self._labels(key, [("le", "+Inf")])} {series[-1]}')
+        lines.append(f'{self.name}_sum{self._labels(key)} {series[-2]}')
+        lines.append(f'{self.name}_count{self._labels(key)} {series[-1]}')
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    'roadside_http_request_duration_seconds', 'Time spent serving a request.', ['view', 'method', 'status']
+)
+REQUEST_QUERIES = Histogram(
+    'roadside_http_request_queries', 'SQL queries run per request.', ['view'], buckets=QUERY_COUNT_BUCKETS
+)
+REQUEST_SQL_TIME = Histogram('roadside_http_request_sql_seconds', 'Time spent in SQL per request.', ['view'])
+TEMPLATE_RENDER = Histogram('roadside_template_render_seconds', 'Time spent rendering a template.', ['template'])
+STRIPE_CALLS = Histogram('roadside_stripe_call_seconds', 'Time spent in Stripe API calls.', ['operation', 'outcome'])
+SLOW_REQUESTS = Counter('roadside_slow_requests', 'Requests slower than PERF_SLOW_REQUEST_MS.', ['view'])
+
+REGISTRY = [REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_SQL_TIME, TEMPLATE_RENDER, STRIPE_CALLS, SLOW_REQUESTS]
+
+
+def render_prometheus():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    for metric in REGISTRY:
+        metric.clear()
+
+
+class RequestStats:
+    """Timings gathered while one sampled request is being served."""
+
+    def __init__(self, max_logged_queries=100):
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.stripe_time = 0.0
+        self.queries = []
+        self.max_logged_queries = max_logged_queries
+
+
+# Set by PerformanceMiddleware for sampled requests only. A context variable
+# follows the request into sync_to_async threads, unlike thread-locals.
+current_stats = contextvars.ContextVar('roadside_request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """DB execute wrapper installed on every connection (see install_query_recorder)."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.query_count += 1
+        stats.sql_time += elapsed
+        if len(stats.queries) < stats.max_logged_queries:
+            stats.queries.append((sql, elapsed))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # connection_created fires again after a reconnect; only wrap once
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed_stripe_call(operation):
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        elapsed = time.perf_counter() - start
+        STRIPE_CALLS.observe(elapsed, operation=operation, outcome=outcome)
+        stats = current_stats.get()
+        if stats is not None:
+            stats.stripe_time += elapsed
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            elapsed = time.perf_counter() - start
+            TEMPLATE_RENDER.observe(elapsed, template=self.origin.template_name or '<string>')
+            stats = current_stats.get()
+            if stats is not None:
+                stats.template_time += elapsed
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The stock Django template backend, timing each top-level render."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
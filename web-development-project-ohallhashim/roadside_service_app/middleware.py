@@ -0,0 +1,110 @@
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_SQL_TIME, SLOW_REQUESTS, RequestStats, current_stats
+from .routers import PIN_COOKIE, replicas
+
+logger = logging.getLogger('roadside_service_app.performance')
+
+
+class PerformanceMiddleware:
+    """
+    Records latency, SQL and template time per view for a PERF_SAMPLE_RATE
+    fraction of requests, and logs requests slower than PERF_SLOW_REQUEST_MS
+    together with the queries they ran. Put it first in MIDDLEWARE so the
+    timing covers the rest of the stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PERF_SAMPLE_RATE', 1.0)
+        self.slow_ms = getattr(settings, 'PERF_SLOW_REQUEST_MS', 500)
+        self.max_logged_queries = getattr(settings, 'PERF_MAX_LOGGED_QUERIES', 100)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        stats, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.finish(request, response, stats, start)
+        return response
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        stats, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.finish(request, response, stats, start)
+        return response
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def start(self):
+        stats = RequestStats(self.max_logged_queries)
+        return stats, current_stats.set(stats), time.perf_counter()
+
+    def finish(self, request, response, stats, start):
+        elapsed = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        REQUEST_LATENCY.observe(elapsed, view=view, method=request.method, status=response.status_code)
+        REQUEST_QUERIES.observe(stats.query_count, view=view)
+        REQUEST_SQL_TIME.observe(stats.sql_time, view=view)
+
+        if elapsed * 1000 >= self.slow_ms:
+            SLOW_REQUESTS.inc(view=view)
+            logger.warning(
+                'Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms, templates %.0f ms, stripe %.0f ms\n%s',
+                request.method, request.path, view, elapsed * 1000, stats.query_count, stats.sql_time * 1000,
+                stats.template_time * 1000, stats.stripe_time * 1000,
+                '\n'.join(f'  {duration * 1000:7.1f} ms  {sql}' for sql, duration in stats.queries),
+            )
+
+
+class ReplicaPinningMiddleware:
+    """
+    After a client's write (any non-GET/HEAD request), pin its reads to the
+    primary for REPLICA_STICKY_SECONDS so it sees its own changes even while
+    the replicas lag behind.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.pin(request, await self.get_response(request))
+
+    def pin(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and replicas():
+            seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+            response.set_cookie(PIN_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True,
+                                samesite='Lax', secure=request.is_secure())
+        return response
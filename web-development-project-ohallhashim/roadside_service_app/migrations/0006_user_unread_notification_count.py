@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:43
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_counts(apps, schema_editor):
+    User = apps.get_model('roadside_service_app', 'User')
+    Notification = apps.get_model('roadside_service_app', 'Notification')
+    unread = (
+        Notification.objects.filter(user=OuterRef('pk'), is_read=False)
+        .order_by()
+        .values('user')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    User.objects.update(unread_notification_count=Coalesce(Subquery(unread), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadside_service_app', '0005_booking_notification_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notification_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadside_service_app', '0007_stripeevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='assigned_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='assigned_technician',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assignments', to='roadside_service_app.staff'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='staff',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='staff',
+            name='specializations',
+            field=models.TextField(blank=True, help_text="Comma-separated, e.g. 'tire, battery, towing'", null=True),
+        ),
+    ]
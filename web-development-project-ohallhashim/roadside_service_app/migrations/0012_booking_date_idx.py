@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadside_service_app', '0011_watermark'),
+    ]
+
+    operations = [
+        # A database migrated while the series still had a partial
+        # booking_booked_date_idx (SQLite never used it) loses it here
+        migrations.RunSQL('DROP INDEX IF EXISTS booking_booked_date_idx', migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['booking_date', 'id'], name='booking_date_idx'),
+        ),
+    ]
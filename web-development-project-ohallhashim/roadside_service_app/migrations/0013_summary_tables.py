@@ -0,0 +1,55 @@
+# Generated by Django 5.1.5 on 2026-10-18 08:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadside_service_app', '0012_booking_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBookingStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('in_progress', 'In Progress'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('bookings', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'daily booking statuses',
+                'constraints': [models.UniqueConstraint(fields=('day', 'status'), name='daily_booking_status_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('payments', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='roadside_service_app.service')),
+            ],
+            options={
+                'verbose_name_plural': 'daily revenue',
+                'constraints': [models.UniqueConstraint(fields=('day', 'service'), name='daily_revenue_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TechnicianUtilization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('jobs', models.IntegerField(default=0)),
+                ('booked_minutes', models.IntegerField(default=0)),
+                ('technician', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='roadside_service_app.staff')),
+            ],
+            options={
+                'verbose_name_plural': 'technician utilization',
+                'constraints': [models.UniqueConstraint(fields=('day', 'technician'), name='technician_utilization_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.1.5 on 2026-10-18 08:38
+
+from django.db import migrations, models
+
+# Sources of the search table, as (kind, table, searchable columns); see search.py
+SOURCES = [
+    ('contact', 'roadside_service_app_contact', ['name', 'email', 'subject', 'message']),
+    ('booking', 'roadside_service_app_booking', ['location', 'vehicle_info', 'notes']),
+    ('notification', 'roadside_service_app_notification', ['title', 'message']),
+]
+
+SQLITE_INDEX = [
+    # External-content FTS5 table over searchentry (kind, body), kept in step by triggers.
+    # kind is indexed too, so a search is answered from the FTS index alone.
+    "CREATE VIRTUAL TABLE search_fts USING fts5(kind, body, content='roadside_service_app_searchentry', content_rowid='id')",
+    "CREATE TRIGGER search_fts_insert AFTER INSERT ON roadside_service_app_searchentry BEGIN "
+    "INSERT INTO search_fts(rowid, kind, body) VALUES (new.id, new.kind, new.body); END",
+    "CREATE TRIGGER search_fts_delete AFTER DELETE ON roadside_service_app_searchentry BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, kind, body) VALUES ('delete', old.id, old.kind, old.body); END",
+    "CREATE TRIGGER search_fts_update AFTER UPDATE ON roadside_service_app_searchentry BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, kind, body) VALUES ('delete', old.id, old.kind, old.body); "
+    "INSERT INTO search_fts(rowid, kind, body) VALUES (new.id, new.kind, new.body); END",
+]
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS search_fts_insert',
+    'DROP TRIGGER IF EXISTS search_fts_delete',
+    'DROP TRIGGER IF EXISTS search_fts_update',
+    'DROP TABLE IF EXISTS search_fts',
+]
+POSTGRES_INDEX = [
+    "CREATE INDEX search_entry_body_gin ON roadside_service_app_searchentry "
+    "USING GIN (to_tsvector('english', body))",
+]
+POSTGRES_DROP = ['DROP INDEX IF EXISTS search_entry_body_gin']
+
+
+def run(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def create_index(apps, schema_editor):
+    connection = schema_editor.connection
+    run(connection, {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRES_INDEX}.get(connection.vendor, []))
+    # Index the rows that already exist
+    for kind, table, columns in SOURCES:
+        body = " || ' ' || ".join(f"COALESCE({column}, '')" for column in columns)
+        run(connection, [
+            f"INSERT INTO roadside_service_app_searchentry (kind, object_id, body) "
+            f"SELECT '{kind}', REPLACE(CAST(id AS TEXT), '-', ''), {body} FROM {table}"
+        ])
+    if connection.vendor == 'sqlite':
+        # Table statistics, so SQLite starts admin searches from the small side (users
+        # matching a prefix, FTS matches) rather than scanning bookings
+        run(connection, ['ANALYZE'])
+
+
+def drop_index(apps, schema_editor):
+    connection = schema_editor.connection
+    run(connection, {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}.get(connection.vendor, []))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadside_service_app', '0013_summary_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.CharField(max_length=64)),
+                ('body', models.TextField()),
+            ],
+            options={
+                'verbose_name_plural': 'search entries',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='search_entry_unique')],
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 08:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadside_service_app', '0014_search_entry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'booking_date', 'id'], name='booking_status_date_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:02
+
+import django.db.models.deletion
+import roadside_service_app.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadside_service_app', '0016_archive_tables'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='id',
+            field=models.UUIDField(default=roadside_service_app.ids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.CreateModel(
+            name='BookingIdAlias',
+            fields=[
+                ('old_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='id_aliases', to='roadside_service_app.booking')),
+            ],
+            options={
+                'verbose_name_plural': 'booking id aliases',
+            },
+        ),
+    ]
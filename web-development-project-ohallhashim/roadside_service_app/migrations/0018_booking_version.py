@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadside_service_app', '0017_booking_uuid7'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
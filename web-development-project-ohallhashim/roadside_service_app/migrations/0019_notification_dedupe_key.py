@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadside_service_app', '0018_booking_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='dedupe_key',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True, unique=True),
+        ),
+    ]
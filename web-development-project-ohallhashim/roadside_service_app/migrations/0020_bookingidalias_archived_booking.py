@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadside_service_app', '0019_notification_dedupe_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingidalias',
+            name='archived_booking',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='id_aliases', to='roadside_service_app.archivedbooking'),
+        ),
+        migrations.AlterField(
+            model_name='bookingidalias',
+            name='booking',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='id_aliases', to='roadside_service_app.booking'),
+        ),
+    ]
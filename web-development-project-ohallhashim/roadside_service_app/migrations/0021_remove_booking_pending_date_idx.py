@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 09:58
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roadside_service_app', '0020_bookingidalias_archived_booking'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_pending_date_idx',
+        ),
+    ]
@@ -1,7 +1,12 @@
-from django.db import models
+from collections import defaultdict
+
+from django.db import DatabaseError, models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
-import uuid
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .ids import uuid7
 
 # Contact model for storing contact form data
 class Contact(models.Model):
@@ -20,6 +25,8 @@ class User(AbstractUser):
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # Denormalized count of unread notifications for the navbar badge (see notifications.py)
+    unread_notification_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.username
@@ -36,8 +43,84 @@ class Service(models.Model):
     def __str__(self):
         return f"{self.name} - ${self.price}"
 
+class TrackedFieldsMixin:
+    """
+    Remembers TRACKED_FIELDS as loaded from the database in _loaded_values, so
+    post_save handlers can see what a save changed (None if any were deferred).
+    """
+    TRACKED_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        deferred = instance.get_deferred_fields() & set(cls.TRACKED_FIELDS)
+        instance._loaded_values = None if deferred else instance.tracked_values()
+        return instance
+
+    def tracked_values(self):
+        return {field: getattr(self, field) for field in self.TRACKED_FIELDS}
+
+# Bookings per UPDATE in BookingQuerySet.transition(), well under SQLite's bound-parameter limit
+TRANSITION_BATCH = 500
+
+# Sent by BookingQuerySet.transition() with changes=[(booking, tracked values before)];
+# signals.py updates the summary tables, live events and cached pages
+bookings_transitioned = Signal()
+
+class StaleBookingError(DatabaseError):
+    """Booking.save() of a copy loaded before someone else changed the booking."""
+
+# Queryset helpers for loading a booking together with the rows it displays
+class BookingQuerySet(models.QuerySet):
+    def with_related(self):
+        # One JOIN instead of a query per row for booking.service / booking.user / booking.payment
+        return self.select_related('service', 'user', 'payment')
+
+    def transition(self, bookings, to_status, **fields):
+        """
+        Move `bookings` to `to_status`, setting `fields` (plain values) as well,
+        with UPDATE ... WHERE status = ? AND version = ? AND id IN (...) statements
+        that write only those columns: one per (status, version) the bookings were
+        loaded at, TRANSITION_BATCH ids at a time. A booking whose status can't
+        move to `to_status`, or that someone else changed since it was loaded, is
+        left alone. Returns the bookings that moved, updated in place.
+        """
+        moving = [b for b in bookings if to_status in self.model.TRANSITIONS.get(b.status, ())]
+        if not moving:
+            return []
+        now = timezone.now()
+        groups = defaultdict(list)
+        for booking in moving:
+            groups[booking.status, booking.version].append(booking.pk)
+        changed = 0
+        for (status, version), pks in groups.items():
+            for start in range(0, len(pks), TRANSITION_BATCH):
+                changed += self.filter(pk__in=pks[start:start + TRANSITION_BATCH], status=status, version=version).update(
+                    status=to_status, version=models.F('version') + 1, updated_at=now, **fields
+                )
+        if changed < len(moving):
+            # Some lost: the rows these UPDATEs moved are the ones one version on
+            won = set()
+            for start in range(0, len(moving), TRANSITION_BATCH):
+                won.update(self.filter(
+                    pk__in=[b.pk for b in moving[start:start + TRANSITION_BATCH]], status=to_status
+                ).values_list('pk', 'version'))
+            moving = [b for b in moving if (b.pk, b.version + 1) in won]
+
+        changes = []
+        for booking in moving:
+            old = booking.tracked_values()
+            booking.status, booking.version, booking.updated_at = to_status, booking.version + 1, now
+            for field, value in fields.items():
+                setattr(booking, field, value)
+            booking._loaded_values = booking.tracked_values()
+            changes.append((booking, old))
+        if changes:
+            bookings_transitioned.send(sender=self.model, changes=changes)
+        return moving
+
 # Booking model for service requests
-class Booking(models.Model):
+class Booking(TrackedFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
@@ -46,7 +129,8 @@ class Booking(models.Model):
         ('cancelled', 'Cancelled'),
     ]
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Time-ordered (see ids.py); bookings made before 0017 keep their random uuid4 ids
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     service = models.ForeignKey(Service, on_delete=models.CASCADE)
     booking_date = models.DateTimeField()
@@ -58,12 +142,70 @@ class Booking(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True)
     payment_status = models.CharField(max_length=20, default='pending')
+    # Geocoded from `location` when the booking is made (see dispatch.geocode)
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
+    assigned_technician = models.ForeignKey(
+        'Staff', on_delete=models.SET_NULL, blank=True, null=True, related_name='assignments'
+    )
+    assigned_at = models.DateTimeField(blank=True, null=True)
+    # Moved on by every status change, so a write based on an old copy can tell it lost
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = BookingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Per-user history / dashboard: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['user', '-created_at', '-id'], name='booking_user_created_idx'),
+            # Availability and reminders: bookings by start time, in keyset order. Not
+            # partial: SQLite only uses a partial index when the query repeats its
+            # condition as literals, and Django sends the statuses as parameters.
+            models.Index(fields=['booking_date', 'id'], name='booking_date_idx'),
+            # Admin changelist filtered by status, in its booking_date keyset order, and
+            # the open work queue (pending bookings by start time). A partial index on
+            # status = 'pending' would go unused on SQLite for the same reason as above.
+            models.Index(fields=['status', 'booking_date', 'id'], name='booking_status_date_idx'),
+        ]
+
+    # Compared with their loaded values on save (live events, summary tables)
+    TRACKED_FIELDS = ('status', 'booking_date', 'service_id', 'assigned_technician_id')
+
+    # Status changes transition() allows; completed and cancelled are final
+    TRANSITIONS = {
+        'pending': ('confirmed', 'cancelled'),
+        'confirmed': ('in_progress', 'cancelled'),
+        'in_progress': ('completed', 'cancelled'),
+    }
 
     def __str__(self):
         return f"Booking {self.id} - {self.user.username} - {self.service.name}"
 
+    def save(self, *args, **kwargs):
+        # A full save (the admin form) writes the status too, so it only goes ahead
+        # if the row is still at the version this copy was loaded at, and moves it on
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding or (update_fields is not None and 'status' not in update_fields):
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            claimed = type(self).objects.filter(pk=self.pk, version=self.version).update(version=models.F('version') + 1)
+            if not claimed:
+                raise StaleBookingError(f'Booking {self.pk} was changed since it was loaded')
+            self.version += 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+            try:
+                super().save(*args, **kwargs)
+            except Exception:
+                self.version -= 1
+                raise
+
+    def transition(self, to_status, **fields):
+        """Move this booking to `to_status` (see BookingQuerySet.transition). Returns whether it won."""
+        return bool(type(self).objects.transition([self], to_status, **fields))
+
 # Payment model for tracking payments
-class Payment(models.Model):
+class Payment(TrackedFieldsMixin, models.Model):
     PAYMENT_STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('completed', 'Completed'),
@@ -78,8 +220,11 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Compared with their loaded values on save (summary tables)
+    TRACKED_FIELDS = ('payment_status', 'amount', 'created_at', 'booking_id')
+
     def __str__(self):
-        return f"Payment for Booking {self.booking.id} - ${self.amount}"
+        return f"Payment for Booking {self.booking_id} - ${self.amount}"
 
 # Staff model for technicians and dispatchers
 class Staff(models.Model):
@@ -100,14 +245,17 @@ class Staff(models.Model):
     phone_number = models.CharField(max_length=20)
     hire_date = models.DateField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
-    specializations = models.TextField(blank=True, null=True)
+    specializations = models.TextField(blank=True, null=True, help_text="Comma-separated, e.g. 'tire, battery, towing'")
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=5.00)
+    # Last reported position, used by the dispatcher
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.role}"
 
 # Notification model for user notifications
-class Notification(models.Model):
+class Notification(TrackedFieldsMixin, models.Model):
     NOTIFICATION_TYPES = [
         ('booking_confirmed', 'Booking Confirmed'),
         ('technician_assigned', 'Technician Assigned'),
@@ -123,7 +271,194 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     related_booking = models.ForeignKey(Booking, on_delete=models.CASCADE, blank=True, null=True)
+    # Set by the send_notification task, so a job run twice creates one notification
+    dedupe_key = models.CharField(max_length=100, unique=True, blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Notification list: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+            models.Index(fields=['user', '-created_at', '-id'], name='notif_user_created_idx'),
+            # Dashboard / badge: unread rows only (partial where supported)
+            models.Index(fields=['user', '-created_at'], condition=models.Q(is_read=False), name='notif_user_unread_idx'),
+        ]
+
+    # Compared with their loaded values on save (unread counters)
+    TRACKED_FIELDS = ('is_read', 'user_id')
 
     def __str__(self):
         return f"{self.user.username} - {self.title}"
 
+
+# Inbox of verified Stripe webhook events, applied asynchronously by process_stripe_events
+class StripeEvent(models.Model):
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(processed_at__isnull=True), name='stripe_event_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} - {self.event_id}"
+
+
+# Background work queued by the views and run by `manage.py run_workers` (see jobs.py)
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict)
+    priority = models.SmallIntegerField(default=0)  # Higher runs first
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Claiming: the next due job by priority (partial, so finished jobs don't slow it down)
+            models.Index(fields=['-priority', 'run_at', 'id'], condition=models.Q(status='queued'), name='job_ready_idx'),
+            # Finding jobs whose worker died
+            models.Index(fields=['locked_at'], condition=models.Q(status='running'), name='job_running_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.status})"
+
+
+# How far a batch job that walks a table in order has got (see reminders.py)
+class Watermark(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    position = models.DateTimeField()
+    last_id = models.CharField(max_length=64, blank=True, default='')  # Tie-breaker among rows at `position`
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+# Summary tables, kept up to date by summaries.py as bookings and payments change.
+# `manage.py rebuild_summaries` recomputes them from the source tables.
+class DailyRevenue(models.Model):
+    day = models.DateField()
+    service = models.ForeignKey(Service, on_delete=models.CASCADE)
+    payments = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['day', 'service'], name='daily_revenue_unique')]
+        verbose_name_plural = 'daily revenue'
+
+    def __str__(self):
+        return f"{self.day} - {self.service.name}: ${self.revenue}"
+
+
+class DailyBookingStatus(models.Model):
+    day = models.DateField()  # booking_date, not created_at
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    bookings = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['day', 'status'], name='daily_booking_status_unique')]
+        verbose_name_plural = 'daily booking statuses'
+
+    def __str__(self):
+        return f"{self.day} - {self.status}: {self.bookings}"
+
+
+class TechnicianUtilization(models.Model):
+    day = models.DateField()
+    technician = models.ForeignKey(Staff, on_delete=models.CASCADE)
+    jobs = models.IntegerField(default=0)
+    booked_minutes = models.IntegerField(default=0)  # Sum of the assigned services' durations
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['day', 'technician'], name='technician_utilization_unique')]
+        verbose_name_plural = 'technician utilization'
+
+    def __str__(self):
+        return f"{self.day} - {self.technician}: {self.booked_minutes} min"
+
+
+# Text of contact messages, bookings and notifications for full-text search
+# (see search.py). The FTS5 table / GIN index over `body` is created in migration 0014.
+class SearchEntry(models.Model):
+    kind = models.CharField(max_length=20)
+    object_id = models.CharField(max_length=64)
+    body = models.TextField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['kind', 'object_id'], name='search_entry_unique')]
+        verbose_name_plural = 'search entries'
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+
+# Rows moved out of the live tables by `manage.py apply_retention` (see retention.py).
+# `data` is the original row as JSON; bookings carry their service, payment and
+# notifications with them.
+def _from_archive(model, data):
+    fields = model._meta.concrete_fields
+    return model(**{f.attname: f.to_python(data[f.attname]) for f in fields if f.attname in data})
+
+
+class ArchivedBooking(models.Model):
+    id = models.UUIDField(primary_key=True)  # The booking's id, so old links still resolve
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(db_index=True)  # The original row's (admin ordering)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.JSONField()
+
+    def as_booking(self):
+        """An unsaved Booking (with service and payment) rebuilt from `data`, for display."""
+        booking = _from_archive(Booking, self.data)
+        booking.service = _from_archive(Service, self.data['service'])
+        if self.data.get('payment'):
+            booking.payment = _from_archive(Payment, self.data['payment'])
+        return booking
+
+    def __str__(self):
+        return f"Archived booking {self.id}"
+
+
+class ArchivedNotification(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # The notification's id
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(db_index=True)  # The original row's (admin ordering)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.JSONField()
+
+    def __str__(self):
+        return f"Archived notification {self.id}"
+
+
+# Old id -> booking, for bookings whose uuid4 id was rewritten to a uuid7 by
+# `manage.py convert_booking_ids`; booking pages redirect from the old URL. Once
+# retention moves the booking to ArchivedBooking the alias points there instead.
+class BookingIdAlias(models.Model):
+    old_id = models.UUIDField(primary_key=True)
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, null=True, related_name='id_aliases')
+    archived_booking = models.ForeignKey(ArchivedBooking, on_delete=models.CASCADE, null=True, related_name='id_aliases')
+
+    class Meta:
+        verbose_name_plural = 'booking id aliases'
+
+    def __str__(self):
+        return f"{self.old_id} -> {self.booking_id or self.archived_booking_id}"
@@ -0,0 +1,82 @@
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Notification, User
+from .pubsub import notification_event, publish_on_commit
+from .search import index_objects
+from .user_cache import invalidate_user_cache
+
+# User.unread_notification_count is a denormalized copy of
+#   Notification.objects.filter(user=user, is_read=False).count()
+# Single-row creates/deletes are tracked by signals; the bulk helpers below
+# adjust it themselves because bulk_create() and update() send no signals.
+# The same goes for the live-update events (see pubsub.py).
+
+
+def notify(user, notification_type, title, message, related_booking=None):
+    return Notification.objects.create(
+        user=user,
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        related_booking=related_booking,
+    )
+
+
+def adjust_unread(user_ids, delta):
+    if not user_ids or not delta:
+        return
+    User.objects.filter(pk__in=user_ids).update(
+        unread_notification_count=Greatest(F('unread_notification_count') + delta, Value(0))
+    )
+    # The badge and the dashboard panels show these rows
+    invalidate_user_cache(user_ids)
+
+
+def notify_many(notifications, batch_size=1000):
+    """bulk_create unsaved Notification instances and keep the unread counters in step."""
+    created = Notification.objects.bulk_create(notifications, batch_size=batch_size)
+    per_user = Counter(n.user_id for n in created if not n.is_read)
+    # One UPDATE per distinct increment rather than one per user
+    users_by_delta = defaultdict(list)
+    for user_id, delta in per_user.items():
+        users_by_delta[delta].append(user_id)
+    for delta, user_ids in users_by_delta.items():
+        adjust_unread(user_ids, delta)
+    index_objects(created, batch_size)
+    for notification in created:
+        publish_on_commit(notification.user_id, 'notification', notification_event(notification))
+    return created
+
+
+def mark_read(user, ids=None):
+    """
+    Mark the user's notifications read in one UPDATE - all of them, or only
+    `ids`. Returns how many rows actually changed.
+    """
+    queryset = Notification.objects.filter(user=user, is_read=False)
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    changed = queryset.update(is_read=True)
+    if changed:
+        adjust_unread([user.pk], -changed)
+        user.unread_notification_count = max(user.unread_notification_count - changed, 0)
+    return changed
+
+
+def recount_unread(user_ids=None):
+    """Rebuild the counters from the notification table (repairs any drift)."""
+    unread = (
+        Notification.objects.filter(user=OuterRef('pk'), is_read=False)
+        .order_by()
+        .values('user')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    users = User.objects.all() if user_ids is None else User.objects.filter(pk__in=user_ids)
+    if user_ids is not None:
+        # A full rebuild leaves cached users to expire (USER_CACHE_TIMEOUT)
+        invalidate_user_cache(user_ids)
+    return users.update(unread_notification_count=Coalesce(Subquery(unread), 0))
@@ -0,0 +1,204 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class KeysetPage:
+    """One page of results plus the opaque cursors used to reach its neighbours."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a queryset ordered newest first by (created_at, id).
+
+    Each page is a single indexed range query, so page 500 costs the same as
+    page 1 - unlike OFFSET, which has to walk every skipped row.
+    """
+
+    def __init__(self, queryset, per_page=20):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    @staticmethod
+    def encode_cursor(direction, obj):
+        raw = json.dumps([direction, obj.created_at.isoformat(), str(obj.pk)])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """(direction, created_at, pk) from a cursor, or None if it is malformed."""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, created_at, pk = json.loads(base64.urlsafe_b64decode(padded))
+            if direction not in ('next', 'prev'):
+                return None
+            pk = self.queryset.model._meta.pk.to_python(pk)
+            return direction, datetime.fromisoformat(created_at), pk
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            return None
+
+    def page(self, cursor=None):
+        decoded = self.decode_cursor(cursor) if cursor else None
+        limit = self.per_page + 1
+
+        if decoded is None:
+            rows = list(self.queryset.order_by('-created_at', '-pk')[:limit])
+            has_more = len(rows) > self.per_page
+            items = rows[:self.per_page]
+            return KeysetPage(
+                items,
+                next_cursor=self.encode_cursor('next', items[-1]) if has_more else None,
+            )
+
+        direction, created_at, pk = decoded
+        if direction == 'next':
+            rows = list(
+                self.queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+                ).order_by('-created_at', '-pk')[:limit]
+            )
+            has_more = len(rows) > self.per_page
+            items = rows[:self.per_page]
+            return KeysetPage(
+                items,
+                next_cursor=self.encode_cursor('next', items[-1]) if has_more else None,
+                prev_cursor=self.encode_cursor('prev', items[0]) if items else None,
+            )
+
+        # Walking backwards: read ascending from the cursor, then flip for display
+        rows = list(
+            self.queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+            ).order_by('created_at', 'pk')[:limit]
+        )
+        has_more = len(rows) > self.per_page
+        items = rows[:self.per_page][::-1]
+        return KeysetPage(
+            items,
+            next_cursor=self.encode_cursor('next', items[-1]) if items else None,
+            prev_cursor=self.encode_cursor('prev', items[0]) if has_more else None,
+        )
+
+
+# Generic keyset helpers, for orderings such as ['-booking_date', '-id'] (the admin
+# changelists; see admin.KeysetChangeList)
+
+def keyset_after(ordering, values):
+    """Q for the rows that come after `values` (one per ordering field) in `ordering`."""
+    condition = Q()
+    for i, field in enumerate(ordering):
+        equal = {name.lstrip('-'): value for name, value in zip(ordering[:i], values[:i])}
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{field.lstrip("-")}__{lookup}': values[i]})
+    # The same rows, but with a plain range on the first field that an index can
+    # seek to; databases don't use the index for the OR alone
+    first = ordering[0]
+    bound = 'lte' if first.startswith('-') else 'gte'
+    return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+
+def reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+def encode_keyset_cursor(direction, ordering, obj):
+    values = [getattr(obj, field.lstrip('-')) for field in ordering]
+    # isoformat() keeps the microseconds DjangoJSONEncoder drops: ties compare exactly
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps([direction, *values], cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_keyset_cursor(cursor, model, ordering):
+    """(direction, values) from a cursor, or None if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, *values = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ('next', 'prev') or len(values) != len(ordering):
+            return None
+        fields = [model._meta.get_field(field.lstrip('-')) for field in ordering]
+        return direction, [field.to_python(value) for field, value in zip(fields, values)]
+    except (ValueError, TypeError, binascii.Error, ValidationError):
+        return None
+
+
+def estimated_count(queryset):
+    """
+    The planner's row estimate for `queryset`, or None if there isn't one: table
+    statistics when it is unfiltered, EXPLAIN on PostgreSQL otherwise.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                if queryset.query.where:
+                    sql, params = queryset.query.sql_with_params()
+                    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                    plan = cursor.fetchone()[0]
+                    plan = json.loads(plan) if isinstance(plan, str) else plan
+                    return int(plan[0]['Plan']['Plan Rows'])
+                cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [table])
+                row = cursor.fetchone()
+                # -1 until the table is first analyzed
+                return int(row[0]) if row and row[0] >= 0 else None
+            if connection.vendor == 'sqlite' and not queryset.query.where:
+                # Written by ANALYZE; the first number is the table's row count
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+    except DatabaseError:
+        # e.g. no sqlite_stat1 table before the first ANALYZE
+        return None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A Paginator that stops counting at ADMIN_EXACT_COUNT_LIMIT rows. Past that
+    it reports the database's estimate (`estimate` is 'about'), or just that
+    there are more than the limit (`estimate` is 'over') when the database has
+    none - instead of a COUNT(*) that reads every matching row.
+    """
+    estimate = None
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        queryset = self.object_list.order_by()
+        count = queryset[:limit + 1].count()
+        if count <= limit:
+            return count
+        estimate = estimated_count(queryset)
+        if estimate and estimate > limit:
+            self.estimate = 'about'
+            return estimate
+        self.estimate = 'over'
+        return limit
@@ -0,0 +1,238 @@
+"""
+Publish/subscribe for live updates (the /events/ SSE stream).
+
+publish() may be called from any thread or process; subscribers are asyncio
+tasks in the ASGI worker. LocalBroker only reaches subscribers in the same
+process. HubBroker relays every message through `manage.py pubsub_hub`, so
+events raised in one process (e.g. the Stripe event drainer) reach streams held
+by every ASGI worker.
+"""
+import asyncio
+import json
+import logging
+import socket
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """One subscriber's bounded queue, owned by the event loop that created it."""
+
+    def __init__(self, maxsize):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, message):
+        # Runs on the subscriber's loop. A client too slow to keep up loses
+        # messages and is told to resync rather than growing the queue forever.
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroker:
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self.subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                pass
+
+    def subscribe(self, channel):
+        # Called on the subscriber's event loop
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, channel, subscription):
+        with self._lock:
+            subscribers = self.subscriptions.get(channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.subscriptions.pop(channel, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self.subscriptions.values())
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+class HubBroker(LocalBroker):
+    """
+    LocalBroker fed by the pubsub_hub process. Publishing sends one JSON line to
+    the hub; each process keeps a single SUB connection that the hub fans every
+    line out to, and delivers the lines to its local subscribers.
+    """
+
+    def __init__(self, queue_size=100, address=None):
+        super().__init__(queue_size)
+        self.address = parse_address(address or settings.PUBSUB_HUB_ADDRESS)
+        self._publishers = threading.local()
+        self._listener = None
+
+    def publish(self, channel, message):
+        line = (json.dumps({'channel': channel, 'message': message}) + '\n').encode()
+        for attempt in range(2):
+            sock = getattr(self._publishers, 'sock', None)
+            try:
+                if sock is None:
+                    sock = socket.create_connection(self.address, timeout=2)
+                    sock.sendall(b'PUB\n')
+                    self._publishers.sock = sock
+                sock.sendall(line)
+                return
+            except OSError:
+                # Reconnect once (the hub may have restarted); after that, drop the update
+                self._publishers.sock = None
+                if sock is not None:
+                    sock.close()
+        logger.warning('pubsub hub at %s:%s unreachable; dropped a %s update', *self.address, channel)
+
+    def subscribe(self, channel):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self.listen())
+        return super().subscribe(channel)
+
+    async def listen(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(*self.address)
+                writer.write(b'SUB\n')
+                await writer.drain()
+                while line := await reader.readline():
+                    event = json.loads(line)
+                    super().publish(event['channel'], event['message'])
+            except (OSError, ValueError) as exc:
+                logger.warning('pubsub hub connection lost (%s); reconnecting', exc)
+            await asyncio.sleep(1)
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.PUBSUB_BROKER)(queue_size=settings.PUBSUB_QUEUE_SIZE)
+    return _broker
+
+
+def set_broker(broker):
+    """Swap the process-wide broker (tests); None rebuilds it from settings."""
+    global _broker
+    with _broker_lock:
+        _broker = broker
+
+
+def publish(channel, event, data):
+    get_broker().publish(channel, {'event': event, 'data': data})
+
+
+def publish_on_commit(user_id, event, data):
+    # Subscribers re-fetch on an event, so it must not arrive before the rows are visible
+    transaction.on_commit(lambda: publish(user_channel(user_id), event, data))
+
+
+def booking_event(booking):
+    return {
+        'id': str(booking.pk),
+        'status': booking.status,
+        'payment_status': booking.payment_status,
+    }
+
+
+def notification_event(notification):
+    return {
+        'id': notification.pk,
+        'notification_type': notification.notification_type,
+        'title': notification.title,
+        'related_booking': str(notification.related_booking_id) if notification.related_booking_id else None,
+    }
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+async def event_stream(channel):
+    """
+    The text/event-stream body for one client. An idle stream is one parked
+    coroutine and an empty queue; the keep-alive comment stops proxies from
+    timing it out and lets the server notice clients that have gone away.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(channel)
+    try:
+        yield f'retry: {settings.SSE_RETRY_MS}\n\n'
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), settings.SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if subscription.overflowed:
+                # Updates were dropped; the client reloads instead of replaying them
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.overflowed = False
+                yield format_event('resync', {})
+                continue
+            yield format_event(message['event'], message['data'])
+    finally:
+        # Also reached when the server cancels the stream on client disconnect
+        broker.unsubscribe(channel, subscription)
+
+
+async def serve_hub(host, port):
+    """The pubsub_hub server: every line a PUB connection sends goes to every SUB connection."""
+    subscribers = set()
+
+    async def handle(reader, writer):
+        role = (await reader.readline()).strip()
+        if role == b'SUB':
+            subscribers.add(writer)
+            try:
+                await reader.read()  # Held open until the worker goes away
+            finally:
+                subscribers.discard(writer)
+                writer.close()
+            return
+        try:
+            while line := await reader.readline():
+                for subscriber in list(subscribers):
+                    subscriber.write(line)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,75 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .dispatch import BUSY_STATUSES
+from .models import Booking, Notification, Service, Watermark
+from .notifications import notify_many
+
+REMINDER_WATERMARK = 'booking_reminders'
+
+
+def due_bookings(mark, window_end):
+    """
+    Bookings after the watermark that start by window_end, in (booking_date, id)
+    order: a range scan of booking_date_idx.
+    """
+    bookings = Booking.objects.filter(
+        status__in=BUSY_STATUSES,
+        booking_date__gte=mark.position,
+        booking_date__lte=window_end,
+    )
+    if mark.last_id:
+        bookings = bookings.exclude(booking_date=mark.position, pk__lte=mark.last_id)
+    return bookings.order_by('booking_date', 'pk').values_list('pk', 'user_id', 'service_id', 'booking_date')
+
+
+def reminder(services, booking_id, user_id, service_id, booking_date):
+    starts = timezone.localtime(booking_date)
+    return Notification(
+        user_id=user_id,
+        notification_type='booking_reminder',
+        title='Booking Reminder',
+        message=f"Your {services.get(service_id, 'roadside service')} booking starts at {starts:%H:%M on %d %b}.",
+        related_booking_id=booking_id,
+    )
+
+
+def send_booking_reminders(now=None, lead=None, chunk_size=5000, time_budget=None):
+    """
+    Remind customers of bookings starting within `lead` of now. Each chunk's
+    reminders and the watermark (the last booking reminded) commit together, so
+    nothing is sent twice and an interrupted or over-budget run resumes where it
+    stopped. The first run starts from now rather than reminding past bookings,
+    and a booking made after the watermark has passed its start time gets no
+    reminder. Returns counters for the report.
+    """
+    now = now or timezone.now()
+    lead = lead or timedelta(minutes=settings.BOOKING_REMINDER_LEAD_MINUTES)
+    window_end = now + lead
+    services = dict(Service.objects.values_list('pk', 'name'))  # The catalog is a handful of rows
+    stats = {'reminders': 0, 'chunks': 0, 'complete': False}
+    started = time.perf_counter()
+    while True:
+        with transaction.atomic():
+            mark, _ = Watermark.objects.select_for_update().get_or_create(
+                name=REMINDER_WATERMARK, defaults={'position': now}
+            )
+            rows = list(due_bookings(mark, window_end)[:chunk_size])
+            if rows:
+                notify_many([reminder(services, *row) for row in rows], batch_size=chunk_size)
+                last_id, _, _, mark.position = rows[-1]
+                mark.last_id = str(last_id)
+                mark.save(update_fields=['position', 'last_id', 'updated_at'])
+        stats['reminders'] += len(rows)
+        stats['chunks'] += bool(rows)
+        if len(rows) < chunk_size:
+            stats['complete'] = True
+            break
+        if time_budget is not None and time.perf_counter() - started >= time_budget:
+            break
+    stats['elapsed'] = time.perf_counter() - started
+    return stats
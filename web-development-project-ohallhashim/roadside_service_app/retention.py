@@ -0,0 +1,200 @@
+import gzip
+import json
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from uuid import UUID
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ArchivedBooking, ArchivedNotification, Booking, BookingIdAlias, Notification, Payment
+from .notifications import adjust_unread
+from .routers import replicas
+from .search import remove_objects
+
+# Old notifications and finished bookings leave the live tables in small chunks
+# in primary-key order, each in its own short transaction, with a pause (and a
+# wait for replicas to catch up) in between, so no long lock is held and the
+# replicas never fall far behind. Rows go to an archive table or to gzipped
+# JSON-lines files (settings.RETENTION_POLICIES); archived bookings stay readable
+# on their booking_detail page.
+#
+# Rows are deleted with raw DELETEs: the post_delete signals would take the rows
+# out of the summary tables, and the revenue / status reports keep counting
+# archived bookings. (summaries.rebuild() only sees live rows, so rebuild the
+# days before the retention cut-off only if that is what you want.)
+
+
+def _jsonable(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+def _row(values):
+    return {key: _jsonable(value) for key, value in values.items()}
+
+
+def replica_lag():
+    """Seconds the furthest-behind PostgreSQL replica is behind the primary (0 for others)."""
+    lag = 0
+    for alias in replicas():
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            continue
+        with connection.cursor() as cursor:
+            # An idle primary sends nothing to replay: caught up, not lagging
+            cursor.execute(
+                'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+                'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+            )
+            lag = max(lag, float(cursor.fetchone()[0]))
+    return lag
+
+
+def throttle(pause):
+    time.sleep(pause)
+    while replicas() and replica_lag() > settings.RETENTION_MAX_REPLICA_LAG:
+        time.sleep(max(pause, 1))
+
+
+def _raw_delete(queryset):
+    # No cascade collection, no signals (see above); dependents are removed first
+    queryset._raw_delete(DEFAULT_DB_ALIAS)
+
+
+def _forget_notifications(rows):
+    """Keep unread counters and the search index in step with deleted notifications."""
+    per_user = Counter(row['user_id'] for row in rows if not row['is_read'])
+    users_by_delta = defaultdict(list)
+    for user_id, count in per_user.items():
+        users_by_delta[-count].append(user_id)
+    for delta, user_ids in users_by_delta.items():
+        adjust_unread(user_ids, delta)
+    remove_objects(Notification, [row['id'] for row in rows])
+
+
+def _archive_to_file(name, records):
+    directory = Path(settings.RETENTION_ARCHIVE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{name}-{timezone.now():%Y%m%d}.jsonl.gz'
+    # One gzip member per chunk, closed before the rows are deleted; gzip readers
+    # (and zcat) read the members back to back
+    with gzip.open(path, 'at', encoding='utf-8') as archive:
+        archive.writelines(json.dumps(record) + '\n' for record in records)
+    return path
+
+
+def archive_notifications(ids, archive):
+    rows = [_row(values) for values in Notification.objects.filter(pk__in=ids).values()]
+    if archive == 'table':
+        ArchivedNotification.objects.bulk_create([
+            ArchivedNotification(id=row['id'], user_id=row['user_id'], created_at=row['created_at'], data=row)
+            for row in rows
+        ], ignore_conflicts=True)
+    elif archive == 'file':
+        _archive_to_file('notifications', rows)
+    _raw_delete(Notification.objects.filter(pk__in=ids))
+    _forget_notifications(rows)
+    return len(rows)
+
+
+def archive_bookings(ids, archive):
+    bookings = {row['id']: _row(row) for row in Booking.objects.filter(pk__in=ids).values()}
+    services = Booking.objects.filter(pk__in=ids).values(
+        'id', 'service__id', 'service__name', 'service__price', 'service__duration',
+    )
+    for service in services:
+        bookings[service['id']]['service'] = _row({
+            key.removeprefix('service__'): value for key, value in service.items() if key != 'id'
+        })
+    for payment in Payment.objects.filter(booking_id__in=ids).values():
+        bookings[payment['booking_id']]['payment'] = _row(payment)
+    notifications = [_row(values) for values in Notification.objects.filter(related_booking_id__in=ids).values()]
+    for notification in notifications:
+        bookings[UUID(notification['related_booking_id'])].setdefault('notifications', []).append(notification)
+    # Ids the booking had before convert_booking_ids
+    for old_id, booking_id in BookingIdAlias.objects.filter(booking_id__in=ids).values_list('old_id', 'booking_id'):
+        bookings[booking_id].setdefault('id_aliases', []).append(str(old_id))
+
+    records = list(bookings.values())
+    if archive == 'table':
+        ArchivedBooking.objects.bulk_create([
+            ArchivedBooking(id=record['id'], user_id=record['user_id'], created_at=record['created_at'], data=record)
+            for record in records
+        ], ignore_conflicts=True)
+    elif archive == 'file':
+        _archive_to_file('bookings', records)
+
+    _raw_delete(Notification.objects.filter(related_booking_id__in=ids))
+    _forget_notifications(notifications)
+    _raw_delete(Payment.objects.filter(booking_id__in=ids))
+    aliases = BookingIdAlias.objects.filter(booking_id__in=ids)
+    if archive == 'table':
+        # The archive entry keeps the booking's id, so its old URLs still resolve
+        aliases.update(booking=None, archived_booking_id=F('booking_id'))
+    else:
+        _raw_delete(aliases)
+    remove_objects(Booking, ids)
+    _raw_delete(Booking.objects.filter(pk__in=ids))
+    return len(records)
+
+
+def expired(name, policy, now=None):
+    """The rows `policy` says should go (RETENTION_POLICIES[name])."""
+    cutoff = (now or timezone.now()) - timedelta(days=policy['days'])
+    if name == 'notifications':
+        return Notification.objects.filter(created_at__lt=cutoff)
+    # A booking is kept until it is finished and its date has passed the cut-off
+    return Booking.objects.filter(status__in=policy['statuses'], booking_date__lt=cutoff)
+
+
+ARCHIVERS = {
+    'notifications': archive_notifications,
+    'bookings': archive_bookings,
+}
+
+
+def apply_policy(name, now=None, chunk_size=None, pause=None, time_budget=None, dry_run=False):
+    """
+    Archive and delete everything RETENTION_POLICIES[name] has expired, a chunk
+    at a time. Stops early once `time_budget` seconds are spent; the next run
+    picks up where it left off. Returns stats for the command's report.
+    """
+    policy = settings.RETENTION_POLICIES[name]
+    chunk_size = chunk_size or settings.RETENTION_CHUNK_SIZE
+    pause = settings.RETENTION_CHUNK_PAUSE if pause is None else pause
+    queryset = expired(name, policy, now)
+    stats = {'rows': 0, 'chunks': 0, 'complete': True, 'elapsed': 0}
+    started = time.monotonic()
+    if dry_run:
+        stats['rows'] = queryset.count()
+        return stats
+
+    last = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last is not None:
+            chunk = chunk.filter(pk__gt=last)
+        ids = list(chunk.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            stats['rows'] += ARCHIVERS[name](ids, policy.get('archive'))
+        stats['chunks'] += 1
+        last = ids[-1]
+        if len(ids) < chunk_size:
+            break
+        if time_budget is not None and time.monotonic() - started > time_budget:
+            stats['complete'] = False
+            break
+        throttle(pause)
+    stats['elapsed'] = time.monotonic() - started
+    return stats
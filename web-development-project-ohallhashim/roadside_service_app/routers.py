@@ -0,0 +1,69 @@
+import contextvars
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+# Set while a view marked with @replica_reads is running
+_use_replicas = contextvars.ContextVar('roadside_use_replicas', default=False)
+
+# Apps whose rows must be read back immediately after they are written
+PRIMARY_ONLY_APPS = {'sessions'}
+
+PIN_COOKIE = 'primary_pin'
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def is_pinned(request):
+    """True while the client is inside the read-your-writes window after a write."""
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def replica_reads(view):
+    """
+    Let a read-only view's queries go to a replica. Unsafe methods and clients
+    that wrote recently (see ReplicaPinningMiddleware) stay on the primary.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not replicas() or is_pinned(request):
+            return view(request, *args, **kwargs)
+        token = _use_replicas.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replicas.reset(token)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes, migrations and everything outside @replica_reads views use
+    'default'. Reads inside those views go to a random DATABASE_REPLICAS alias.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _use_replicas.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return 'default'
+        # Inside a transaction the primary may hold rows a replica has not seen
+        if connections['default'].in_atomic_block:
+            return 'default'
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,121 @@
+import re
+
+from django.db import connection, models, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import Booking, Contact, Notification, SearchEntry
+
+# Text the admin searches, copied into one SearchEntry row per object. The row's
+# `body` is indexed by an FTS5 table on SQLite or a GIN tsvector index on
+# PostgreSQL (migration 0014), so a search is an index lookup instead of an
+# icontains scan over every message. The signals in signals.py keep it in step;
+# code that uses bulk_create() / update() on these fields calls index_objects itself.
+SEARCH_INDEXES = {
+    'contact': (Contact, ['name', 'email', 'subject', 'message']),
+    'booking': (Booking, ['location', 'vehicle_info', 'notes']),
+    'notification': (Notification, ['title', 'message']),
+}
+KINDS = {model: kind for kind, (model, _) in SEARCH_INDEXES.items()}
+
+# Words, for turning free text into an FTS5 query
+WORD_RE = re.compile(r'\w+')
+
+
+def object_id(pk):
+    return pk.hex if hasattr(pk, 'hex') else str(pk)
+
+
+def entry_body(obj, fields):
+    return ' '.join(str(getattr(obj, field) or '') for field in fields)
+
+
+def index_objects(objs, batch_size=1000):
+    """Add or refresh the search rows of saved contacts, bookings or notifications."""
+    objs = list(objs)
+    if not objs:
+        return
+    kind = KINDS[type(objs[0])]
+    fields = SEARCH_INDEXES[kind][1]
+    SearchEntry.objects.bulk_create(
+        [SearchEntry(kind=kind, object_id=object_id(obj.pk), body=entry_body(obj, fields)) for obj in objs],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=['body'],
+    )
+
+
+def remove_objects(model, pks):
+    SearchEntry.objects.filter(kind=KINDS[model], object_id__in=[object_id(pk) for pk in pks]).delete()
+
+
+class TextMatch(models.Func):
+    """
+    to_tsvector('english', body) @@ plainto_tsquery('english', query) on PostgreSQL,
+    spelled exactly like the GIN index expression so the planner uses it.
+    """
+    template = "to_tsvector('english', %(expressions)s)"
+    arg_joiner = ") @@ plainto_tsquery('english', "
+    output_field = models.BooleanField()
+
+
+def matching_entries(kind, query):
+    """The SearchEntry rows of `kind` containing every word of `query` (as a prefix on SQLite)."""
+    if connection.vendor == 'sqlite':
+        words = WORD_RE.findall(query)
+        if not words:
+            return SearchEntry.objects.none()
+        # "word"* per word: quoted so FTS5 operators in the input are plain text. The
+        # kind is matched in FTS5 too; filtering it in SQL would have SQLite walk every
+        # entry of the kind instead of starting from the matches.
+        match = f'kind:"{kind}" AND body:(' + ' '.join(f'"{word}"*' for word in words) + ')'
+        return SearchEntry.objects.filter(id__in=RawSQL('SELECT rowid FROM search_fts WHERE search_fts MATCH %s', [match]))
+    entries = SearchEntry.objects.filter(kind=kind)
+    if connection.vendor == 'postgresql':
+        return entries.filter(TextMatch('body', models.Value(query)))
+    # No full-text index on other databases
+    for word in query.split():
+        entries = entries.filter(body__icontains=word)
+    return entries
+
+
+def search(model, query):
+    """Primary keys of `model` rows matching `query`, as a subquery for pk__in."""
+    pk_field = model._meta.pk
+    if isinstance(pk_field, models.UUIDField) and connection.vendor == 'postgresql':
+        # object_id is the hex form, which PostgreSQL casts to uuid as well
+        output_field = models.UUIDField()
+    elif isinstance(pk_field, models.UUIDField):
+        # Stored as the same 32-character hex on other databases
+        return matching_entries(KINDS[model], query).values('object_id')
+    else:
+        output_field = models.BigIntegerField()
+    return matching_entries(KINDS[model], query).values(object_pk=Cast('object_id', output_field))
+
+
+def rebuild_index(chunk_size=2000):
+    """Re-create every search row from the source tables. Returns rows indexed per kind."""
+    counts = {}
+    for kind, (model, fields) in SEARCH_INDEXES.items():
+        # One transaction per kind, so searches never see it half-indexed
+        with transaction.atomic():
+            SearchEntry.objects.filter(kind=kind).delete()
+            counts[kind] = 0
+            chunk = []
+            for obj in model.objects.order_by().only('pk', *fields).iterator(chunk_size=chunk_size):
+                chunk.append(obj)
+                if len(chunk) == chunk_size:
+                    index_objects(chunk, chunk_size)
+                    counts[kind] += len(chunk)
+                    chunk = []
+            index_objects(chunk, chunk_size)
+            counts[kind] += len(chunk)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            # Rewrite the FTS5 index from the content table, merge its segments and
+            # refresh the planner's statistics (see migration 0014)
+            cursor.execute("INSERT INTO search_fts(search_fts) VALUES ('rebuild')")
+            cursor.execute("INSERT INTO search_fts(search_fts) VALUES ('optimize')")
+            cursor.execute('ANALYZE')
+    return counts
@@ -0,0 +1,197 @@
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .ids import uuid7
+from .models import Booking, Notification, Payment, Service, Staff, User
+
+# Rows are scattered around Provo, UT
+CENTER = (40.2338, -111.6585)
+SPREAD_DEGREES = 0.3
+SKILLS = ['tire', 'battery', 'fuel', 'towing', 'lockout', 'repair']
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Let bulk_create keep the created_at / updated_at values we generate instead
+    of stamping every row with "now" (auto_now / auto_now_add run in pre_save).
+    """
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def skewed_index(size, rng):
+    """Pick an index so a handful of (fleet) accounts own most of the rows."""
+    # 80/20 Pareto: the first ~5% of accounts receive roughly half of all rows
+    return int((rng.paretovariate(1.16) - 1) * size * 0.05) % size
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def seed_users(count, batch_size=5000, prefix='loaduser'):
+    """Create `count` customers with unusable passwords and return their ids."""
+    run = uuid.uuid4().hex[:6]
+    users = (
+        User(username=f'{prefix}_{run}_{i}', email=f'{prefix}_{run}_{i}@example.com', password='!')
+        for i in range(count)
+    )
+    for chunk in chunked(users, batch_size):
+        User.objects.bulk_create(chunk, batch_size=batch_size)
+    return list(User.objects.filter(username__startswith=f'{prefix}_{run}_').values_list('id', flat=True))
+
+
+def seed_staff(count, batch_size=5000, seed=None, prefix='loadtech'):
+    """
+    Create `count` staff members (mostly mechanics) with technician accounts and
+    positions around CENTER. Returns the ids of the mechanics.
+    """
+    rng = random.Random(seed)
+    run = uuid.uuid4().hex[:6]
+    users = (
+        User(username=f'{prefix}_{run}_{i}', email=f'{prefix}_{run}_{i}@example.com', password='!',
+             first_name=rng.choice(['Sam', 'Alex', 'Jordan', 'Taylor', 'Casey', 'Riley']),
+             last_name=rng.choice(['Smith', 'Jensen', 'Young', 'Larsen', 'Christensen', 'Nielsen']),
+             is_technician=True)
+        for i in range(count)
+    )
+    for chunk in chunked(users, batch_size):
+        User.objects.bulk_create(chunk, batch_size=batch_size)
+    user_ids = User.objects.filter(username__startswith=f'{prefix}_{run}_').values_list('id', flat=True)
+
+    roles = ['mechanic'] * 80 + ['dispatcher'] * 15 + ['manager'] * 5
+    statuses = ['active'] * 60 + ['on_call'] * 25 + ['inactive'] * 15
+    staff = (
+        Staff(
+            user_id=user_id,
+            role=rng.choice(roles),
+            phone_number=f'801-555-{rng.randint(0, 9999):04d}',
+            hire_date=date.today() - timedelta(days=rng.randint(30, 3650)),
+            status=rng.choice(statuses),
+            specializations=', '.join(rng.sample(SKILLS, rng.randint(0, 3))),
+            rating=Decimal(rng.randint(350, 500)) / 100,
+            latitude=CENTER[0] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+            longitude=CENTER[1] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+        )
+        for user_id in user_ids.iterator()
+    )
+    for chunk in chunked(staff, batch_size):
+        Staff.objects.bulk_create(chunk, batch_size=batch_size)
+    return list(Staff.objects.filter(user__username__startswith=f'{prefix}_{run}_', role='mechanic')
+                .values_list('id', flat=True))
+
+
+def seed_bookings(count, user_ids, days=365, batch_size=5000, seed=None, progress=None,
+                  technician_ids=None, with_payments=False):
+    """
+    Bulk insert `count` bookings spread over the last `days` days with a
+    realistic status mix, skewed towards a few heavy users. Work that has
+    started is assigned to one of `technician_ids`, and `with_payments` adds a
+    Payment row for every paid booking.
+    """
+    rng = random.Random(seed)
+    services = dict(Service.objects.values_list('id', 'price'))
+    if not services:
+        raise ValueError('Seed the service catalog first (manage.py setup_services).')
+    service_ids = list(services)
+    now = timezone.now()
+    statuses = ['completed'] * 70 + ['cancelled'] * 10 + ['confirmed'] * 8 + ['pending'] * 8 + ['in_progress'] * 4
+
+    def rows():
+        for _ in range(count):
+            created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+            status = rng.choice(statuses)
+            assigned = technician_ids and status in ('completed', 'in_progress')
+            yield Booking(
+                id=uuid7(created_at),
+                user_id=user_ids[skewed_index(len(user_ids), rng)],
+                service_id=rng.choice(service_ids),
+                booking_date=created_at + timedelta(minutes=rng.randint(15, 72 * 60)),
+                location=f'{rng.randint(1, 9999)} {rng.choice(["Main", "State", "Center", "University"])} St, Provo, UT',
+                vehicle_info=rng.choice(['Toyota Camry', 'Ford F-150', 'Honda Civic', 'Subaru Outback', None]),
+                status=status,
+                payment_status='completed' if status in ('completed', 'confirmed', 'in_progress') else 'pending',
+                latitude=CENTER[0] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+                longitude=CENTER[1] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+                assigned_technician_id=rng.choice(technician_ids) if assigned else None,
+                assigned_at=created_at + timedelta(minutes=rng.randint(1, 30)) if assigned else None,
+                created_at=created_at,
+                updated_at=created_at,
+            )
+
+    def payments(bookings):
+        for booking in bookings:
+            if booking.payment_status == 'completed':
+                paid_at = booking.created_at + timedelta(minutes=rng.randint(1, 10))
+                yield Payment(
+                    booking_id=booking.id,
+                    amount=services[booking.service_id],
+                    stripe_payment_intent_id=f'pi_seed_{uuid.uuid4().hex[:24]}',
+                    payment_status='completed',
+                    created_at=paid_at,
+                    updated_at=paid_at,
+                )
+
+    created = 0
+    with explicit_timestamps(Booking, Payment):
+        for chunk in chunked(rows(), batch_size):
+            with transaction.atomic():
+                Booking.objects.bulk_create(chunk, batch_size=batch_size)
+                if with_payments:
+                    Payment.objects.bulk_create(payments(chunk), batch_size=batch_size)
+            created += len(chunk)
+            if progress:
+                progress(created)
+    return created
+
+
+def seed_notifications(count, user_ids, days=365, unread_ratio=0.1, batch_size=5000, seed=None, progress=None):
+    """Bulk insert `count` notifications, roughly `unread_ratio` of them unread."""
+    rng = random.Random(seed)
+    now = timezone.now()
+    types = [choice for choice, _ in Notification.NOTIFICATION_TYPES]
+
+    def rows():
+        for _ in range(count):
+            notification_type = rng.choice(types)
+            yield Notification(
+                user_id=user_ids[skewed_index(len(user_ids), rng)],
+                notification_type=notification_type,
+                title=notification_type.replace('_', ' ').title(),
+                message='Your roadside service booking has been updated.',
+                is_read=rng.random() > unread_ratio,
+                created_at=now - timedelta(seconds=rng.randint(0, days * 86400)),
+            )
+
+    created = 0
+    with explicit_timestamps(Notification):
+        for chunk in chunked(rows(), batch_size):
+            with transaction.atomic():
+                Notification.objects.bulk_create(chunk, batch_size=batch_size)
+            created += len(chunk)
+            if progress:
+                progress(created)
+    return created
@@ -0,0 +1,118 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .catalog import invalidate_catalog
+from .models import Booking, Contact, Notification, Payment, Service, User, bookings_transitioned
+from .notifications import adjust_unread
+from .pubsub import booking_event, notification_event, publish_on_commit
+from .search import KINDS, SEARCH_INDEXES, index_objects, remove_objects
+from .summaries import bookings_changed, payments_changed
+from .user_cache import invalidate_user_cache
+
+
+# Bump the catalog version once the edit is committed, so no request can cache
+# the pre-edit rows after the bump.
+@receiver([post_save, post_delete], sender=Service)
+def service_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, **kwargs):
+    old = None if created else instance._loaded_values
+    new = instance.tracked_values()
+    # Counts creates, and read flags flipped by a plain save (e.g. the admin form);
+    # mark_read() does the same in bulk
+    if old != new:
+        if old is not None and not old['is_read']:
+            adjust_unread([old['user_id']], -1)
+        if not new['is_read']:
+            adjust_unread([new['user_id']], 1)
+    instance._loaded_values = new
+    if created:
+        publish_on_commit(instance.user_id, 'notification', notification_event(instance))
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        adjust_unread([instance.user_id], -1)
+
+
+# Bookings, payments and notifications remember their tracked fields as loaded (TrackedFieldsMixin);
+# one saved without them (e.g. loaded with defer()) reads them back first.
+@receiver(pre_save, sender=Booking)
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=Notification)
+def load_tracked_values(sender, instance, **kwargs):
+    if getattr(instance, '_loaded_values', None) is None and not instance._state.adding:
+        instance._loaded_values = sender.objects.filter(pk=instance.pk).values(*sender.TRACKED_FIELDS).first()
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, created, **kwargs):
+    old = None if created else instance._loaded_values
+    new = instance.tracked_values()
+    bookings_changed([(old, new)])
+    # Live updates (/events/): new bookings and status changes
+    if old is None or old['status'] != new['status']:
+        publish_on_commit(instance.user_id, 'booking', booking_event(instance))
+    instance._loaded_values = new
+
+
+# Booking.transition() writes with update(), which sends no post_save
+@receiver(bookings_transitioned, sender=Booking)
+def booking_transitioned(sender, changes, **kwargs):
+    bookings_changed([(old, booking.tracked_values()) for booking, old in changes])
+    for booking, _ in changes:
+        publish_on_commit(booking.user_id, 'booking', booking_event(booking))
+    invalidate_user_cache([booking.user_id for booking, _ in changes])
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, created, **kwargs):
+    new = instance.tracked_values()
+    payments_changed([(None if created else instance._loaded_values, new)])
+    instance._loaded_values = new
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    bookings_changed([(getattr(instance, '_loaded_values', None) or instance.tracked_values(), None)])
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    payments_changed([(getattr(instance, '_loaded_values', None) or instance.tracked_values(), None)])
+
+
+@receiver([post_save, post_delete], sender=Booking)
+@receiver([post_save, post_delete], sender=Notification)
+def user_rows_changed(sender, instance, **kwargs):
+    invalidate_user_cache([instance.user_id])
+
+
+# Full-text search rows (search.py); only saves that touch the indexed fields
+@receiver(post_save, sender=Contact)
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=Notification)
+def search_source_saved(sender, instance, created, update_fields=None, **kwargs):
+    fields = SEARCH_INDEXES[KINDS[sender]][1]
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return
+    if set(fields) <= instance.get_deferred_fields():
+        return  # Not loaded, so not changed either
+    index_objects([instance])
+
+
+@receiver(post_delete, sender=Contact)
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Notification)
+def search_source_deleted(sender, instance, **kwargs):
+    remove_objects(sender, [instance.pk])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user_cache([instance.pk])
@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .metrics import timed_stripe_call
+
+# Intents in these states can still be confirmed by the card form, so a repeat
+# visit to the payment page reuses them instead of creating another.
+REUSABLE_INTENT_STATUSES = {'requires_payment_method', 'requires_confirmation', 'requires_action'}
+
+_client = None
+_executor = None
+_lock = threading.Lock()
+
+
+def build_stripe_client():
+    """
+    StripeClient over one pooled keep-alive requests.Session with explicit
+    timeouts. STRIPE_API_BASE points it at a local stub (manage.py stripe_stub).
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.STRIPE_POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    base_addresses = {'api': settings.STRIPE_API_BASE} if settings.STRIPE_API_BASE else {}
+    return stripe.StripeClient(
+        settings.STRIPE_SECRET_KEY,
+        http_client=stripe.RequestsClient(timeout=settings.STRIPE_TIMEOUT, session=session),
+        base_addresses=base_addresses,
+        max_network_retries=settings.STRIPE_MAX_NETWORK_RETRIES,
+    )
+
+
+def get_stripe_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = build_stripe_client()
+    return _client
+
+
+def set_stripe_client(client):
+    """Swap the process-wide client (tests, benchmarks); None rebuilds it from settings."""
+    global _client
+    with _lock:
+        _client = client
+
+
+def intent_amount(booking):
+    return int(booking.service.price * 100)  # Convert to cents
+
+
+def ensure_payment_intent(booking):
+    """
+    Return (intent, created) for the booking, reusing the stored intent when it
+    is still payable for the same amount. Blocking: call from a worker thread
+    (sync_to_async) in async code.
+    """
+    client = get_stripe_client()
+    amount = intent_amount(booking)
+    if booking.stripe_payment_intent_id:
+        with timed_stripe_call('payment_intents.retrieve'):
+            intent = client.payment_intents.retrieve(booking.stripe_payment_intent_id)
+        if intent.amount == amount and intent.status in REUSABLE_INTENT_STATUSES:
+            return intent, False
+
+    with timed_stripe_call('payment_intents.create'):
+        intent = client.payment_intents.create(
+            params={
+                'amount': amount,
+                'currency': 'usd',
+                'metadata': {'booking_id': str(booking.id)},
+            },
+            # A double-clicked Pay button sends two POSTs; Stripe returns the same intent for both
+            options={'idempotency_key': f'booking-{booking.id}-{amount}-{booking.stripe_payment_intent_id or "first"}'},
+        )
+    return intent, True
+
+
+def _stripe_executor():
+    # Dedicated threads for blocking Stripe calls from async views, sized like the
+    # HTTP pool; the event loop's default executor is only min(32, cpus + 4) wide
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.STRIPE_POOL_SIZE, thread_name_prefix='stripe')
+    return _executor
+
+
+async def aensure_payment_intent(booking):
+    return await sync_to_async(ensure_payment_intent, thread_sensitive=False, executor=_stripe_executor())(booking)
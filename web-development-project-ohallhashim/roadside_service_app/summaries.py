@@ -0,0 +1,133 @@
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Booking, DailyBookingStatus, DailyRevenue, Payment, Service, TechnicianUtilization
+
+# Each booking / payment counts towards a few summary rows. A change to one is
+# applied as (new contributions - old contributions): a handful of
+# UPDATE ... SET n = n + delta statements in the same transaction as the change,
+# so report queries read a few hundred rows instead of aggregating the source tables.
+# Code that changes rows with update() / bulk_create() calls bookings_changed /
+# payments_changed itself, as the signals don't fire.
+
+
+def _booking_rows(state, durations):
+    if state is None:
+        return []
+    day = timezone.localdate(state['booking_date'])
+    rows = [(DailyBookingStatus, (('day', day), ('status', state['status'])), {'bookings': 1})]
+    if state['assigned_technician_id'] and state['status'] != 'cancelled':
+        rows.append((
+            TechnicianUtilization,
+            (('day', day), ('technician_id', state['assigned_technician_id'])),
+            {'jobs': 1, 'booked_minutes': durations[state['service_id']]},
+        ))
+    return rows
+
+
+def _payment_rows(state, services):
+    if state is None or state['payment_status'] != 'completed':
+        return []
+    day = timezone.localdate(state['created_at'])
+    return [(
+        DailyRevenue,
+        (('day', day), ('service_id', services[state['booking_id']])),
+        {'payments': 1, 'revenue': state['amount']},
+    )]
+
+
+def _collect(changes, rows_for, lookup):
+    deltas = defaultdict(lambda: defaultdict(int))
+    for old, new in changes:
+        for sign, state in ((-1, old), (1, new)):
+            for model, key, values in rows_for(state, lookup):
+                for field, value in values.items():
+                    deltas[model, key][field] += sign * value
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Add each {field: delta} to its summary row, creating the row if it is missing."""
+    for (model, key), values in deltas.items():
+        values = {field: delta for field, delta in values.items() if delta}
+        if not values:
+            continue
+        row = model.objects.filter(**dict(key))
+        increments = {field: F(field) + delta for field, delta in values.items()}
+        if row.update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(**dict(key), **values)
+        except IntegrityError:
+            # Another transaction inserted the row first
+            row.update(**increments)
+
+
+def bookings_changed(changes):
+    """changes: [(old tracked values or None, new tracked values or None)]"""
+    changes = [(old, new) for old, new in changes if old != new]
+    states = [state for change in changes for state in change if state and state['assigned_technician_id']]
+    durations = {}
+    if states:
+        durations = dict(
+            Service.objects.filter(pk__in={s['service_id'] for s in states}).values_list('pk', 'duration')
+        )
+    apply_deltas(_collect(changes, _booking_rows, durations))
+
+
+def payments_changed(changes):
+    """changes: [(old tracked values or None, new tracked values or None)]"""
+    changes = [(old, new) for old, new in changes if old != new]
+    booking_ids = {state['booking_id'] for change in changes for state in change if state}
+    if not booking_ids:
+        return
+    services = dict(Booking.objects.filter(pk__in=booking_ids).values_list('pk', 'service_id'))
+    apply_deltas(_collect(changes, _payment_rows, services))
+
+
+def rebuild(since=None):
+    """
+    Recompute the summaries from the source tables, for every day or from
+    `since` (a date) on. Changes committed while it runs may be missed; run it
+    when writes are quiet.
+    """
+    start = timezone.make_aware(datetime.combine(since, time.min)) if since else None
+    with transaction.atomic():
+        for model in (DailyRevenue, DailyBookingStatus, TechnicianUtilization):
+            rows = model.objects.all()
+            if since:
+                rows = rows.filter(day__gte=since)
+            rows.delete()
+
+        bookings = Booking.objects.order_by()
+        payments = Payment.objects.filter(payment_status='completed').order_by()
+        if start:
+            bookings = bookings.filter(booking_date__gte=start)
+            payments = payments.filter(created_at__gte=start)
+
+        DailyBookingStatus.objects.bulk_create([
+            DailyBookingStatus(day=row['day'], status=row['status'], bookings=row['bookings'])
+            for row in bookings.annotate(day=TruncDate('booking_date'))
+            .values('day', 'status').annotate(bookings=Count('pk'))
+        ], batch_size=1000)
+        TechnicianUtilization.objects.bulk_create([
+            TechnicianUtilization(
+                day=row['day'], technician_id=row['assigned_technician'],
+                jobs=row['jobs'], booked_minutes=row['booked_minutes'],
+            )
+            for row in bookings.filter(assigned_technician__isnull=False).exclude(status='cancelled')
+            .annotate(day=TruncDate('booking_date'))
+            .values('day', 'assigned_technician')
+            .annotate(jobs=Count('pk'), booked_minutes=Sum('service__duration'))
+        ], batch_size=1000)
+        DailyRevenue.objects.bulk_create([
+            DailyRevenue(day=row['day'], service_id=row['booking__service'], payments=row['payments'], revenue=row['revenue'])
+            for row in payments.annotate(day=TruncDate('created_at'))
+            .values('day', 'booking__service').annotate(payments=Count('pk'), revenue=Sum('amount'))
+        ], batch_size=1000)
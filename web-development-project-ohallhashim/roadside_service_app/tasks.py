@@ -0,0 +1,76 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .db_writes import serialized_write
+from .jobs import task
+from .models import Booking, Notification, User
+from .stripe_client import ensure_payment_intent
+from .user_cache import invalidate_user_cache
+
+# Work the views hand to run_workers. Each task may run more than once, so they
+# re-read the rows they need and stop early if the work is already done.
+
+
+@task(priority=10)
+@serialized_write
+def send_notification(user_id, notification_type, title, message, related_booking_id=None, dedupe_key=None):
+    # A redelivered job finds the notification its earlier run made
+    if dedupe_key and Notification.objects.filter(dedupe_key=dedupe_key).exists():
+        return
+    Notification.objects.create(
+        user_id=user_id,
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        related_booking_id=related_booking_id,
+        dedupe_key=dedupe_key,
+    )
+
+
+@task(priority=5)
+def prepare_payment_intent(booking_id):
+    # Create the Stripe intent before the customer reaches the payment page. The
+    # idempotency key matches the one payment() would use, so a race between the
+    # two still produces a single intent.
+    booking = Booking.objects.with_related().filter(pk=booking_id).first()
+    if booking is None or booking.payment_status == 'completed':
+        return
+    intent, created = ensure_payment_intent(booking)
+    if created:
+        Booking.objects.filter(pk=booking.pk, stripe_payment_intent_id=booking.stripe_payment_intent_id).update(
+            stripe_payment_intent_id=intent.id
+        )
+
+
+@task()
+def process_profile_picture(user_id):
+    # Shrink the upload to PROFILE_PICTURE_SIZE pixels on its longest side
+    user = User.objects.filter(pk=user_id).first()
+    if user is None or not user.profile_picture:
+        return
+    name = user.profile_picture.name
+    with user.profile_picture.open('rb') as upload:
+        image = Image.open(upload)
+        image_format = image.format or 'PNG'
+        image.load()
+    size = settings.PROFILE_PICTURE_SIZE
+    if max(image.size) <= size:
+        return
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((size, size))
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    resized = BytesIO()
+    image.save(resized, format=image_format)
+
+    storage = user.profile_picture.storage
+    new_name = storage.save(name, ContentFile(resized.getvalue()))
+    # Only swap the file in if the user hasn't uploaded another one meanwhile
+    if User.objects.filter(pk=user_id, profile_picture=name).update(profile_picture=new_name):
+        storage.delete(name)
+        invalidate_user_cache([user_id])
+    else:
+        storage.delete(new_name)
@@ -1,3 +1,1537 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import gzip
+import itertools
+import json
+import random
+import re
+import tempfile
+import threading
+import uuid
+import warnings
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.sessions.models import Session
+from django.db import OperationalError, connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .availability import IntervalSet
+from .catalog import active_services
+from .db_writes import retry_on_locked, serialized_write
+from .dispatch import GridIndex, Technician, assign_pending_bookings, distance_km
+from .exports import export_lines
+from .admin import BookingAdmin
+from .forms import BookingForm
+from .ids import uuid7, uuid7_time
+from .jobs import TASKS, claim_job, enqueue, requeue_stale, run_pending, task, work
+from .metrics import REQUEST_LATENCY, REQUEST_QUERIES, STRIPE_CALLS, TEMPLATE_RENDER, reset_metrics
+from .models import ArchivedBooking, Booking, BookingIdAlias, Contact, StaleBookingError, DailyBookingStatus, DailyRevenue, Job, TechnicianUtilization, Notification, Payment, SearchEntry, Service, Staff, StripeEvent, User
+from .pagination import EstimatedCountPaginator
+from .notifications import mark_read, notify, notify_many, recount_unread
+from .reminders import send_booking_reminders
+from .retention import apply_policy
+from .pubsub import LocalBroker, publish, set_broker, user_channel
+from .summaries import rebuild
+from .tasks import send_notification
+from .user_cache import check_shared_cache
+from .search import rebuild_index, search
+from . import dispatch, routers
+from .routers import PIN_COOKIE, PrimaryReplicaRouter, replica_reads
+from .seeding import seed_bookings, seed_staff, seed_users
+from .stripe_client import set_stripe_client
+from .webhooks import process_pending_events, sign_payload
+from PIL import Image
+
+
+def payment_succeeded_payload(booking, event_id=None, intent_id='pi_123'):
+    return json.dumps({
+        'id': event_id or f'evt_{booking.pk.hex[:12]}',
+        'object': 'event',
+        'type': 'payment_intent.succeeded',
+        'data': {'object': {'id': intent_id, 'object': 'payment_intent', 'metadata': {'booking_id': str(booking.pk)}}},
+    })
+
+
+def fake_intent(intent_id, amount=7500, status='requires_payment_method'):
+    return mock.Mock(id=intent_id, client_secret=f'{intent_id}_secret', amount=amount, status=status)
+
+
+def use_fake_stripe(test_case):
+    """Route Stripe calls to a mock client that hands out pi_1, pi_2, ..."""
+    client = mock.Mock()
+    numbers = itertools.count(1)
+    client.payment_intents.create.side_effect = (
+        lambda params, options: fake_intent(f'pi_{next(numbers)}', amount=params['amount'])
+    )
+    set_stripe_client(client)
+    test_case.addCleanup(set_stripe_client, None)
+    return client
+
+
+def post_webhook(client, payload):
+    return client.post(
+        reverse('stripe_webhook'), data=payload, content_type='application/json',
+        HTTP_STRIPE_SIGNATURE=sign_payload(payload, settings.STRIPE_WEBHOOK_SECRET),
+    )
+
+
+# The suite is one process, so a LocMemCache is as good as a shared one and never
+# touches the cache of a server running from this checkout
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=TEST_CACHES, CACHE_SHARED=True)
+class RoadsideTestCase(TestCase):
+    """Shared fixtures: one customer, one service, helpers to create rows."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='driver', password='pass12345')
+        self.service = Service.objects.create(
+            name='Flat Tire Repair', description='Tyre swap', price=Decimal('75.00'), duration=30
+        )
+
+    def make_bookings(self, count, user=None, **extra):
+        user = user or self.user
+        bookings = []
+        for i in range(count):
+            bookings.append(Booking.objects.create(**{
+                'user': user,
+                'service': self.service,
+                'booking_date': timezone.now() + timedelta(hours=i + 1),
+                'location': f'{i} Main Street',
+                **extra,
+            }))
+        return bookings
+
+    def make_mechanic(self, username, latitude=None, longitude=None, specializations='', status='on_call'):
+        user = User.objects.create_user(username=username, password='pass12345', is_technician=True)
+        return Staff.objects.create(
+            user=user, role='mechanic', phone_number='555-0100', hire_date=date(2024, 1, 1),
+            status=status, specializations=specializations, latitude=latitude, longitude=longitude,
+        )
+
+    def make_notifications(self, count, user=None, booking=None, **extra):
+        user = user or self.user
+        return [
+            Notification.objects.create(
+                user=user,
+                notification_type='booking_confirmed',
+                title=f'Notification {i}',
+                message='Your booking has been confirmed.',
+                related_booking=booking,
+                **extra
+            )
+            for i in range(count)
+        ]
+
+
+class QueryCountTestCase(RoadsideTestCase):
+    """
+    Regression harness for N+1 queries: a view must run the same number of
+    queries whether the user has one row or many.
+    """
+
+    row_counts = (1, 25)
+
+    def assertConstantQueries(self, expected, url, populate, method='get', **kwargs):
+        self.client.force_login(self.user)
+        created = 0
+        for target in self.row_counts:
+            # Run the cache invalidations the new rows schedule, as a real commit would
+            with self.captureOnCommitCallbacks(execute=True):
+                populate(target - created)
+            created = target
+            with self.assertNumQueries(expected):
+                response = getattr(self.client, method)(url, **kwargs)
+            self.assertLess(response.status_code, 400)
+        return response
+
+
+class ViewQueryCountTests(QueryCountTestCase):
+    def test_dashboard(self):
+        def populate(n):
+            for booking in self.make_bookings(n):
+                self.make_notifications(1, booking=booking)
+        # user (the new rows invalidate its cached copy), bookings, notifications;
+        # the session comes from the cache
+        self.assertConstantQueries(3, reverse('dashboard'), populate)
+
+    def test_booking_history(self):
+        # user, bookings
+        self.assertConstantQueries(2, reverse('booking_history'), self.make_bookings)
+
+    def test_notifications(self):
+        def populate(n):
+            for booking in self.make_bookings(n):
+                self.make_notifications(1, booking=booking)
+        # user, notifications
+        self.assertConstantQueries(2, reverse('notifications'), populate)
+
+    def test_booking_detail(self):
+        booking = self.make_bookings(1)[0]
+        Payment.objects.create(
+            booking=booking, amount=self.service.price,
+            stripe_payment_intent_id='pi_test', payment_status='completed'
+        )
+        self.client.force_login(self.user)
+        # user, updated_at for the ETag, booking joined with service, user and payment
+        with self.assertNumQueries(3):
+            self.client.get(reverse('booking_detail', args=[booking.id]))
+
+    def test_payment(self):
+        use_fake_stripe(self)
+        booking = self.make_bookings(1)[0]
+        self.client.force_login(self.user)
+        # user, booking joined with service, update booking
+        with self.assertNumQueries(3):
+            response = self.client.post(reverse('payment', args=[booking.id]))
+        self.assertEqual(response.json()['client_secret'], 'pi_1_secret')
+
+    def test_stripe_webhook(self):
+        booking = self.make_bookings(1)[0]
+        payload = payment_succeeded_payload(booking)
+        # a single INSERT into the inbox inside the retried write transaction (a savepoint
+        # pair here); the booking is not touched in the request
+        with self.assertNumQueries(3):
+            response = post_webhook(self.client, payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Payment.objects.filter(booking=booking).exists())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Reads SQLite EXPLAIN QUERY PLAN output')
+class HotQueryIndexTests(RoadsideTestCase):
+    def setUp(self):
+        super().setUp()
+        self.make_bookings(5)
+        self.make_notifications(5)
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index}', plan)
+        # Rows come out of the index in order: no sort step
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_per_user_lists_read_their_indexes_in_order(self):
+        self.assertUsesIndex(
+            Booking.objects.filter(user=self.user).order_by('-created_at', '-id')[:20], 'booking_user_created_idx'
+        )
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.user).order_by('-created_at', '-id')[:20], 'notif_user_created_idx'
+        )
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.user, is_read=False).order_by('-created_at')[:5], 'notif_user_unread_idx'
+        )
+
+    def test_pending_queue_is_an_index_range_not_a_scan(self):
+        self.assertUsesIndex(
+            Booking.objects.filter(status='pending').order_by('booking_date')[:20], 'booking_status_date_idx'
+        )
+
+
+class KeysetPaginationTests(RoadsideTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bookings = self.make_bookings(45)
+        # Force timestamp ties so the id tiebreaker is exercised
+        Booking.objects.filter(pk__in=[b.pk for b in self.bookings[10:30]]).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+        self.client.force_login(self.user)
+
+    def fetch(self, cursor=None):
+        params = {'limit': 20}
+        if cursor:
+            params['cursor'] = cursor
+        return self.client.get(reverse('booking_history_api'), params).json()
+
+    def test_walks_every_row_once_in_order(self):
+        seen = []
+        data = self.fetch()
+        self.assertIsNone(data['previous'])
+        while True:
+            seen.extend(row['id'] for row in data['results'])
+            if not data['next']:
+                break
+            data = self.fetch(data['next'])
+        expected = [
+            str(pk) for pk in Booking.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)
+        ]
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_the_page_before(self):
+        first = self.fetch()
+        second = self.fetch(first['next'])
+        back = self.fetch(second['previous'])
+        self.assertEqual([r['id'] for r in back['results']], [r['id'] for r in first['results']])
+
+    def test_deep_page_costs_the_same_as_first_page(self):
+        first = self.fetch()
+        # bookings only: the first page left the session and user in the cache
+        with self.assertNumQueries(1):
+            self.client.get(reverse('booking_history'), {'cursor': first['next']})
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        data = self.fetch('not-a-cursor')
+        self.assertEqual(len(data['results']), 20)
+
+    def test_cursor_with_a_bad_id_falls_back_to_first_page(self):
+        raw = json.dumps(['next', '2024-01-01T00:00:00+00:00', 'abc']).encode()
+        cursor = base64.urlsafe_b64encode(raw).decode().rstrip('=')
+        for name in ('booking_history_api', 'booking_history', 'notifications', 'notifications_api'):
+            self.assertEqual(self.client.get(reverse(name), {'cursor': cursor}).status_code, 200, name)
+        self.assertEqual(len(self.fetch(cursor)['results']), 20)
+
+
+class CatalogCacheTests(RoadsideTestCase):
+    def test_home_page_needs_no_catalog_queries_once_warm(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Flat Tire Repair')
+
+    def test_service_edits_invalidate_the_catalog(self):
+        self.assertEqual(len(active_services()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.create(name='Fuel Delivery', description='Fuel', price=Decimal('35.00'))
+        self.assertEqual(len(active_services()), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.is_active = False
+            self.service.save()
+        self.assertEqual([s.name for s in active_services()], ['Fuel Delivery'])
+
+    def test_booking_form_renders_and_validates_from_the_catalog(self):
+        active_services()
+        with self.assertNumQueries(0):
+            html = str(BookingForm()['service'])
+        self.assertIn('Flat Tire Repair', html)
+        form = BookingForm(data={
+            'service': self.service.pk,
+            'booking_date': '2030-01-01T10:00',
+            'location': '1 Main Street',
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['service'], self.service)
+        self.assertFalse(BookingForm(data={'service': 999, 'booking_date': '2030-01-01T10:00', 'location': 'x'}).is_valid())
+
+
+class UnreadCounterTests(RoadsideTestCase):
+    def unread(self):
+        self.user.refresh_from_db()
+        return self.user.unread_notification_count
+
+    def test_counter_follows_creates_reads_and_deletes(self):
+        notifications = self.make_notifications(3)
+        self.make_notifications(1, is_read=True)
+        self.assertEqual(self.unread(), 3)
+        notifications[0].delete()
+        self.assertEqual(self.unread(), 2)
+        self.assertEqual(mark_read(self.user), 2)
+        self.assertEqual(self.unread(), 0)
+
+    def test_admin_change_form_keeps_the_counter(self):
+        notification = self.make_notifications(2)[0]
+        self.client.force_login(User.objects.create_superuser('ops', 'ops@example.com', 'pass12345'))
+        url = reverse('admin:roadside_service_app_notification_change', args=[notification.pk])
+        data = {
+            'user': self.user.pk, 'notification_type': notification.notification_type,
+            'title': notification.title, 'message': notification.message, 'is_read': 'on',
+        }
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        self.assertEqual(self.unread(), 1)
+        del data['is_read']
+        self.client.post(url, data)
+        self.assertEqual(self.unread(), 2)
+        # Saving without touching the flag changes nothing
+        data['title'] = 'Edited'
+        self.client.post(url, data)
+        self.assertEqual(self.unread(), 2)
+
+    def test_notify_many_updates_counters_in_bulk(self):
+        other = User.objects.create_user(username='fleet', password='pass12345')
+        notify_many([
+            Notification(user=user, notification_type='booking_reminder', title='Reminder', message='Soon')
+            for user in (self.user, self.user, other)
+        ])
+        self.assertEqual(self.unread(), 2)
+        other.refresh_from_db()
+        self.assertEqual(other.unread_notification_count, 1)
+        recount_unread()
+        self.assertEqual(self.unread(), 2)
+
+    def test_bulk_endpoint_marks_selected_ids_in_one_update(self):
+        notifications = self.make_notifications(5)
+        self.client.force_login(self.user)
+        ids = [n.id for n in notifications[:3]]
+        # user, UPDATE notifications, UPDATE counter
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                reverse('mark_notifications_read'), data={'ids': ids}, content_type='application/json'
+            )
+        self.assertEqual(response.json(), {'status': 'success', 'marked': 3, 'unread': 2})
+        response = self.client.post(reverse('mark_notifications_read'))
+        self.assertEqual(response.json()['marked'], 2)
+        self.assertEqual(self.unread(), 0)
+
+    def test_cannot_mark_another_users_notification(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        notification = self.make_notifications(1, user=other)[0]
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('mark_notification_read', args=[notification.id]))
+        self.assertEqual(response.status_code, 404)
+        notification.refresh_from_db()
+        self.assertFalse(notification.is_read)
+
+
+class StripeInboxTests(RoadsideTestCase):
+    def test_rejects_bad_signature(self):
+        booking = self.make_bookings(1)[0]
+        response = self.client.post(
+            reverse('stripe_webhook'), data=payment_succeeded_payload(booking),
+            content_type='application/json', HTTP_STRIPE_SIGNATURE='t=1,v1=bad',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_retries_and_duplicate_events_create_one_payment(self):
+        booking = self.make_bookings(1)[0]
+        payload = payment_succeeded_payload(booking)
+        post_webhook(self.client, payload)
+        post_webhook(self.client, payload)  # Stripe retry with the same event id
+        post_webhook(self.client, payment_succeeded_payload(booking, event_id='evt_other'))
+        self.assertEqual(StripeEvent.objects.count(), 2)
+
+        self.assertEqual(process_pending_events(), 2)
+        self.assertEqual(process_pending_events(), 0)
+        booking.refresh_from_db()
+        self.assertEqual((booking.status, booking.payment_status), ('confirmed', 'completed'))
+        self.assertEqual(Payment.objects.filter(booking=booking).count(), 1)
+        self.assertEqual(Notification.objects.filter(notification_type='payment_received').count(), 1)
+
+        # A later redelivery of an already-applied payment is skipped, not an error
+        post_webhook(self.client, payment_succeeded_payload(booking, event_id='evt_late'))
+        process_pending_events()
+        late = StripeEvent.objects.get(event_id='evt_late')
+        self.assertIsNotNone(late.processed_at)
+        self.assertEqual(late.last_error, 'skipped: booking already paid')
+
+    def test_batch_cost_does_not_grow_with_batch_size(self):
+        for booking in self.make_bookings(30, booking_date=timezone.now() + timedelta(days=1)):
+            post_webhook(self.client, payment_succeeded_payload(booking))
+        # select events, bookings, existing payments, update bookings, insert payments,
+        # insert notifications and their search rows, bump counters, mark events processed, plus the two
+        # savepoint pairs (inbox transaction and batch transaction); then the summary
+        # tables: pending -30 for the day, confirmed +30 (a new row: update, savepoint
+        # pair, insert), the payments' services, and revenue for the day (a new row)
+        with self.assertNumQueries(23):
+            self.assertEqual(process_pending_events(batch_size=100), 30)
+        self.assertEqual(Payment.objects.count(), 30)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notification_count, 30)
+
+
+class PaymentIntentReuseTests(RoadsideTestCase):
+    def setUp(self):
+        super().setUp()
+        self.stripe = use_fake_stripe(self)
+        self.booking = self.make_bookings(1)[0]
+        self.client.force_login(self.user)
+
+    def pay(self, name='payment'):
+        return self.client.post(reverse(name, args=[self.booking.id])).json()
+
+    def test_second_post_retrieves_instead_of_creating(self):
+        first = self.pay()
+        self.stripe.payment_intents.retrieve.return_value = fake_intent('pi_1')
+        second = self.pay()
+        self.assertEqual(first['client_secret'], second['client_secret'])
+        self.assertEqual(self.stripe.payment_intents.create.call_count, 1)
+        self.stripe.payment_intents.retrieve.assert_called_once_with('pi_1')
+
+    def test_new_intent_when_amount_changed_or_intent_finished(self):
+        self.pay()
+        self.stripe.payment_intents.retrieve.return_value = fake_intent('pi_1', amount=4500)
+        self.assertEqual(self.pay()['client_secret'], 'pi_2_secret')
+        self.stripe.payment_intents.retrieve.return_value = fake_intent('pi_2', status='canceled')
+        self.assertEqual(self.pay()['client_secret'], 'pi_3_secret')
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.stripe_payment_intent_id, 'pi_3')
+
+    def test_async_view_shares_the_reuse_logic(self):
+        page = self.client.get(reverse('payment', args=[self.booking.id]))
+        self.assertContains(page, reverse('payment_intent_async', args=[self.booking.id]))
+        self.pay('payment_intent_async')
+        self.stripe.payment_intents.retrieve.return_value = fake_intent('pi_1')
+        self.assertEqual(self.pay('payment_intent_async')['client_secret'], 'pi_1_secret')
+        self.assertEqual(self.stripe.payment_intents.create.call_count, 1)
+
+    def test_page_carries_the_csrf_token_the_async_request_sends(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        page = client.get(reverse('payment', args=[self.booking.id]))
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page.content.decode())
+        self.assertIsNotNone(token)
+        response = client.post(reverse('payment_intent_async', args=[self.booking.id]), HTTP_X_CSRFTOKEN=token[1])
+        self.assertEqual(response.json()['client_secret'], 'pi_1_secret')
+
+
+class DispatchTests(RoadsideTestCase):
+    def test_grid_index_agrees_with_brute_force(self):
+        rng = random.Random(7)
+        technicians = [
+            Technician(pk, 40 + rng.uniform(-1, 1), -111 + rng.uniform(-1, 1), frozenset()) for pk in range(300)
+        ]
+        index = GridIndex(cell_degrees=0.1)
+        for technician in technicians:
+            index.insert(technician)
+        for _ in range(50):
+            lat, lon = 40 + rng.uniform(-1.2, 1.2), -111 + rng.uniform(-1.2, 1.2)
+            expected = min(technicians, key=lambda t: distance_km(lat, lon, t.latitude, t.longitude))
+            self.assertEqual(index.nearest(lat, lon)[0].pk, expected.pk)
+
+    def test_assigns_nearest_qualified_mechanic_and_notifies(self):
+        near_towing_only = self.make_mechanic('tow', 40.2340, -111.6580, specializations='towing')
+        further_tire = self.make_mechanic('tire', 40.2500, -111.6500, specializations='tire, battery')
+        self.make_mechanic('offduty', 40.2338, -111.6585, status='inactive')
+        booking = self.make_bookings(1, latitude=40.2338, longitude=-111.6585)[0]
+
+        results = assign_pending_bookings()
+
+        self.assertEqual([(b.pk, t) for b, t, _ in results], [(booking.pk, further_tire.pk)])
+        booking.refresh_from_db()
+        self.assertEqual(booking.assigned_technician, further_tire)
+        self.assertTrue(Notification.objects.filter(
+            related_booking=booking, notification_type='technician_assigned'
+        ).exists())
+        self.assertNotEqual(near_towing_only.pk, further_tire.pk)
+
+    def test_busy_mechanic_is_not_assigned_twice(self):
+        self.make_mechanic('solo', 40.2340, -111.6580)
+        start = timezone.now() + timedelta(hours=1)
+        first = self.make_bookings(1, latitude=40.2338, longitude=-111.6585, booking_date=start)[0]
+        second = self.make_bookings(1, latitude=40.2338, longitude=-111.6585, booking_date=start + timedelta(minutes=15))[0]
+        self.assertEqual(len(assign_pending_bookings()), 1)
+        self.assertEqual(assign_pending_bookings(), [])
+        Booking.objects.filter(pk=first.pk).update(status='completed')
+        self.assertEqual([b.pk for b, _, _ in assign_pending_bookings()], [second.pk])
+
+    def test_only_overlapping_bookings_make_a_mechanic_busy(self):
+        mechanic = self.make_mechanic('solo', 40.2340, -111.6580)
+        self.make_bookings(1, latitude=40.2338, longitude=-111.6585, booking_date=timezone.now() + timedelta(days=2),
+                           assigned_technician=mechanic)
+        soon = self.make_bookings(1, latitude=40.2338, longitude=-111.6585)[0]
+        self.assertEqual([(b.pk, t) for b, t, _ in assign_pending_bookings()], [(soon.pk, mechanic.pk)])
+
+    def test_technician_taken_by_a_concurrent_dispatcher_is_not_assigned(self):
+        mechanic = self.make_mechanic('solo', 40.2340, -111.6580)
+        booking, elsewhere = self.make_bookings(2, latitude=40.2338, longitude=-111.6585, booking_date=timezone.now() + timedelta(hours=1))
+        real_match = dispatch.match
+
+        def match_then_lose_the_race(*args, **kwargs):
+            assignments = real_match(*args, **kwargs)
+            # Another dispatcher commits its assignment after this one read the schedules
+            Booking.objects.filter(pk=elsewhere.pk).update(assigned_technician=mechanic)
+            return assignments
+
+        with mock.patch.object(dispatch, 'match', match_then_lose_the_race):
+            self.assertEqual(assign_pending_bookings(), [])
+        booking.refresh_from_db()
+        self.assertIsNone(booking.assigned_technician_id)
+
+
+class AvailabilityTests(RoadsideTestCase):
+    def setUp(self):
+        super().setUp()
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        self.day = tomorrow.isoformat()
+        self.slot = timezone.make_aware(datetime.combine(tomorrow, datetime.min.time())) + timedelta(hours=10)
+
+    def booking_data(self, when):
+        return {
+            'service': self.service.pk,
+            'booking_date': timezone.localtime(when).strftime('%Y-%m-%dT%H:%M'),
+            'location': '1 Main Street',
+        }
+
+    def test_interval_set_counts_overlaps(self):
+        rng = random.Random(3)
+        intervals = [(start, start + rng.randint(1, 20)) for start in (rng.randint(0, 500) for _ in range(200))]
+        busy = IntervalSet(intervals)
+        for _ in range(200):
+            start = rng.randint(0, 520)
+            end = start + rng.randint(1, 30)
+            expected = sum(1 for s, e in intervals if s < end and e > start)
+            self.assertEqual(busy.overlapping(start, end), expected)
+
+    def test_form_rejects_slot_when_every_mechanic_is_booked(self):
+        self.make_mechanic('solo', 40.2, -111.6)
+        self.make_bookings(1, booking_date=self.slot)
+
+        # Overlaps the 30 minute booking at 10:00; the 10:30 slot is free again
+        self.assertFalse(BookingForm(self.booking_data(self.slot + timedelta(minutes=15))).is_valid())
+        self.assertTrue(BookingForm(self.booking_data(self.slot + timedelta(minutes=30))).is_valid())
+        Booking.objects.update(status='cancelled')
+        self.assertTrue(BookingForm(self.booking_data(self.slot)).is_valid())
+
+    def test_form_is_unconstrained_without_a_roster(self):
+        self.make_bookings(3, booking_date=self.slot)
+        self.assertTrue(BookingForm(self.booking_data(self.slot)).is_valid())
+
+    def test_availability_api_lists_free_slots(self):
+        self.make_mechanic('one', 40.2, -111.6)
+        self.make_mechanic('two', 40.2, -111.6)
+        self.make_bookings(2, booking_date=self.slot)
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('availability_api'), {'service': self.service.pk, 'date': self.day})
+
+        slots = response.json()['slots']
+        self.assertEqual(len(slots), 24 * 4 - 1 - 3)  # last slot would end after midnight, 09:45-10:15 taken
+        self.assertNotIn(f'{self.day}T10:00', slots)
+        self.assertIn(f'{self.day}T10:30', slots)
+        self.assertEqual(self.client.get(reverse('availability_api'), {'service': 0}).status_code, 400)
+
+
+class PerformanceMetricsTests(RoadsideTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_metrics()
+        self.addCleanup(reset_metrics)
+        self.client.force_login(self.user)
+
+    def test_sampled_request_records_latency_queries_and_templates(self):
+        self.client.get(reverse('dashboard'))
+
+        self.assertEqual(REQUEST_LATENCY.count(view='dashboard', method='GET', status=200), 1)
+        self.assertEqual(REQUEST_QUERIES.count(view='dashboard'), 1)
+        self.assertEqual(TEMPLATE_RENDER.count(template='dashboard.html'), 1)
+        with override_settings(METRICS_TOKEN='scrape-secret'):
+            body = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret').content.decode()
+        self.assertIn('roadside_http_request_queries_bucket{view="dashboard",le="5.0"} 1', body)
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        self.client.get(reverse('dashboard'))
+        self.assertEqual(REQUEST_LATENCY.count(view='dashboard', method='GET', status=200), 0)
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0)
+    def test_slow_request_is_logged_with_its_queries(self):
+        with self.assertLogs('roadside_service_app.performance', 'WARNING') as logs:
+            self.client.get(reverse('dashboard'))
+        self.assertIn('roadside_service_app_booking', logs.output[0])
+
+    def test_stripe_calls_are_timed(self):
+        use_fake_stripe(self)
+        booking = self.make_bookings(1)[0]
+        self.client.post(reverse('payment', args=[booking.id]))
+        self.assertEqual(STRIPE_CALLS.count(operation='payment_intents.create', outcome='ok'), 1)
+
+    def test_metrics_endpoint_is_restricted(self):
+        # Behind a local reverse proxy every request comes from 127.0.0.1
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1').status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+        with override_settings(METRICS_TOKEN='scrape-secret'):
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_staff = True
+            self.user.save()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+
+class SeedingTests(RoadsideTestCase):
+    def test_seeded_bookings_get_payments_and_technicians(self):
+        user_ids = seed_users(20)
+        mechanic_ids = seed_staff(30, seed=1)
+        seed_bookings(500, user_ids, batch_size=100, seed=1, technician_ids=mechanic_ids, with_payments=True)
+
+        self.assertTrue(mechanic_ids)
+        self.assertEqual(Staff.objects.filter(pk__in=mechanic_ids, role='mechanic').count(), len(mechanic_ids))
+        paid = Booking.objects.filter(payment_status='completed')
+        self.assertEqual(Payment.objects.count(), paid.count())
+        self.assertFalse(paid.filter(status__in=['completed', 'in_progress'], assigned_technician__isnull=True).exists())
+        self.assertFalse(Booking.objects.filter(status='pending', assigned_technician__isnull=False).exists())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(RoadsideTestCase):
+    def route(self, request, model=Booking, in_atomic_block=False):
+        # TestCase wraps every test in a transaction, which on its own keeps reads on the primary
+        router = PrimaryReplicaRouter()
+        with mock.patch.object(connections['default'], 'in_atomic_block', in_atomic_block):
+            return replica_reads(lambda request: router.db_for_read(model))(request)
+
+    def test_marked_views_read_from_a_replica(self):
+        factory = RequestFactory()
+        self.assertEqual(self.route(factory.get('/bookings/')), 'replica1')
+        self.assertEqual(self.route(factory.get('/bookings/'), model=Session), 'default')
+        self.assertEqual(self.route(factory.post('/bookings/')), 'default')
+        self.assertEqual(self.route(factory.get('/bookings/'), in_atomic_block=True), 'default')
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(Booking), 'default')
+        self.assertEqual(PrimaryReplicaRouter().db_for_write(Booking), 'default')
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('mark_notifications_read'))
+
+        self.assertIn(PIN_COOKIE, response.cookies)
+        request = RequestFactory().get('/bookings/')
+        request.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        self.assertEqual(self.route(request), 'default')
+
+    def replica_reads_of(self, url):
+        """Models the view at `url` reads through a replica (all reads really go to the test database)."""
+        routed = []
+
+        def db_for_read(router, model, **hints):
+            if routers._use_replicas.get():
+                routed.append(model)
+            return 'default'
+
+        with mock.patch.object(PrimaryReplicaRouter, 'db_for_read', db_for_read):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return routed
+
+    def test_cached_dashboard_panels_are_filled_from_the_primary(self):
+        self.make_bookings(1)
+        self.client.force_login(self.user)
+        routed = self.replica_reads_of(reverse('dashboard'))
+        self.assertNotIn(Booking, routed)
+        self.assertNotIn(Notification, routed)
+
+    def test_api_lists_tagged_with_the_user_version_read_the_primary(self):
+        self.make_bookings(1)
+        self.client.force_login(self.user)
+        self.assertNotIn(Booking, self.replica_reads_of(reverse('booking_history_api')))
+        self.assertNotIn(Notification, self.replica_reads_of(reverse('notifications_api')))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_pinning_without_replicas(self):
+        self.client.force_login(self.user)
+        self.assertNotIn(PIN_COOKIE, self.client.post(reverse('mark_notifications_read')).cookies)
+
+
+@override_settings(CACHES=TEST_CACHES, CACHE_SHARED=True)
+@mock.patch('roadside_service_app.db_writes.time.sleep')
+class SerializedWriteTests(TransactionTestCase):
+    def test_lock_errors_are_retried(self, sleep):
+        outcomes = [OperationalError('database is locked'), OperationalError('database is locked'), 'done']
+
+        def flaky():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        self.assertEqual(retry_on_locked(flaky, retries=5), 'done')
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_other_errors_and_exhausted_retries_are_raised(self, sleep):
+        def locked():
+            raise OperationalError('database is locked')
+
+        def broken():
+            raise OperationalError('no such table: nothing')
+
+        with self.assertRaises(OperationalError):
+            retry_on_locked(locked, retries=2)
+        self.assertEqual(sleep.call_count, 2)
+        with self.assertRaises(OperationalError):
+            retry_on_locked(broken, retries=2)
+        self.assertEqual(sleep.call_count, 2)
+
+    @override_settings(SQLITE_WRITE_QUEUE=True)
+    def test_queued_writes_run_on_the_writer_thread(self, sleep):
+        @serialized_write
+        def create_service():
+            Service.objects.create(name='Winch Out', description='Pull-out', price=Decimal('90.00'))
+            return threading.current_thread().name
+
+        self.assertTrue(create_service().startswith('sqlite-writer'))
+        self.assertTrue(Service.objects.filter(name='Winch Out').exists())
+
+
+class DashboardCacheTests(RoadsideTestCase):
+    def setUp(self):
+        super().setUp()
+        self.booking = self.make_bookings(1)[0]
+        self.client.force_login(self.user)
+        self.client.get(reverse('dashboard'))
+
+    def test_steady_state_dashboard_runs_no_queries(self):
+        with self.assertNumQueries(0):
+            self.client.get(reverse('dashboard'))
+
+    def test_new_notification_refreshes_the_panels(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notify(self.user, 'technician_assigned', 'Technician On The Way', 'Sam is 5 minutes away.')
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Technician On The Way')
+        self.assertContains(response, '<span class="tag is-danger is-small">1</span>', html=True)
+
+    def test_webhook_payment_refreshes_the_booking_panel(self):
+        self.assertNotContains(self.client.get(reverse('dashboard')), 'Confirmed')
+        post_webhook(self.client, payment_succeeded_payload(self.booking))
+        with self.captureOnCommitCallbacks(execute=True):
+            process_pending_events()
+        self.assertContains(self.client.get(reverse('dashboard')), 'Confirmed')
+
+    def test_suite_keeps_off_the_servers_cache(self):
+        from django.core.cache import caches
+        from django.core.cache.backends.locmem import LocMemCache
+        self.assertIsInstance(caches['default'], LocMemCache)
+
+    def test_nothing_per_user_is_cached_in_a_process_local_cache(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'web'}}
+        with override_settings(CACHES=locmem, CACHE_SHARED=None):
+            self.assertEqual([e.id for e in check_shared_cache(None)], ['roadside_service_app.W001'])
+            self.client.get(reverse('dashboard'))
+            # Invalidated by a worker process this one never hears from
+            Notification.objects.bulk_create([Notification(
+                user=self.user, notification_type='technician_assigned', title='Sam is on the way', message='Soon.',
+            )])
+            self.assertContains(self.client.get(reverse('dashboard')), 'Sam is on the way')
+        self.assertEqual(check_shared_cache(None), [])
+
+
+class ConditionalGetTests(RoadsideTestCase):
+    def revalidate(self, url, response, **extra):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], **extra)
+
+    def test_public_pages_revalidate_against_the_catalog_version(self):
+        first = self.client.get(reverse('services'))
+        self.assertIn('public', first['Cache-Control'])
+        self.assertIn('Cookie', first['Vary'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(reverse('services'), first).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.price = Decimal('80.00')
+            self.service.save()
+        self.assertEqual(self.revalidate(reverse('services'), first).status_code, 200)
+
+        # The navbar differs once logged in
+        self.client.force_login(self.user)
+        self.assertEqual(self.revalidate(reverse('services'), first).status_code, 200)
+
+    def test_booking_detail_revalidates_against_updated_at(self):
+        booking = self.make_bookings(1)[0]
+        url = reverse('booking_detail', args=[booking.id])
+        self.client.force_login(self.user)
+        first = self.client.get(url)
+        self.assertIn('private', first['Cache-Control'])
+        self.assertTrue(first.has_header('Last-Modified'))
+        # user from the cache, one indexed lookup of updated_at, no render
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        booking.status = 'in_progress'
+        booking.save()
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+    def test_api_lists_revalidate_against_the_user_version(self):
+        self.make_bookings(3)
+        self.client.force_login(self.user)
+        url = reverse('booking_history_api')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(url, first).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_bookings(1)
+        self.assertEqual(self.revalidate(url, first).status_code, 200)
+
+
+@override_settings(LIVE_EVENTS=True)
+class LiveEventsTests(RoadsideTestCase):
+    def setUp(self):
+        super().setUp()
+        self.broker = LocalBroker(queue_size=10)
+        set_broker(self.broker)
+        self.addCleanup(set_broker, None)
+
+    def published(self, mock_publish):
+        return [(channel, event, data.get('status')) for (channel, event, data), _ in mock_publish.call_args_list]
+
+    @mock.patch('roadside_service_app.pubsub.publish')
+    def test_status_changes_and_new_notifications_are_published_on_commit(self, mock_publish):
+        channel = user_channel(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self.make_bookings(1)[0]
+            mock_publish.assert_not_called()
+        booking = Booking.objects.get(pk=booking.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.notes = 'Blue gate'
+            booking.save()
+            booking.status = 'in_progress'
+            booking.save()
+            notify(self.user, 'technician_assigned', 'Technician Assigned', 'On the way.', related_booking=booking)
+        self.assertEqual(self.published(mock_publish), [
+            (channel, 'booking', 'pending'),
+            (channel, 'booking', 'in_progress'),
+            (channel, 'notification', None),
+        ])
+
+    @mock.patch('roadside_service_app.pubsub.publish')
+    def test_webhook_payment_publishes_the_confirmation(self, mock_publish):
+        booking = self.make_bookings(1)[0]
+        post_webhook(self.client, payment_succeeded_payload(booking))
+        mock_publish.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            process_pending_events()
+        channel = user_channel(self.user.pk)
+        self.assertEqual(self.published(mock_publish), [(channel, 'booking', 'confirmed'), (channel, 'notification', None)])
+
+    def test_stream_requires_login(self):
+        self.assertEqual(self.client.get(reverse('events')).status_code, 302)
+
+    def test_no_stream_under_wsgi(self):
+        booking = self.make_bookings(1)[0]
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('dashboard')), 'EventSource')
+        with override_settings(LIVE_EVENTS=False):
+            self.assertEqual(self.client.get(reverse('events')).status_code, 204)
+            self.assertNotContains(self.client.get(reverse('dashboard')), 'EventSource')
+            self.assertNotContains(self.client.get(reverse('booking_detail', args=[booking.pk])), 'EventSource')
+
+    async def test_stream_delivers_events_published_from_other_threads(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('events'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        # e.g. the Stripe event drainer; only this user's channel reaches the stream
+        for user_id in (self.user.pk + 1, self.user.pk):
+            worker = threading.Thread(target=publish, args=(user_channel(user_id), 'booking', {'id': str(user_id)}))
+            worker.start()
+            worker.join()
+        self.assertEqual(await anext(stream), f'event: booking\ndata: {{"id": "{self.user.pk}"}}\n\n'.encode())
+        await stream.aclose()
+
+    @override_settings(SSE_HEARTBEAT_SECONDS=0.01)
+    async def test_idle_stream_sends_keep_alives(self):
+        await self.async_client.aforce_login(self.user)
+        stream = (await self.async_client.get(reverse('events'))).streaming_content
+        await anext(stream)
+        self.assertEqual(await anext(stream), b': keep-alive\n\n')
+        await stream.aclose()
+
+    async def test_slow_subscriber_is_told_to_resync(self):
+        set_broker(LocalBroker(queue_size=1))
+        await self.async_client.aforce_login(self.user)
+        stream = (await self.async_client.get(reverse('events'))).streaming_content
+        await anext(stream)
+        for i in range(3):
+            publish(user_channel(self.user.pk), 'notification', {'id': i})
+        self.assertEqual(await anext(stream), b'event: resync\ndata: {}\n\n')
+        await stream.aclose()
+
+    async def test_subscriptions_are_released(self):
+        subscriptions = [self.broker.subscribe('user:1') for _ in range(2)]
+        self.assertEqual(self.broker.subscriber_count(), 2)
+        for subscription in subscriptions:
+            self.broker.unsubscribe('user:1', subscription)
+        self.assertEqual(self.broker.subscriptions, {})
+
+
+class JobQueueTests(RoadsideTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+        self.registry = mock.patch.dict(TASKS)
+        self.registry.start()
+        self.addCleanup(self.registry.stop)
+
+        @task(name='record')
+        def record(value):
+            self.calls.append(value)
+
+        @task(name='explode', max_attempts=2)
+        def explode():
+            raise RuntimeError('Stripe is down')
+
+    def test_booking_is_saved_and_follow_up_work_queued(self):
+        stripe = use_fake_stripe(self)
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('book_service'), {
+            'service': self.service.pk,
+            'booking_date': (timezone.now() + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M'),
+            'location': '1 Main Street',
+        })
+        booking = Booking.objects.get()
+        self.assertRedirects(response, reverse('payment', args=[booking.id]), fetch_redirect_response=False)
+        self.assertFalse(Notification.objects.exists())
+        stripe.payment_intents.create.assert_not_called()
+        # The notification outranks the payment intent
+        self.assertEqual([job.task for job in Job.objects.order_by('-priority')], ['send_notification', 'prepare_payment_intent'])
+
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(Notification.objects.get().related_booking, booking)
+        booking.refresh_from_db()
+        self.assertEqual(booking.stripe_payment_intent_id, 'pi_1')
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {'done'})
+
+    def test_claims_by_priority_and_skips_future_jobs(self):
+        enqueue('record', {'value': 'later'}, run_at=timezone.now() + timedelta(hours=1))
+        enqueue('record', {'value': 'low'})
+        enqueue('record', {'value': 'high'}, priority=10)
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(self.calls, ['high', 'low'])
+
+    def test_a_claimed_job_is_not_handed_out_twice(self):
+        enqueue('record', {'value': 1})
+        job = claim_job('worker-a')
+        self.assertEqual((job.status, job.locked_by, job.attempts), ('running', 'worker-a', 1))
+        self.assertIsNone(claim_job('worker-b'))
+
+    def test_failures_back_off_then_give_up(self):
+        job = enqueue('explode', max_attempts=2)
+        with self.assertLogs('roadside_service_app.jobs', 'ERROR'):
+            self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('Stripe is down', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('roadside_service_app.jobs', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertEqual(run_pending(), 0)
+
+    def test_jobs_of_a_lost_worker_are_requeued(self):
+        enqueue('record', {'value': 1})
+        claim_job('worker-a')
+        self.assertEqual(requeue_stale(), 0)
+        Job.objects.update(locked_at=timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT + 1))
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(self.calls, [1])
+
+    def test_profile_picture_is_resized_in_the_background(self):
+        upload = BytesIO()
+        Image.new('RGB', (1024, 600), 'red').save(upload, format='PNG')
+        admin_user = User.objects.create_superuser('ops', 'ops@example.com', 'pass12345')
+        self.client.force_login(admin_user)
+        url = reverse('admin:roadside_service_app_user_change', args=[self.user.pk])
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            response = self.client.post(url, {
+                'username': self.user.username, 'date_joined_0': '2024-01-01', 'date_joined_1': '00:00:00',
+                'is_active': 'on',
+                'profile_picture': SimpleUploadedFile('me.png', upload.getvalue(), content_type='image/png'),
+            })
+            self.assertEqual(response.status_code, 302)
+            self.user.refresh_from_db()
+            self.assertEqual(Image.open(self.user.profile_picture.path).size, (1024, 600))
+            run_pending()
+            self.user.refresh_from_db()
+            self.assertEqual(Image.open(self.user.profile_picture.path).size, (512, 300))
+
+    def test_a_redelivered_notification_job_sends_once(self):
+        send_notification.delay(user_id=self.user.pk, notification_type='booking_confirmed', title='Booking Confirmed',
+                                message='Confirmed.', dedupe_key='booking_confirmed:1')
+        run_pending()
+        Job.objects.update(status='queued', run_at=timezone.now())  # Its worker died before recording success
+        run_pending()
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_worker_survives_database_errors(self):
+        enqueue('record', {'value': 1})
+        stop = threading.Event()
+        real_claim = claim_job
+        attempts = []
+
+        def flaky_claim(worker_name):
+            attempts.append(worker_name)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+            job = real_claim(worker_name)
+            if job is None:
+                stop.set()
+            return job
+
+        with mock.patch('roadside_service_app.jobs.claim_job', flaky_claim), \
+                mock.patch('roadside_service_app.jobs.connection.close'), \
+                self.assertLogs('roadside_service_app.jobs', 'ERROR'):
+            work('test-worker', stop, poll_seconds=0.01)
+        self.assertEqual(self.calls, [1])
+
+
+class BookingReminderTests(RoadsideTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.lead = timedelta(hours=1)
+
+    def book_at(self, minutes, count=1, **extra):
+        return self.make_bookings(count, booking_date=self.now + timedelta(minutes=minutes), **extra)
+
+    def remind(self, **kwargs):
+        return send_booking_reminders(now=self.now, lead=self.lead, **kwargs)
+
+    def reminded(self):
+        return sorted(Notification.objects.filter(notification_type='booking_reminder').values_list('related_booking', flat=True))
+
+    def test_reminds_open_bookings_in_the_window_once(self):
+        due = self.book_at(30) + self.book_at(45, status='confirmed')
+        self.book_at(30, status='cancelled')
+        self.book_at(-30)
+        later = self.book_at(90)
+        self.assertEqual(self.remind()['reminders'], 2)
+        self.assertEqual(self.reminded(), sorted(b.pk for b in due))
+        self.assertEqual(self.remind()['reminders'], 0)
+
+        # The next pass picks up where the watermark stopped
+        self.now += timedelta(hours=1)
+        self.assertEqual(self.remind()['reminders'], 1)
+        self.assertIn(later[0].pk, self.reminded())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notification_count, 3)
+
+    def test_chunks_split_bookings_that_start_together(self):
+        bookings = self.book_at(30, count=5)
+        stats = self.remind(chunk_size=2)
+        self.assertEqual((stats['reminders'], stats['chunks'], stats['complete']), (5, 3, True))
+        self.assertEqual(self.reminded(), sorted(b.pk for b in bookings))
+
+    def test_time_budget_stops_early_and_the_next_run_resumes(self):
+        self.book_at(30, count=4)
+        stats = self.remind(chunk_size=2, time_budget=0)
+        self.assertEqual((stats['reminders'], stats['complete']), (2, False))
+        self.assertEqual(self.remind(chunk_size=2)['reminders'], 2)
+        self.assertEqual(len(set(self.reminded())), 4)
+
+    def test_queries_per_chunk_do_not_grow_with_bookings(self):
+        self.remind()  # Creates the watermark
+        counts = []
+        for count in (2, 20):
+            self.book_at(30 + len(counts), count=count)
+            with CaptureQueriesContext(connections['default']) as queries:
+                self.remind()
+            counts.append(len(queries))
+            self.now += timedelta(minutes=1)
+        self.assertEqual(counts[0], counts[1])
+
+
+class ExportTests(RoadsideTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bookings = self.make_bookings(3)
+        Payment.objects.create(booking=self.bookings[0], amount=Decimal('75.00'), payment_status='completed')
+
+    def test_admin_action_streams_the_selected_bookings_as_csv(self):
+        admin_user = User.objects.create_superuser('finance', 'finance@example.com', 'pass12345')
+        self.client.force_login(admin_user)
+        response = self.client.post(reverse('admin:roadside_service_app_booking_changelist'), {
+            'action': 'export_csv',
+            '_selected_action': [str(b.pk) for b in self.bookings[:2]],
+        })
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="bookings-', response['Content-Disposition'])
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(sorted(row['id'] for row in rows), sorted(str(b.pk) for b in self.bookings[:2]))
+        self.assertEqual((rows[0]['username'], rows[0]['service'], rows[0]['price']), ('driver', 'Flat Tire Repair', '75.00'))
+
+    def test_payments_export_as_json_lines_in_one_query(self):
+        with self.assertNumQueries(1):
+            lines = ''.join(export_lines('payments', fmt='jsonl')).splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual((row['booking_id'], row['username'], row['amount']), (str(self.bookings[0].pk), 'driver', '75.00'))
+
+    def test_rows_are_written_a_chunk_at_a_time(self):
+        chunks = list(export_lines('bookings', chunk_size=2))
+        # header, then rows in chunks of two
+        self.assertEqual([chunk.count('\n') for chunk in chunks], [1, 2, 1])
+
+    def test_command_writes_a_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/bookings.jsonl'
+            call_command('export_data', 'bookings', format='jsonl', output=path, stderr=StringIO())
+            with open(path) as export:
+                self.assertEqual(len(export.readlines()), 3)
+
+    def test_command_rejects_bad_dates_and_reads_naive_ones_as_local(self):
+        with self.assertRaisesMessage(CommandError, "'2024-13-45' is not an ISO date or datetime"):
+            call_command('export_data', 'bookings', '--since', '2024-13-45', stdout=StringIO(), stderr=StringIO())
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        with tempfile.TemporaryDirectory() as directory, warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)  # Naive datetime under USE_TZ
+            path = f'{directory}/bookings.jsonl'
+            for option, value, rows in (('--until', tomorrow.isoformat(), 3), ('--since', f'{tomorrow}T00:00', 0)):
+                call_command('export_data', 'bookings', '--format', 'jsonl', option, value, '--output', path, stderr=StringIO())
+                with open(path) as export:
+                    self.assertEqual(len(export.readlines()), rows)
+
+
+class SummaryTableTests(RoadsideTestCase):
+    def snapshot(self):
+        return (
+            sorted(DailyBookingStatus.objects.filter(bookings__gt=0).values_list('day', 'status', 'bookings')),
+            sorted(DailyRevenue.objects.filter(payments__gt=0).values_list('day', 'service', 'payments', 'revenue')),
+            sorted(TechnicianUtilization.objects.filter(jobs__gt=0).values_list('day', 'technician', 'jobs', 'booked_minutes')),
+        )
+
+    def test_incremental_updates_match_a_rebuild(self):
+        mechanic = self.make_mechanic('mech', latitude=40.23, longitude=-111.66)
+        bookings = self.make_bookings(4, latitude=40.24, longitude=-111.65)
+        assign_pending_bookings()
+        for booking in bookings[:2]:
+            post_webhook(self.client, payment_succeeded_payload(booking))
+        process_pending_events()
+
+        booking = Booking.objects.get(pk=bookings[2].pk)
+        booking.status = 'cancelled'
+        booking.save()
+        booking = Booking.objects.only('id', 'user').get(pk=bookings[1].pk)
+        booking.booking_date += timedelta(days=2)
+        booking.save()
+        Booking.objects.get(pk=bookings[3].pk).delete()
+        Payment.objects.create(booking=bookings[2], amount=Decimal('10.00'), payment_status='refunded')
+
+        incremental = self.snapshot()
+        self.assertIn((mechanic.pk,), [(row[1],) for row in incremental[2]])
+        self.assertEqual(sum(row[2] for row in incremental[1]), 2)
+        rebuild()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_admin_report_reads_only_the_summary_rows(self):
+        bookings = self.make_bookings(3)
+        for booking in bookings:
+            post_webhook(self.client, payment_succeeded_payload(booking))
+        process_pending_events()
+        admin_user = User.objects.create_superuser('finance', 'finance@example.com', 'pass12345')
+        self.client.force_login(admin_user)
+        response = self.client.get(reverse('admin:roadside_service_app_dailyrevenue_changelist'))
+        self.assertEqual(response.context['summary_totals'], {'payments': 3, 'revenue': Decimal('225.00')})
+        self.assertContains(response, 'Totals for the filtered rows')
+
+
+class SearchIndexTests(RoadsideTestCase):
+    def matches(self, model, query):
+        return set(model.objects.filter(pk__in=search(model, query)).values_list('pk', flat=True))
+
+    def test_saves_and_deletes_keep_the_index_in_step(self):
+        first, second = self.make_bookings(2)
+        self.assertEqual(self.matches(Booking, 'main str'), {first.pk, second.pk})
+        first.location = '12 Harbour Road'
+        first.save()
+        self.assertEqual(self.matches(Booking, 'harbour'), {first.pk})
+        self.assertEqual(self.matches(Booking, 'main'), {second.pk})
+        second.delete()
+        self.assertEqual(self.matches(Booking, 'main'), set())
+        self.assertEqual(SearchEntry.objects.filter(kind='booking').count(), 1)
+
+    def test_bulk_notifications_are_indexed(self):
+        notify_many([
+            Notification(user=self.user, notification_type='booking_reminder', title='Reminder', message=f'Tow truck {i}')
+            for i in range(3)
+        ])
+        self.make_notifications(1)
+        self.assertEqual(len(self.matches(Notification, 'tow truck')), 3)
+        self.assertEqual(len(self.matches(Notification, 'confirmed')), 1)
+
+    def test_operators_in_the_query_are_plain_words(self):
+        contact = Contact.objects.create(name='Ann', email='ann@example.com', subject='Help', message='Battery died AND wont start')
+        self.assertEqual(self.matches(Contact, 'battery AND "start'), {contact.pk})
+        self.assertEqual(self.matches(Contact, 'NOT'), set())
+        self.assertEqual(self.matches(Contact, '*'), set())
+
+    def test_admin_search_uses_the_index(self):
+        Contact.objects.create(name='Ann', email='ann@example.com', subject='Help', message='Stuck on the motorway')
+        Contact.objects.create(name='Bob', email='bob@example.com', subject='Thanks', message='Quick service')
+        admin_user = User.objects.create_superuser('support', 'support@example.com', 'pass12345')
+        self.client.force_login(admin_user)
+        url = reverse('admin:roadside_service_app_contact_changelist')
+        response = self.client.get(url, {'q': 'motorway'})
+        self.assertEqual([c.name for c in response.context['cl'].result_list], ['Ann'])
+        # search_fields prefix lookups still apply
+        response = self.client.get(url, {'q': 'bob@'})
+        self.assertEqual([c.name for c in response.context['cl'].result_list], ['Bob'])
+
+    def test_rebuild_restores_missing_rows(self):
+        booking = self.make_bookings(1)[0]
+        SearchEntry.objects.all().delete()
+        self.assertEqual(rebuild_index()['booking'], 1)
+        self.assertEqual(self.matches(Booking, 'main'), {booking.pk})
+
+
+@mock.patch.object(BookingAdmin, 'list_per_page', 4)
+class LargeTableAdminTests(RoadsideTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bookings = self.make_bookings(10)
+        # Ties on booking_date exercise the id tiebreaker
+        Booking.objects.filter(pk__in=[b.pk for b in self.bookings[3:7]]).update(booking_date=self.bookings[3].booking_date)
+        admin_user = User.objects.create_superuser('ops', 'ops@example.com', 'pass12345')
+        self.client.force_login(admin_user)
+        self.url = reverse('admin:roadside_service_app_booking_changelist')
+
+    def walk(self, params=None):
+        seen, pages = [], []
+        response = self.client.get(self.url, params)
+        while True:
+            changelist = response.context['cl']
+            self.assertTrue(changelist.keyset)
+            pages.append(response)
+            seen.extend(b.pk for b in changelist.result_list)
+            if not changelist.next_url:
+                return seen, pages
+            response = self.client.get(self.url + changelist.next_url)
+
+    def test_cursor_pages_walk_every_row_once_in_order(self):
+        seen, pages = self.walk()
+        self.assertEqual(seen, list(Booking.objects.order_by('-booking_date', '-id').values_list('pk', flat=True)))
+        self.assertEqual(len(pages), 3)
+        # ...in both sort directions, and back again
+        seen, pages = self.walk({'o': '4'})
+        self.assertEqual(seen, list(Booking.objects.order_by('booking_date', 'id').values_list('pk', flat=True)))
+        back = self.client.get(self.url + pages[1].context['cl'].prev_url)
+        self.assertEqual(list(back.context['cl'].result_list), list(pages[0].context['cl'].result_list))
+
+    def test_filters_keep_cursor_paging(self):
+        Booking.objects.filter(pk__in=[b.pk for b in self.bookings[:6]]).update(status='completed')
+        seen, _ = self.walk({'status__exact': 'completed'})
+        self.assertEqual(sorted(seen), sorted(b.pk for b in self.bookings[:6]))
+
+    def test_deep_pages_cost_the_same_as_the_first(self):
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connections['default']) as first_queries:
+            self.client.get(self.url)
+        with CaptureQueriesContext(connections['default']) as deep_queries:
+            self.client.get(self.url + first.context['cl'].next_url)
+        self.assertEqual(len(deep_queries), len(first_queries))
+        self.assertFalse(any('OFFSET' in q['sql'] or 'COUNT(*) AS' in q['sql'] for q in deep_queries))
+
+    def test_counts_stop_at_the_limit(self):
+        queryset = Booking.objects.order_by('pk')
+        with override_settings(ADMIN_EXACT_COUNT_LIMIT=20):
+            paginator = EstimatedCountPaginator(queryset, 4)
+            self.assertEqual((paginator.count, paginator.estimate), (10, None))
+        with override_settings(ADMIN_EXACT_COUNT_LIMIT=5):
+            with mock.patch('roadside_service_app.pagination.estimated_count', return_value=1000):
+                paginator = EstimatedCountPaginator(queryset, 4)
+                self.assertEqual((paginator.count, paginator.estimate), (1000, 'about'))
+            with mock.patch('roadside_service_app.pagination.estimated_count', return_value=None):
+                paginator = EstimatedCountPaginator(queryset, 4)
+                self.assertEqual((paginator.count, paginator.estimate), (5, 'over'))
+            response = self.client.get(self.url)
+            self.assertContains(response, 'Next')
+
+
+@override_settings(RETENTION_CHUNK_PAUSE=0)
+class RetentionTests(RoadsideTestCase):
+    def setUp(self):
+        super().setUp()
+        long_ago = timezone.now() - timedelta(days=3 * 365)
+        self.old_done, self.old_open, self.recent_done = self.make_bookings(3)
+        Booking.objects.filter(pk=self.old_done.pk).update(status='completed', booking_date=long_ago)
+        Booking.objects.filter(pk=self.old_open.pk).update(booking_date=long_ago)
+        Booking.objects.filter(pk=self.recent_done.pk).update(status='completed')
+        Payment.objects.create(booking=self.old_done, amount=Decimal('75.00'), payment_status='completed')
+        self.make_notifications(1, booking=self.old_done)
+        old = self.make_notifications(5)
+        self.recent = self.make_notifications(1)[0]
+        Notification.objects.filter(pk__in=[n.pk for n in old]).update(created_at=long_ago)
+
+    def test_old_notifications_go_to_a_gzip_file_in_chunks(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(RETENTION_ARCHIVE_DIR=directory):
+            stats = apply_policy('notifications', chunk_size=2)
+            self.assertEqual((stats['rows'], stats['chunks'], stats['complete']), (5, 3, True))
+            (path,) = Path(directory).iterdir()
+            with gzip.open(path, 'rt') as archive:
+                rows = [json.loads(line) for line in archive]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['title'], 'Notification 0')
+        self.assertEqual(Notification.objects.count(), 2)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notification_count, 2)
+        self.assertEqual(SearchEntry.objects.filter(kind='notification').count(), 2)
+
+    def test_finished_bookings_move_to_the_archive_table(self):
+        summaries = list(DailyBookingStatus.objects.values_list('day', 'status', 'bookings'))
+        stats = apply_policy('bookings')
+        self.assertEqual(stats['rows'], 1)
+        self.assertEqual(set(Booking.objects.values_list('pk', flat=True)), {self.old_open.pk, self.recent_done.pk})
+        self.assertFalse(Payment.objects.exists())
+        self.assertFalse(Notification.objects.filter(related_booking=self.old_done.pk).exists())
+        # Reports keep counting archived bookings
+        self.assertEqual(list(DailyBookingStatus.objects.values_list('day', 'status', 'bookings')), summaries)
+
+        archived = ArchivedBooking.objects.get()
+        self.assertEqual(archived.data['payment']['amount'], '75.00')
+        self.assertEqual(len(archived.data['notifications']), 1)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('booking_detail', args=[self.old_done.pk]))
+        self.assertContains(response, '(archived)')
+        self.assertContains(response, '0 Main Street')
+        self.assertContains(response, 'Flat Tire Repair')
+        self.assertNotContains(response, 'Complete Payment')
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('booking_detail', args=[self.old_done.pk])).status_code, 404)
+
+    def test_bookings_with_converted_ids_can_be_archived(self):
+        old = Booking.objects.create(
+            id=uuid.uuid4(), user=self.user, service=self.service, status='completed',
+            booking_date=timezone.now() - timedelta(days=3 * 365), location='9 Main Street',
+        )
+        call_command('convert_booking_ids', pause=0, stdout=StringIO())
+        new_id = BookingIdAlias.objects.get(old_id=old.pk).booking_id
+        self.assertEqual(apply_policy('bookings')['rows'], 2)
+        self.assertEqual(ArchivedBooking.objects.get(pk=new_id).data['id_aliases'], [str(old.pk)])
+        self.assertEqual(BookingIdAlias.objects.get(old_id=old.pk).archived_booking_id, new_id)
+
+        # The pre-conversion URL still leads to the archived booking
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('booking_detail', args=[old.pk]))
+        self.assertRedirects(response, reverse('booking_detail', args=[new_id]), status_code=301)
+        self.assertContains(self.client.get(response['Location']), '9 Main Street')
+
+    def test_time_budget_stops_between_chunks(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(RETENTION_ARCHIVE_DIR=directory):
+            stats = apply_policy('notifications', chunk_size=1, time_budget=0)
+            self.assertEqual((stats['rows'], stats['complete']), (1, False))
+            out = StringIO()
+            call_command('apply_retention', 'notifications', stdout=out)
+        self.assertIn('archived 4 rows', out.getvalue())
+
+
+class BookingIdTests(RoadsideTestCase):
+    def test_uuid7_ids_sort_in_creation_order(self):
+        ids = [uuid7() for _ in range(5000)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual({value.version for value in ids}, {7})
+        when = timezone.now() - timedelta(days=400)
+        self.assertEqual(uuid7_time(uuid7(when)), int(when.timestamp() * 1000))
+        self.assertIsNone(uuid7_time(uuid.uuid4()))
+        self.assertEqual(self.make_bookings(1)[0].pk.version, 7)
+
+    def test_converting_old_ids_keeps_rows_and_links(self):
+        done, still_open = [
+            Booking.objects.create(
+                id=uuid.uuid4(), user=self.user, service=self.service, status=status,
+                booking_date=timezone.now(), location='1 Main Street',
+            )
+            for status in ('completed', 'pending')
+        ]
+        Payment.objects.create(booking=done, amount=Decimal('75.00'), payment_status='completed')
+        self.make_notifications(1, booking=done)
+        out = StringIO()
+        call_command('convert_booking_ids', pause=0, stdout=out)
+        self.assertIn('converted 1 of 1', out.getvalue())
+
+        alias = BookingIdAlias.objects.get()
+        self.assertEqual(alias.old_id, done.pk)
+        new = Booking.objects.get(pk=alias.booking_id)
+        self.assertEqual(uuid7_time(new.pk), int(done.created_at.timestamp() * 1000))
+        self.assertEqual(Payment.objects.get().booking_id, new.pk)
+        self.assertEqual(Notification.objects.get().related_booking_id, new.pk)
+        self.assertTrue(Booking.objects.filter(pk__in=search(Booking, 'main')).filter(pk=new.pk).exists())
+        self.assertEqual(Booking.objects.get(pk=still_open.pk).status, 'pending')
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('booking_detail', args=[done.pk]))
+        self.assertRedirects(response, reverse('booking_detail', args=[new.pk]), status_code=301)
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('booking_detail', args=[done.pk])).status_code, 404)
+
+
+class BookingTransitionTests(RoadsideTestCase):
+    def test_transition_is_one_narrow_conditional_update(self):
+        booking = self.make_bookings(1)[0]
+        stale = Booking.objects.get(pk=booking.pk)
+        with CaptureQueriesContext(connections['default']) as queries:
+            self.assertTrue(booking.transition('confirmed'))
+        (update,) = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "roadside_service_app_booking"')]
+        self.assertNotIn('"location"', update)
+        self.assertEqual(Booking.objects.values_list('status', 'version').get(), ('confirmed', 1))
+        self.assertEqual(
+            set(DailyBookingStatus.objects.filter(bookings__gt=0).values_list('status', 'bookings')), {('confirmed', 1)}
+        )
+
+        # A copy loaded before the change loses; a move the state machine forbids never reaches the database
+        self.assertFalse(stale.transition('cancelled'))
+        self.assertEqual(stale.status, 'pending')
+        with self.assertNumQueries(0):
+            self.assertFalse(booking.transition('completed'))
+        # A full save (the admin form) moves the version on too
+        edited = Booking.objects.get(pk=booking.pk)
+        edited.notes = 'Gate code 1234'
+        edited.save()
+        self.assertFalse(booking.transition('in_progress'))
+        self.assertTrue(edited.transition('in_progress'))
+        self.assertEqual(Booking.objects.get().status, 'in_progress')
+
+    def test_payment_for_a_cancelled_booking_is_recorded_without_reopening_it(self):
+        booking = self.make_bookings(1)[0]
+        self.assertTrue(Booking.objects.get(pk=booking.pk).transition('cancelled'))
+        post_webhook(self.client, payment_succeeded_payload(booking))
+        process_pending_events()
+        booking.refresh_from_db()
+        self.assertEqual((booking.status, booking.payment_status), ('cancelled', 'completed'))
+        self.assertTrue(Payment.objects.filter(booking=booking).exists())
+        self.assertEqual(StripeEvent.objects.get().last_error, 'payment recorded; booking status left unchanged')
+
+    def test_large_batches_are_sent_in_chunks(self):
+        # More than SQLite's expression depth limit if sent as one OR chain
+        self.make_bookings(3)
+        Booking.objects.bulk_create([
+            Booking(user=self.user, service=self.service, booking_date=timezone.now(), location='Bulk')
+            for _ in range(1200)
+        ])
+        bookings = list(Booking.objects.all())
+        self.assertEqual(len(Booking.objects.transition(bookings, 'confirmed')), 1203)
+        self.assertEqual(Booking.objects.filter(status='confirmed', version=1).count(), 1203)
+
+    def test_stale_full_save_does_not_overwrite_a_transition(self):
+        booking = self.make_bookings(1)[0]
+        stale = Booking.objects.get(pk=booking.pk)
+        self.assertTrue(booking.transition('confirmed'))
+        stale.notes = 'Edited from an old copy'
+        with self.assertRaises(StaleBookingError):
+            stale.save()
+        self.assertEqual(Booking.objects.values_list('status', 'notes').get(), ('confirmed', None))
+
+        # The admin change form carries the version it was opened at
+        self.client.force_login(User.objects.create_superuser('ops', 'ops@example.com', 'pass12345'))
+        url = reverse('admin:roadside_service_app_booking_change', args=[booking.pk])
+        form = self.client.get(url).context['adminform'].form
+        data = {name: form[name].value() or '' for name in form.fields}
+        data['status'] = 'pending'
+        data['booking_date_0'], data['booking_date_1'] = timezone.localtime(booking.booking_date).strftime('%Y-%m-%d %H:%M:%S').split()
+        data['loaded_version'] = 0  # Opened before the confirmation
+        response = self.client.post(url, data)
+        self.assertContains(response, 'changed by someone else')
+        self.assertEqual(Booking.objects.get().status, 'confirmed')
+        data['loaded_version'] = 1
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        self.assertEqual(Booking.objects.values_list('status', 'version').get(), ('pending', 2))
+
+    def test_admin_actions_move_only_bookings_that_can(self):
+        pending, confirmed = self.make_bookings(2)
+        self.assertTrue(confirmed.transition('confirmed'))
+        self.client.force_login(User.objects.create_superuser('ops', 'ops@example.com', 'pass12345'))
+        self.client.post(reverse('admin:roadside_service_app_booking_changelist'), {
+            'action': 'start_bookings', '_selected_action': [pending.pk, confirmed.pk],
+        })
+        self.assertEqual(
+            dict(Booking.objects.values_list('pk', 'status')), {pending.pk: 'pending', confirmed.pk: 'in_progress'}
+        )
@@ -20,16 +20,27 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     path('profile/', views.profile, name='profile'),
     path('notifications/', views.notifications, name='notifications'),
+    path('notifications/read/', views.mark_notifications_read, name='mark_notifications_read'),
     path('notifications/<int:notification_id>/read/', views.mark_notification_read, name='mark_notification_read'),
+    path('events/', views.events, name='events'),
     
     # Booking system
     path('book/', views.book_service, name='book_service'),
+    path('book/availability/', views.availability_api, name='availability_api'),
     path('booking/<uuid:booking_id>/payment/', views.payment, name='payment'),
+    path('booking/<uuid:booking_id>/payment/intent/', views.payment_intent_async, name='payment_intent_async'),
     path('bookings/', views.booking_history, name='booking_history'),
     path('booking/<uuid:booking_id>/', views.booking_detail, name='booking_detail'),
     
+    # JSON API for the mobile app
+    path('api/bookings/', views.booking_history_api, name='booking_history_api'),
+    path('api/notifications/', views.notifications_api, name='notifications_api'),
+    
     # Stripe webhook
     path('webhook/stripe/', views.stripe_webhook, name='stripe_webhook'),
+    
+    # Prometheus scrape endpoint
+    path('metrics/', views.metrics, name='metrics'),
 ]
 
 # Serve media files during development
@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+# Everything cached for one user - the User row used by the auth backend and the
+# dashboard fragments - is keyed by a per-user version. Anything that changes
+# what those show (bookings, notifications, the user row) bumps the version.
+USER_VERSION_KEY = 'user:{user_id}:version'
+
+
+def cache_is_shared():
+    """
+    Whether other processes see this process's invalidations. A version bumped by
+    run_workers or process_stripe_events never reaches a web process's LocMemCache,
+    so nothing per-user is cached there. settings.CACHE_SHARED overrides the guess.
+    """
+    if settings.CACHE_SHARED is not None:
+        return settings.CACHE_SHARED
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    return [checks.Warning(
+        'The default cache is local to each process, so the logged-in user and dashboard panels are not cached.',
+        hint='Set DJANGO_CACHE_BACKEND to a cache shared by the web and worker processes (file-based, Redis, ...).',
+        id='roadside_service_app.W001',
+    )]
+
+
+def user_cache_version(user_id):
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        # A timestamp, so a version dropped by eviction or invalidation is never reused
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_user_cache(user_ids):
+    """
+    Drop the users' versions once the current transaction commits, so no
+    request can cache the pre-commit rows under the new version.
+    """
+    keys = [USER_VERSION_KEY.format(user_id=user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
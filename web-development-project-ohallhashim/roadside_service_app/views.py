@@ -1,22 +1,42 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.utils import timezone
 from django.db.models import Q
 import stripe
+import hmac
 import json
 from datetime import datetime, timedelta
 from .forms import ContactForm, UserRegistrationForm, UserLoginForm, BookingForm, UserProfileForm
-from .models import Contact, Service, Booking, Payment, Notification, User
+from .models import ArchivedBooking, Contact, Service, Booking, BookingIdAlias, Payment, Notification, User
+from .availability import free_slots_for_day
+from .catalog import active_services, catalog_version, get_active_service
+from .conditional import booking_etag, booking_last_modified, conditional_page, page_etag, user_rows_etag
+from .db_writes import serialized_write
+from .dispatch import geocode
+from .metrics import render_prometheus
+from .notifications import mark_read
+from .stripe_client import aensure_payment_intent, ensure_payment_intent
+from .tasks import prepare_payment_intent, send_notification
+from .webhooks import record_event
+from .pagination import KeysetPaginator
+from .pubsub import event_stream, user_channel
+from .routers import replica_reads
+from .user_cache import cache_is_shared, user_cache_version
 
-# Configure Stripe
-stripe.api_key = 'sk_test_your_secret_key'  # Replace with your actual Stripe secret key
+# Rows per page on the history / notification lists; the JSON API may ask for up to API_MAX_PAGE_SIZE
+PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
 
+@replica_reads
+@conditional_page(etag_func=page_etag)
 def home(request):
-    services = Service.objects.filter(is_active=True)[:6]
+    services = active_services()[:6]
     context = {
         'services': services,
         'user': request.user
@@ -35,10 +55,13 @@ def contact(request):
 
     return render(request, 'contact.html', {'form': form})
 
+@replica_reads
+@conditional_page(etag_func=page_etag)
 def services(request):
-    services = Service.objects.filter(is_active=True)
+    services = active_services()
     return render(request, 'services.html', {'services': services})
 
+@conditional_page(etag_func=page_etag)
 def about(request):
     return render(request, 'about.html')
 
@@ -77,16 +100,41 @@ def user_logout(request):
     return redirect('home')
 
 @login_required
+@replica_reads
 def dashboard(request):
-    user_bookings = Booking.objects.filter(user=request.user).order_by('-created_at')[:5]
-    notifications = Notification.objects.filter(user=request.user, is_read=False).order_by('-created_at')[:5]
+    fragment_timeout = settings.DASHBOARD_FRAGMENT_TIMEOUT if cache_is_shared() else 0
+    # A panel is cached under the current user version, so it is filled from the
+    # primary: a lagging replica's rows would stay cached under the new version
+    db = 'default' if fragment_timeout else None
+    user_bookings = Booking.objects.using(db).with_related().filter(user=request.user).order_by('-created_at')[:5]
+    notifications = Notification.objects.using(db).filter(user=request.user, is_read=False).order_by('-created_at')[:5]
     
+    # Both querysets are lazy: they only run when their cached panel is re-rendered
     context = {
         'user_bookings': user_bookings,
         'notifications': notifications,
+        'fragment_timeout': fragment_timeout,
+        'user_cache_version': user_cache_version(request.user.pk),
+        'catalog_version': catalog_version(),
+        'live_events': settings.LIVE_EVENTS,
     }
     return render(request, 'dashboard.html', context)
 
+@serialized_write
+def _save_booking(booking):
+    # The booking and its follow-up jobs are written in one (retried) transaction;
+    # run_workers sends the notification and creates the Stripe intent
+    booking.save()
+    send_notification.delay(
+        user_id=booking.user_id,
+        notification_type='booking_confirmed',
+        title='Booking Confirmed',
+        message=f'Your booking for {booking.service.name} has been confirmed.',
+        related_booking_id=str(booking.pk),
+        dedupe_key=f'booking_confirmed:{booking.pk}',
+    )
+    prepare_payment_intent.delay(booking_id=str(booking.pk))
+
 @login_required
 def book_service(request):
     if request.method == 'POST':
@@ -94,16 +142,8 @@ def book_service(request):
         if form.is_valid():
             booking = form.save(commit=False)
             booking.user = request.user
-            booking.save()
-            
-            # Create notification
-            Notification.objects.create(
-                user=request.user,
-                notification_type='booking_confirmed',
-                title='Booking Confirmed',
-                message=f'Your booking for {booking.service.name} has been confirmed.',
-                related_booking=booking
-            )
+            booking.latitude, booking.longitude = geocode(booking.location) or (None, None)
+            _save_booking(booking)
             
             messages.success(request, 'Booking created successfully! Please complete payment.')
             return redirect('payment', booking_id=booking.id)
@@ -112,21 +152,47 @@ def book_service(request):
     
     return render(request, 'booking/book_service.html', {'form': form})
 
+@login_required
+def availability_api(request):
+    # Free start times for one service on one day: ?service=<id>&date=YYYY-MM-DD
+    service = get_active_service(request.GET.get('service'))
+    if service is None:
+        return JsonResponse({'error': 'Unknown service'}, status=400)
+    try:
+        day = datetime.strptime(request.GET.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'error': 'date must be YYYY-MM-DD'}, status=400)
+    slots = free_slots_for_day(service, day)
+    return JsonResponse({
+        'service': service.pk,
+        'date': day.isoformat(),
+        'duration': service.duration,
+        'slots': [timezone.localtime(slot).strftime('%Y-%m-%dT%H:%M') for slot in slots],
+    })
+
+def _booking_alias(request, booking_id):
+    # Bookings converted by convert_booking_ids answer to their old id too, archived or not
+    alias = BookingIdAlias.objects.filter(
+        Q(booking__user=request.user) | Q(archived_booking__user=request.user), old_id=booking_id,
+    ).values_list('booking_id', 'archived_booking_id').first()
+    return alias and (alias[0] or alias[1])
+
 @login_required
 def payment(request, booking_id):
-    booking = get_object_or_404(Booking, id=booking_id, user=request.user)
+    booking = Booking.objects.with_related().filter(id=booking_id, user=request.user).first()
+    if booking is None:
+        alias = _booking_alias(request, booking_id)
+        if alias is None:
+            raise Http404
+        return redirect('payment', booking_id=alias, permanent=True)
     
     if request.method == 'POST':
         try:
-            # Create Stripe payment intent
-            intent = stripe.PaymentIntent.create(
-                amount=int(booking.service.price * 100),  # Convert to cents
-                currency='usd',
-                metadata={'booking_id': str(booking.id)}
-            )
-            
-            booking.stripe_payment_intent_id = intent.id
-            booking.save()
+            # Reuse the booking's payment intent if it is still payable, otherwise create one
+            intent, created = ensure_payment_intent(booking)
+            if created:
+                booking.stripe_payment_intent_id = intent.id
+                booking.save(update_fields=['stripe_payment_intent_id', 'updated_at'])
             
             return JsonResponse({
                 'client_secret': intent.client_secret,
@@ -137,65 +203,125 @@ def payment(request, booking_id):
     
     context = {
         'booking': booking,
-        'stripe_public_key': 'pk_test_your_publishable_key'  # Replace with your actual key
+        'stripe_public_key': settings.STRIPE_PUBLISHABLE_KEY
     }
     return render(request, 'booking/payment.html', context)
 
+@login_required
+@require_POST
+async def payment_intent_async(request, booking_id):
+    # What payment.html posts to: the async version of the POST branch of payment().
+    # Under ASGI the Stripe round trip runs in a thread pool, so the event loop keeps
+    # serving other requests meanwhile
+    user = await request.auser()
+    try:
+        booking = await Booking.objects.with_related().aget(id=booking_id, user=user)
+    except Booking.DoesNotExist:
+        raise Http404('No booking matches the given query.')
+
+    try:
+        intent, created = await aensure_payment_intent(booking)
+        if created:
+            booking.stripe_payment_intent_id = intent.id
+            await booking.asave(update_fields=['stripe_payment_intent_id', 'updated_at'])
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=403)
+
+    return JsonResponse({
+        'client_secret': intent.client_secret,
+        'booking_id': str(booking.id)
+    })
+
+@login_required
+async def events(request):
+    # Server-sent events: the user's booking status changes and new notifications.
+    # Run under ASGI - each open stream then costs a coroutine, not a worker thread.
+    if not settings.LIVE_EVENTS:
+        # Under WSGI: 204 tells EventSource not to reconnect
+        return HttpResponse(status=204)
+    user = await request.auser()
+    return StreamingHttpResponse(
+        event_stream(user_channel(user.pk)),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
 @csrf_exempt
 def stripe_webhook(request):
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
     
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, 'whsec_your_webhook_secret'  # Replace with your webhook secret
-        )
+        event = stripe.Webhook.construct_event(payload, sig_header, settings.STRIPE_WEBHOOK_SECRET)
     except ValueError as e:
         return JsonResponse({'error': 'Invalid payload'}, status=400)
     except stripe.error.SignatureVerificationError as e:
         return JsonResponse({'error': 'Invalid signature'}, status=400)
     
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
-        booking_id = payment_intent['metadata']['booking_id']
-        
-        try:
-            booking = Booking.objects.get(id=booking_id)
-            booking.payment_status = 'completed'
-            booking.status = 'confirmed'
-            booking.save()
-            
-            # Create payment record
-            Payment.objects.create(
-                booking=booking,
-                amount=booking.service.price,
-                stripe_payment_intent_id=payment_intent['id'],
-                payment_status='completed'
-            )
-            
-            # Create notification
-            Notification.objects.create(
-                user=booking.user,
-                notification_type='payment_received',
-                title='Payment Received',
-                message=f'Payment of ${booking.service.price} received for {booking.service.name}.',
-                related_booking=booking
-            )
-            
-        except Booking.DoesNotExist:
-            pass
-    
+    # Acknowledge as soon as the event is stored; process_stripe_events applies it
+    record_event(event, payload)
     return JsonResponse({'status': 'success'})
 
+def _api_page_size(request):
+    try:
+        return max(1, min(int(request.GET.get('limit', PAGE_SIZE)), API_MAX_PAGE_SIZE))
+    except ValueError:
+        return PAGE_SIZE
+
+def _booking_as_dict(booking):
+    return {
+        'id': str(booking.id),
+        'service': booking.service.name,
+        'price': str(booking.service.price),
+        'booking_date': booking.booking_date.isoformat(),
+        'location': booking.location,
+        'status': booking.status,
+        'payment_status': booking.payment_status,
+        'created_at': booking.created_at.isoformat(),
+    }
+
+def _notification_as_dict(notification):
+    return {
+        'id': notification.id,
+        'notification_type': notification.notification_type,
+        'title': notification.title,
+        'message': notification.message,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+        'related_booking': str(notification.related_booking_id) if notification.related_booking_id else None,
+    }
+
 @login_required
+@replica_reads
 def booking_history(request):
-    bookings = Booking.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'booking/booking_history.html', {'bookings': bookings})
+    bookings = Booking.objects.with_related().filter(user=request.user)
+    page = KeysetPaginator(bookings, per_page=PAGE_SIZE).page(request.GET.get('cursor'))
+    return render(request, 'booking/booking_history.html', {'bookings': page.items, 'page': page})
 
 @login_required
+@conditional_page(etag_func=user_rows_etag)
+def booking_history_api(request):
+    bookings = Booking.objects.with_related().filter(user=request.user)
+    page = KeysetPaginator(bookings, per_page=_api_page_size(request)).page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [_booking_as_dict(booking) for booking in page],
+        'next': page.next_cursor,
+        'previous': page.prev_cursor,
+    })
+
+@login_required
+@replica_reads
+@conditional_page(etag_func=booking_etag, last_modified_func=booking_last_modified)
 def booking_detail(request, booking_id):
-    booking = get_object_or_404(Booking, id=booking_id, user=request.user)
-    return render(request, 'booking/booking_detail.html', {'booking': booking})
+    booking = Booking.objects.with_related().filter(id=booking_id, user=request.user).first()
+    if booking is None:
+        alias = _booking_alias(request, booking_id)
+        if alias is not None:
+            return redirect('booking_detail', booking_id=alias, permanent=True)
+        # Finished bookings past their retention period live on in the archive
+        archived = get_object_or_404(ArchivedBooking, id=booking_id, user=request.user)
+        return render(request, 'booking/booking_detail.html', {'booking': archived.as_booking(), 'archived': True})
+    return render(request, 'booking/booking_detail.html', {'booking': booking, 'live_events': settings.LIVE_EVENTS})
 
 @login_required
 def profile(request):
@@ -211,13 +337,57 @@ def profile(request):
     return render(request, 'profile.html', {'form': form})
 
 @login_required
+@replica_reads
 def notifications(request):
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'notifications.html', {'notifications': notifications})
+    notifications = Notification.objects.filter(user=request.user).select_related('related_booking__service')
+    page = KeysetPaginator(notifications, per_page=PAGE_SIZE).page(request.GET.get('cursor'))
+    return render(request, 'notifications.html', {'notifications': page.items, 'page': page})
+
+@login_required
+@conditional_page(etag_func=user_rows_etag)
+def notifications_api(request):
+    notifications = Notification.objects.filter(user=request.user)
+    page = KeysetPaginator(notifications, per_page=_api_page_size(request)).page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [_notification_as_dict(notification) for notification in page],
+        'next': page.next_cursor,
+        'previous': page.prev_cursor,
+    })
 
 @login_required
 def mark_notification_read(request, notification_id):
-    notification = get_object_or_404(Notification, id=notification_id, user=request.user)
-    notification.is_read = True
-    notification.save()
-    return JsonResponse({'status': 'success'})
+    if not mark_read(request.user, [notification_id]):
+        # Nothing changed: either already read or not this user's notification
+        get_object_or_404(Notification, id=notification_id, user=request.user)
+    return JsonResponse({'status': 'success', 'unread': request.user.unread_notification_count})
+
+@login_required
+@require_POST
+def mark_notifications_read(request):
+    # Accepts {"ids": [...]} as JSON or repeated ?ids= form fields; no ids means "mark all"
+    if request.content_type == 'application/json':
+        try:
+            ids = json.loads(request.body or '{}').get('ids')
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    else:
+        ids = request.POST.getlist('ids') or None
+    try:
+        ids = None if ids is None else [int(pk) for pk in ids]
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'ids must be a list of integers'}, status=400)
+
+    marked = mark_read(request.user, ids)
+    return JsonResponse({'status': 'success', 'marked': marked, 'unread': request.user.unread_notification_count})
+
+def _metrics_allowed(request):
+    if request.user.is_staff or request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    return bool(settings.METRICS_TOKEN) and hmac.compare_digest(token, settings.METRICS_TOKEN)
+
+def metrics(request):
+    # Prometheus scrape endpoint: staff, METRICS_TOKEN or METRICS_ALLOWED_IPS only
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,157 @@
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .db_writes import serialized_write
+from .models import Booking, Notification, Payment, StripeEvent
+from .notifications import notify_many
+from .pubsub import booking_event, publish_on_commit
+from .summaries import payments_changed
+from .user_cache import invalidate_user_cache
+
+logger = logging.getLogger(__name__)
+
+# Events that keep failing are left in the inbox (with last_error) for a human to look at
+MAX_ATTEMPTS = 5
+
+
+def sign_payload(payload, secret, timestamp=None):
+    """Build a Stripe-Signature header for `payload` (used by tests and the fake event generator)."""
+    timestamp = int(timestamp or time.time())
+    signed = f'{timestamp}.{payload}'.encode()
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+@serialized_write
+def record_event(event, payload):
+    """
+    Store a verified event in the inbox. Stripe retries reuse the event id, so a
+    duplicate delivery is dropped by the unique constraint in the same INSERT.
+    """
+    StripeEvent.objects.bulk_create(
+        [StripeEvent(event_id=event['id'], event_type=event['type'], payload=json.loads(payload))],
+        ignore_conflicts=True,
+    )
+
+
+def pending_events():
+    return StripeEvent.objects.filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS).order_by('pk')
+
+
+def process_pending_events(batch_size=500):
+    """
+    Apply one batch of unprocessed events. Returns the number of events taken
+    from the inbox (0 means it is empty).
+    """
+    with transaction.atomic():
+        events = pending_events()
+        if connection.features.has_select_for_update_skip_locked:
+            # Lets several drainers run side by side without fighting over rows
+            events = events.select_for_update(skip_locked=True)
+        events = list(events[:batch_size])
+        if not events:
+            return 0
+        failed = {}
+        try:
+            with transaction.atomic():
+                notes = apply_events(events)
+        except Exception:
+            logger.exception('Stripe event batch failed; retrying events one at a time')
+            notes = {}
+            for event in events:
+                try:
+                    with transaction.atomic():
+                        notes.update(apply_events([event]))
+                except Exception as exc:
+                    failed[event.pk] = repr(exc)
+
+        StripeEvent.objects.filter(pk__in=[e.pk for e in events if e.pk not in failed]).update(
+            processed_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        StripeEvent.objects.filter(pk__in=list(failed)).update(attempts=F('attempts') + 1)
+        for pk, note in {**notes, **failed}.items():
+            StripeEvent.objects.filter(pk=pk).update(last_error=note)
+    return len(events)
+
+
+def _booking_id(event):
+    try:
+        return uuid.UUID(event.payload['data']['object']['metadata']['booking_id'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def apply_events(events):
+    """
+    Apply a batch of events with a fixed number of queries, however large the
+    batch. Returns {event pk: reason} for events that were skipped.
+    """
+    notes = {}
+    succeeded = {}
+    for event in events:
+        if event.event_type != 'payment_intent.succeeded':
+            continue
+        booking_id = _booking_id(event)
+        if booking_id is None:
+            notes[event.pk] = 'skipped: no booking_id in metadata'
+        elif booking_id in succeeded:
+            notes[event.pk] = 'skipped: duplicate payment for booking in batch'
+        else:
+            succeeded[booking_id] = event
+    if not succeeded:
+        return notes
+
+    bookings = Booking.objects.select_related('service').in_bulk(list(succeeded))
+    already_paid = set(Payment.objects.filter(booking_id__in=bookings).values_list('booking_id', flat=True))
+    for booking_id, event in succeeded.items():
+        if booking_id not in bookings:
+            notes[event.pk] = 'skipped: booking not found'
+        elif booking_id in already_paid:
+            notes[event.pk] = 'skipped: booking already paid'
+
+    to_pay = [bookings[pk] for pk in succeeded if pk in bookings and pk not in already_paid]
+    if not to_pay:
+        return notes
+
+    # The payment is recorded either way; only a booking still pending is confirmed.
+    # One that was cancelled (or changed) meanwhile keeps its status.
+    confirmed = {booking.pk for booking in Booking.objects.transition(to_pay, 'confirmed', payment_status='completed')}
+    unchanged = [booking for booking in to_pay if booking.pk not in confirmed]
+    if unchanged:
+        Booking.objects.filter(pk__in=[b.pk for b in unchanged]).update(
+            payment_status='completed', updated_at=timezone.now()
+        )
+        invalidate_user_cache([booking.user_id for booking in unchanged])
+        for booking in unchanged:
+            booking.payment_status = 'completed'
+            notes[succeeded[booking.pk].pk] = 'payment recorded; booking status left unchanged'
+            publish_on_commit(booking.user_id, 'booking', booking_event(booking))
+    payments = Payment.objects.bulk_create([
+        Payment(
+            booking=booking,
+            amount=booking.service.price,
+            stripe_payment_intent_id=succeeded[booking.pk].payload['data']['object']['id'],
+            payment_status='completed',
+        )
+        for booking in to_pay
+    ])
+    payments_changed([(None, payment.tracked_values()) for payment in payments])
+    notify_many([
+        Notification(
+            user_id=booking.user_id,
+            notification_type='payment_received',
+            title='Payment Received',
+            message=f'Payment of ${booking.service.price} received for {booking.service.name}.',
+            related_booking=booking,
+        )
+        for booking in to_pay
+    ])
+    return notes